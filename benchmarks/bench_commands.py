@@ -0,0 +1,67 @@
+"""
+Разбор и исполнение команд: compile_script/build_timeline на больших скриптах
+и process_command (разбор + отправка) через ControlServer.
+"""
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from pionsrv.commands import compile_script
+from pionsrv.scheduler import build_timeline
+from timing import free_udp_port
+
+
+def make_script(lines: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    script = []
+    for i in range(lines):
+        kind = rng.random()
+        target = rng.choice(["all", "g:1", "g:2", str(8000 + rng.randrange(100))])
+        if kind < 0.6:
+            script.append(f"{target} goto {rng.uniform(-5, 5):.2f} {rng.uniform(-5, 5):.2f} {rng.uniform(0, 3):.2f} 0")
+        elif kind < 0.8:
+            script.append(f"{target} led 0 {rng.randrange(256)} {rng.randrange(256)} {rng.randrange(256)}")
+        elif kind < 0.95:
+            script.append(f"sleep {rng.uniform(0, 0.1):.3f}")
+        else:
+            script.append(f"@t={i * 0.01:.2f} {target} takeoff")
+    return script
+
+
+def run(quick: bool = False) -> dict:
+    from pionsrv.control_server import ControlServer
+
+    results = {}
+    lines = 10000 if quick else 100000
+    script = make_script(lines)
+
+    start = time.perf_counter()
+    compiled, errors = compile_script(script)
+    compile_time = time.perf_counter() - start
+    start = time.perf_counter()
+    timeline = build_timeline(compiled)
+    timeline_time = time.perf_counter() - start
+    results["compile_script"] = {"lines": lines, "lines_per_sec": lines / compile_time, "errors": len(errors)}
+    results["build_timeline"] = {"commands": len(timeline), "commands_per_sec": len(timeline) / timeline_time}
+
+    directory = tempfile.mkdtemp()
+    config = os.path.join(directory, "drones_config.json")
+    with open(config, "w") as f:
+        json.dump({str(8000 + i): 1 + i % 2 for i in range(100)}, f)
+    drone_lines = [line for line in script if not line.startswith(("sleep", "@t"))][:lines // 10]
+    with contextlib.redirect_stdout(io.StringIO()):
+        server = ControlServer(broadcast_port=free_udp_port(), path_to_config=config, telemetry=False,
+                               unicast=False, send_rate=0)
+        try:
+            start = time.perf_counter()
+            for line in drone_lines:
+                server.process_command(line)
+            elapsed = time.perf_counter() - start
+        finally:
+            server.close()
+    results["process_command"] = {"commands": len(drone_lines), "commands_per_sec": len(drone_lines) / elapsed,
+                                  "cache": server.command_cache.stats()}
+    return results
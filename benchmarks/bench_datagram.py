@@ -0,0 +1,45 @@
+"""
+Кодирование и декодирование DDatagram: пакеты команд (как в send_command)
+и пакеты телеметрии (как в приёме визуализатора и сервера).
+"""
+from swarm_server import DDatagram, CMD
+from pionsrv.command_cache import CommandCache
+from timing import measure
+
+
+def telemetry_frame(drone_id: int = 8000) -> bytes:
+    encoder = DDatagram(id=drone_id)
+    encoder.token = -1
+    encoder.data = [float(drone_id)] + [0.1 * i for i in range(16)]
+    return encoder.export_serialized()
+
+
+def run(quick: bool = False) -> dict:
+    number = 2000 if quick else 20000
+    results = {}
+
+    encoder = DDatagram()
+    data = [1.0, 2.0, 3.0, 0.0]
+
+    def encode():
+        encoder.command = CMD.GOTO.value
+        encoder.data = data
+        encoder.target_id = "8001"
+        encoder.group_id = 1
+        encoder.export_serialized()
+
+    results["encode_command"] = measure(encode, number)
+
+    cache = CommandCache()
+    results["command_cache_hit"] = measure(lambda: cache.get(CMD.GOTO, data, "8001", 1), number)
+    counter = iter(range(10 ** 9))
+    results["command_cache_miss"] = measure(lambda: cache.get(CMD.GOTO, [float(next(counter)), 0, 0, 0], "8001", 1),
+                                            number)
+
+    frame = telemetry_frame()
+    decoder = DDatagram()
+    results["decode_telemetry"] = measure(lambda: decoder.read_serialized(frame), number)
+    view = memoryview(bytearray(frame))
+    results["decode_telemetry_memoryview"] = measure(lambda: decoder.read_serialized(view), number)
+    results["frame_bytes"] = {"command": len(cache.get(CMD.GOTO, data, "8001", 1)), "telemetry": len(frame)}
+    return results
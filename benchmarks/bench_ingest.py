@@ -0,0 +1,43 @@
+"""
+Приём телеметрии визуализатором в зависимости от числа дронов – код SwarmVisualizer2D
+без сокета: по одному пакету (тело receive_data: DDatagram.read_serialized и
+process_payload) и пачками по 64 пакета (тело receive_batches: process_batch,
+BatchDecoder и одно векторное обновление SwarmState).
+"""
+import time
+from swarm_server import DDatagram
+from bench_datagram import telemetry_frame
+from bench_render import visualizer
+from pionsrv.swarm_state import SwarmState
+
+
+def run(quick: bool = False) -> dict:
+    counts = (10, 100, 1000) if quick else (10, 100, 1000, 5000)
+    rounds = 5 if quick else 20
+    results = {}
+    decoder = DDatagram()
+    vis = visualizer()
+    try:
+        for count in counts:
+            frames = [telemetry_frame(8000 + i) for i in range(count)]
+
+            vis.state = SwarmState(trail_length=vis.trails_length)
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for frame in frames:
+                    valid, payload = decoder.read_serialized(frame)
+                    if valid and len(payload.data) >= 7:
+                        vis.process_payload(payload, None)
+            single = rounds * count / (time.perf_counter() - start)
+
+            vis.state = SwarmState(trail_length=vis.trails_length)
+            batches = [[(frame, None) for frame in frames[offset:offset + 64]] for offset in range(0, count, 64)]
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for batch in batches:
+                    vis.process_batch(batch)
+            batched = rounds * count / (time.perf_counter() - start)
+            results[str(count)] = {"process_payload_pps": single, "process_batch_pps": batched}
+    finally:
+        vis.shutdown()
+    return results
@@ -0,0 +1,45 @@
+"""
+Контроль сближения: проверка пар по равномерной сетке ProximityMonitor против
+полного перебора n²/2 пар (NumPy) для роя, разлетевшегося в объёме.
+"""
+import time
+import numpy as np
+from pionsrv.decoder import TELEMETRY_DTYPE
+from pionsrv.proximity import ProximityMonitor
+
+
+def pairwise(positions: np.ndarray, velocities: np.ndarray, separation: float, horizon: float) -> int:
+    first, second = np.triu_indices(len(positions), 1)
+    dp = positions[second] - positions[first]
+    dv = velocities[second] - velocities[first]
+    t = np.clip(-np.einsum("ij,ij->i", dp, dv) / np.maximum(np.einsum("ij,ij->i", dv, dv), 1e-12), 0.0, horizon)
+    return int((np.linalg.norm(dp + dv * t[:, None], axis=1) < separation).sum())
+
+
+def run(quick: bool = False) -> dict:
+    counts = (100, 500) if quick else (100, 500, 1000, 2000)
+    rounds = 5 if quick else 20
+    rng = np.random.default_rng(0)
+    results = {}
+    for count in counts:
+        # Около 3 м между соседями, скорости до 1 м/с
+        span = 3.0 * count ** (1 / 3)
+        records = np.zeros(count, dtype=TELEMETRY_DTYPE)
+        records["id"] = np.arange(8000, 8000 + count)
+        records["position"] = rng.uniform(0.0, span, (count, 3))
+        records["velocity"] = rng.uniform(-0.57, 0.57, (count, 3))
+        monitor = ProximityMonitor(separation=1.0, horizon=2.0, check_rate=0.0)
+
+        start = time.perf_counter()
+        for i in range(rounds):
+            monitor.update(records, timestamp=float(i))
+        grid = (time.perf_counter() - start) / rounds
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            brute = pairwise(records["position"], records["velocity"], 1.0, 2.0)
+        full = (time.perf_counter() - start) / rounds
+        results[str(count)] = {"grid_ms": grid * 1e3, "pairwise_ms": full * 1e3,
+                               "pairs_per_check": monitor.stats()["pairs_per_check"],
+                               "conflicts": len(monitor.conflicts), "pairwise_conflicts": brute}
+    return results
@@ -0,0 +1,80 @@
+"""
+Кадр окна визуализатора: SwarmVisualizer2D.update_plot (снимок SwarmState и
+обновление артистов SwarmRenderer) и отрисовка изменённых артистов с blit –
+то же, что делает FuncAnimation(blit=True), но на холсте Agg без окна.
+"""
+import os
+import sys
+import time
+import numpy as np
+from swarm_server import DDatagram
+from pionsrv.scheduler import summarize_lateness
+from pionsrv.swarm_state import SwarmState
+from timing import free_udp_port
+
+SCRIPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+
+
+def visualizer():
+    """
+    SwarmVisualizer2D из scripts/test_visual.py на бэкенде Agg, приём – на свободном порту
+    (пакеты в него не приходят). После измерений – shutdown().
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    if SCRIPTS not in sys.path:
+        sys.path.insert(0, SCRIPTS)
+    from test_visual import SwarmVisualizer2D
+    return SwarmVisualizer2D(port=free_udp_port())
+
+
+def telemetry_batch(ids, positions, velocities) -> list:
+    """
+    Пачка [(пакет, адрес), ...] телеметрии дронов ids с позициями и скоростями (n, 3).
+    """
+    encoder = DDatagram()
+    encoder.token = -1
+    batch = []
+    for drone_id, position, velocity in zip(ids, positions.tolist(), velocities.tolist()):
+        encoder.id = drone_id
+        encoder.data = [float(drone_id)] + position + velocity + [0.0] * 10
+        batch.append((encoder.export_serialized(), None))
+    return batch
+
+
+def run(quick: bool = False) -> dict:
+    counts = (10, 100) if quick else (10, 100, 200, 500)
+    frames = 20 if quick else 100
+    rng = np.random.default_rng(0)
+    results = {}
+    vis = visualizer()
+    try:
+        canvas = vis.fig.canvas
+        for count in counts:
+            vis.state = SwarmState(trail_length=vis.trails_length)
+            ids = list(range(8000, 8000 + count))
+            # Дроны летят со скоростью до ~1 м/с, кадр – 1/30 с: следы короткие, как в полёте
+            positions = rng.uniform(-5, 5, (count, 3))
+            velocities = rng.normal(0, 0.5, (count, 3))
+            vis.process_batch(telemetry_batch(ids, positions, velocities))
+            canvas.draw()
+            background = canvas.copy_from_bbox(vis.fig.bbox)
+            update, blit = [], []
+            for frame in range(frames):
+                positions += velocities / 30
+                vis.process_batch(telemetry_batch(ids, positions, velocities))
+                start = time.perf_counter()
+                artists = vis.update_plot(frame)
+                middle = time.perf_counter()
+                canvas.restore_region(background)
+                for artist in artists:
+                    vis.ax.draw_artist(artist)
+                canvas.blit(vis.fig.bbox)
+                end = time.perf_counter()
+                update.append(middle - start)
+                blit.append(end - middle)
+            results[str(count)] = {"update_plot": summarize_lateness(update),
+                                   "blit_draw": summarize_lateness(blit)}
+    finally:
+        vis.shutdown()
+    return results
@@ -0,0 +1,85 @@
+"""
+Задержка команда -> ответ через loopback против симулятора (pionsrv-sim в потоке):
+команда -> ack (reliable-протокол) и команда set_speed -> первая телеметрия с новой скоростью.
+Задержки – в секундах (summarize_lateness).
+"""
+import select
+import socket
+import threading
+import time
+from swarm_server import DDatagram, CMD
+from pionsrv.reliable import ACK_SOURCE
+from pionsrv.scheduler import summarize_lateness
+from pionsrv.simulator import SimulatorNode, SwarmSimulator
+from timing import free_udp_port
+
+
+def wait_for(sock, decoder, predicate, timeout: float = 1.0):
+    deadline = time.perf_counter() + timeout
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0 or not select.select([sock], [], [], remaining)[0]:
+            return None
+        data, _ = sock.recvfrom(4096)
+        valid, payload = decoder.read_serialized(data)
+        if valid and predicate(payload):
+            return time.perf_counter()
+
+
+def run(quick: bool = False) -> dict:
+    samples = 50 if quick else 300
+    port = free_udp_port()
+    node = SimulatorNode(SwarmSimulator(10), port=port, telemetry_rate=200.0, physics_rate=400.0)
+    thread = threading.Thread(target=node.run, args=(samples * 0.05 + 10,), daemon=True)
+    thread.start()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    sock.bind(("", port))
+    address = ("<broadcast>", port)
+    encoder = DDatagram(id=666)
+    decoder = DDatagram()
+
+    def send(command: CMD, data: list, token: int = -1) -> float:
+        encoder.token = token
+        encoder.command = command.value
+        encoder.data = data
+        encoder.target_id = "8003"
+        encoder.group_id = 0
+        frame = encoder.export_serialized()
+        sent = time.perf_counter()
+        sock.sendto(frame, address)
+        return sent
+
+    ack, reaction, lost = [], [], 0
+    try:
+        send(CMD.ARM, [])
+        for i in range(samples):
+            token = i + 1
+            sent = send(CMD.LED, [0, 0, 0, 0], token)
+            got = wait_for(sock, decoder, lambda p: p.source == ACK_SOURCE and p.token == token)
+            if got is None:
+                lost += 1
+            else:
+                ack.append(got - sent)
+
+            speed = 0.5 if i % 2 == 0 else -0.5
+            sent = send(CMD.SET_SPEED, [speed, 0, 0, 0])
+            got = wait_for(sock, decoder, lambda p: p.command == 0 and p.source != ACK_SOURCE and p.id == 8003
+                           and len(p.data) >= 7 and p.data[4] * speed > 0)
+            if got is None:
+                lost += 1
+            else:
+                reaction.append(got - sent)
+    finally:
+        sock.close()
+        node.stop()
+        thread.join()
+        node.close()
+    return {
+        "command_to_ack": summarize_lateness(ack),
+        "command_to_telemetry": summarize_lateness(reaction),
+        "lost": lost,
+        "simulator": {"telemetry_rate_hz": node.telemetry_rate, "physics_rate_hz": node.physics_rate},
+    }
@@ -0,0 +1,75 @@
+"""
+Набор бенчмарков pionsrv. Результаты – JSON (stdout или --output) для сравнения между версиями.
+
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --quick --only datagram ingest
+    python benchmarks/run_benchmarks.py --only proximity
+"""
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+import bench_commands
+import bench_datagram
+import bench_ingest
+import bench_proximity
+import bench_render
+import bench_roundtrip
+
+BENCHMARKS = {
+    "datagram": bench_datagram,
+    "commands": bench_commands,
+    "ingest": bench_ingest,
+    "proximity": bench_proximity,
+    "render": bench_render,
+    "roundtrip": bench_roundtrip,
+}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки pionsrv")
+    parser.add_argument("--only", nargs="*", choices=list(BENCHMARKS), default=None, help="запустить только эти")
+    parser.add_argument("--quick", action="store_true", help="короткие прогоны (проверка, а не измерение)")
+    parser.add_argument("--output", default=None, help="файл JSON с результатами")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "quick": args.quick,
+        },
+        "results": {},
+    }
+    for name in args.only or BENCHMARKS:
+        print(f"Бенчмарк {name}...", file=sys.stderr)
+        start = time.perf_counter()
+        report["results"][name] = BENCHMARKS[name].run(quick=args.quick)
+        print(f"  {time.perf_counter() - start:.1f} с", file=sys.stderr)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+        print(f"Результаты сохранены: {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+import socket
+import time
+from typing import Callable
+
+
+def measure(func: Callable, number: int, repeat: int = 5) -> dict:
+    """
+    Вызывает func() number раз в каждом из repeat прогонов.
+    Возвращает лучшую и медианную скорость (операций в секунду) и время одной операции.
+    """
+    func()  # прогрев
+    rates = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rates.append(number / (time.perf_counter() - start))
+    rates.sort()
+    best = rates[-1]
+    return {
+        "ops_per_sec": best,
+        "median_ops_per_sec": rates[len(rates) // 2],
+        "us_per_op": 1e6 / best,
+    }
+
+
+def free_udp_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("", 0))
+        return sock.getsockname()[1]
@@ -1,11 +1,19 @@
+import argparse
 import socket
-import time
 import threading
+import time
 from queue import Queue
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
-import numpy as np
 from swarm_server import DDatagram
+from pionsrv.decoder import BatchDecoder, as_matrix, format_ips
+from pionsrv.headless import HeadlessRenderer
+from pionsrv.metrics import MetricsRegistry, start_exporters
+from pionsrv.receiver import BatchReceiver
+from pionsrv.recorder import FlightLog, FlightRecorder, replay
+from pionsrv.renderer import SwarmRenderer
+from pionsrv.shared_state import TelemetryProcess
+from pionsrv.swarm_state import SwarmState
 
 
 def extract_ip_id(ip: str) -> str:
@@ -13,7 +21,6 @@ def extract_ip_id(ip: str) -> str:
     Возвращает последний октет IP как строку.
     Если не получается, возвращает хэш в диапазоне [0, 1000).
     """
-    print(ip)
     parts = ip.split(".")
     if len(parts) == 4:
         try:
@@ -24,278 +31,323 @@ def extract_ip_id(ip: str) -> str:
 
 
 class SwarmVisualizer2D:
-    def __init__(self, port=37020):
+    def __init__(self, port=37020, batch_receive=True, debug=False, headless_output=None, fps=30,
+                 record_path=None, replay_log=None, replay_speed=1.0, metrics=None, process_receive=False,
+                 shared_name=None):
         self.port = port
+        # headless_output: каталог для PNG или файл видео (.mp4, ...); None – окно matplotlib
+        self.headless_output = headless_output
+        self.fps = fps
+        self.debug = debug  # печать каждого пакета и угла yaw при отрисовке
         self.data_queue = Queue()
-        self.drones = {}  # ключи – исходный payload.id, значения – словари с данными дрона
-        self.colors = {}
         self.trails_length = 30
+        # Состояние роя: массивы NumPy, слот на каждый payload.id
+        self.state = SwarmState(trail_length=self.trails_length)
         self.running = True
-        self.lock = threading.Lock()  # Блокировка для синхронизации доступа
+        self.stop_event = threading.Event()
+        # Приём в отдельном процессе: состояние роя читается из общей памяти без блокировок,
+        # к ней же по имени (shared_name) могут подключиться консоль управления и другие процессы
+        self.telemetry_process = None
+        self.shared = None
+        if process_receive:
+            if replay_log is not None:
+                raise ValueError("Проигрывание журнала не поддерживается при приёме в отдельном процессе")
+            self.telemetry_process = TelemetryProcess(port, trail_length=self.trails_length, name=shared_name,
+                                                      record_path=record_path)
+            self.shared = self.telemetry_process.reader()
+            print(f"Приём телеметрии в отдельном процессе, общая память: {self.telemetry_process.name}")
+        # Журнал полёта: запись принятых пакетов или проигрывание записанного журнала вместо сети
+        # (при приёме в отдельном процессе пакеты записывает этот процесс)
+        self.recorder = FlightRecorder(record_path) if record_path and not process_receive else None
+        self.replay_log = replay_log
+        self.replay_speed = replay_speed
 
         # Словарь для сопоставления длинных id с короткими метками
         self.id_mapping = {}
 
-        # UDP сервер
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.sock.bind(("", self.port))
+        # Метрики (MetricsRegistry); None – выключены
+        self.metrics = metrics
+        if metrics is not None:
+            self.packets_metric = metrics.counter("telemetry_packets_total", "Принятые пакеты телеметрии")
+            self.decode_errors_metric = metrics.counter("decode_errors_total", "Пакеты, не прошедшие декодирование")
+            self.frame_metric = metrics.histogram("render_frame_seconds", "Время обновления кадра (update_plot)")
+            source = self.shared if self.shared is not None else self.state
+            metrics.gauge("drones", "Дроны на графике", func=lambda: source.count)
+            metrics.gauge("telemetry_staleness_seconds", "Время с последней телеметрии дрона", label="drone",
+                          func=source.staleness)
+
+        # UDP сервер (не нужен при проигрывании журнала)
+        self.sock = None
+        self.receiver = None
+        self.batch_decoder = None
+        self.receiver_thread = None
+        if self.telemetry_process is not None:
+            self.telemetry_process.start()
+        elif replay_log is None:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.sock.bind(("", self.port))
+            # Пакетный приём в пул буферов; None – по одному пакету через recvfrom
+            if batch_receive:
+                self.receiver = BatchReceiver(self.sock)
 
         # Запуск потока приёма данных
-        self.receiver_thread = threading.Thread(target=self.receive_data)
-        self.receiver_thread.daemon = True
-        self.receiver_thread.start()
-
-        # Инициализация графика
-        self.fig, self.ax = plt.subplots(figsize=(10, 8))
-        self.setup_plot()
-
-    def setup_plot(self):
-        self.ax.set_xlim(-5.5, 5.5)
-        self.ax.set_ylim(-5.5, 5.5)
-        self.ax.set_xlabel("X Position")
-        self.ax.set_ylabel("Y Position")
-        self.ax.set_title("Real-time 2D Drone Swarm Visualization")
-        self.ax.grid(True)
-        self.ax.set_aspect("equal")
+        if self.telemetry_process is None:
+            self.receiver_thread = threading.Thread(
+                target=self.receive_data if replay_log is None else self.replay_data
+            )
+            self.receiver_thread.daemon = True
+            self.receiver_thread.start()
+
+        # Инициализация графика (в headless-режиме график строит процесс рендера)
+        self.fig = None
+        self.last_frame = None
+        if headless_output is None:
+            self.fig, self.ax = plt.subplots(figsize=(10, 8))
+            self.renderer = SwarmRenderer(self.ax)
+            # Подписи: дрон под курсором и дроны, выбранные щелчком
+            self.fig.canvas.mpl_connect("motion_notify_event", self.on_hover)
+            self.fig.canvas.mpl_connect("button_press_event", self.on_click)
 
     def receive_data(self):
+        if self.receiver is not None:
+            self.receive_batches()
+            return
         decoder = DDatagram()
         while self.running:
             try:
                 data, addr = self.sock.recvfrom(4096)
                 valid, payload = decoder.read_serialized(data)
+                if not valid and self.metrics is not None:
+                    self.decode_errors_metric.inc()
                 # Проверяем, что данных достаточно (1 - IP, 3 - позиция, 3 - скорость)
                 if valid and len(payload.data) >= 7:
+                    if self.recorder is not None:
+                        self.recorder.record(data, payload.id)
                     self.process_payload(payload, addr)
             except Exception as e:
                 print(f"Receive error: {e}")
 
-    def process_payload(self, payload, addr):
-        with self.lock:
+    def receive_batches(self):
+        """
+        Приём пачками: все пакеты, накопившиеся в сокете, декодируются
+        BatchDecoder одним проходом и применяются к SwarmState одним векторным обновлением.
+        """
+        self.batch_decoder = BatchDecoder(self.receiver.batch_size)
+        while self.running:
+            try:
+                batch = self.receiver.receive_batch()
+            except (OSError, ValueError) as e:
+                if self.running:
+                    print(f"Receive error: {e}")
+                continue
+            if batch:
+                self.process_batch(batch)
+
+    def process_batch(self, batch):
+        """
+        Пачка [(байты пакета, адрес), ...]: декодирование и одно векторное обновление SwarmState.
+        """
+        if self.batch_decoder is None:
+            self.batch_decoder = BatchDecoder(len(batch))
+        records, index, _, errors = self.batch_decoder.decode([data for data, _ in batch])
+        if errors and self.metrics is not None:
+            self.decode_errors_metric.inc(errors)
+        if not len(records):
+            return
+        self.register_ids(records)
+        if self.recorder is not None:
+            for i, drone_id in zip(index.tolist(), records["id"].tolist()):
+                self.recorder.record(bytes(batch[i][0]), drone_id)
+        data = as_matrix(records)
+        if self.debug:
+            print(data)
+        self.state.update(records["id"].tolist(), data)
+        if self.metrics is not None:
+            self.packets_metric.inc(len(records))
+
+    def replay_data(self):
+        """
+        Проигрывание журнала FlightRecorder через тот же путь декодирования, что и приём из сети.
+        """
+        log = FlightLog(self.replay_log)
+        decoder = DDatagram()
+
+        def handle(data, drone_id, timestamp):
+            valid, payload = decoder.read_serialized(data)
+            if valid and len(payload.data) >= 7:
+                self.process_payload(payload, None)
+
+        try:
+            played = replay(log, handle, speed=self.replay_speed, stop_event=self.stop_event)
+            print(f"Журнал {self.replay_log} проигран, записей: {played}")
+        finally:
+            log.close()
+
+    def register_id(self, payload):
+        # Если для данного payload.id ещё не определена короткая метка, вычисляем её:
+        if payload.id not in self.id_mapping:
             # Извлечение ip из данных
             try:
                 ip_num = int(payload.data[0])
                 ip = socket.inet_ntoa(ip_num.to_bytes(4, byteorder="big"))
             except (OverflowError, IndexError):
                 ip = "Invalid IP"
+            self.assign_label(payload.id, ip)
+
+    def register_ids(self, records):
+        """
+        То же для пачки записей BatchDecoder: IP переводятся в строки только для новых id.
+        """
+        ids = records["id"].tolist()
+        unknown = [i for i, drone_id in enumerate(ids) if drone_id not in self.id_mapping]
+        if unknown:
+            for i, ip in zip(unknown, format_ips(records["ip"][unknown])):
+                if ids[i] not in self.id_mapping:
+                    self.assign_label(ids[i], ip)
+
+    def assign_label(self, drone_id, ip: str):
+        base = extract_ip_id(ip)
+        # Считаем, сколько уже есть меток с таким базовым значением
+        duplicates = [v for v in self.id_mapping.values() if v.startswith(base)]
+        if duplicates:
+            short_id = f"{base}-{len(duplicates) + 1}"
+        else:
+            short_id = base
+        self.id_mapping[drone_id] = short_id
 
-            # Если для данного payload.id ещё не определена короткая метка, вычисляем её:
-            if payload.id not in self.id_mapping:
-                base = extract_ip_id(ip)
-                # Считаем, сколько уже есть меток с таким базовым значением
-                duplicates = [v for v in self.id_mapping.values() if v.startswith(base)]
-                if duplicates:
-                    short_id = f"{base}-{len(duplicates) + 1}"
-                else:
-                    short_id = base
-                self.id_mapping[payload.id] = short_id
-
-            short_id = self.id_mapping[payload.id]
-
-            # Извлекаем позицию: индексы 1, 2, 3
-            position = np.array(
-                [
-                    payload.data[1],  # X
-                    payload.data[2],  # Y
-                    payload.data[3],  # Z
-                ]
-            )
-
-            # Извлекаем скорость: индексы 4, 5, 6
-            velocity = np.array(
-                [
-                    payload.data[4],  # Vx
-                    payload.data[5],  # Vy
-                    payload.data[6],  # Vz
-                ]
-            )
+    def process_payload(self, payload, addr):
+        self.register_id(payload)
+        if self.metrics is not None:
+            self.packets_metric.inc()
+        if self.debug:
             print(payload.data)
-            attitude = (
-                np.array(payload.data[7:13]) if len(payload.data) >= 7 else np.zeros(3)
-            )
-            t_speed = (
-                np.array(payload.data[13:17])
-                if len(payload.data) >= 14
-                else np.zeros(4)
-            )
-            if payload.id not in self.drones:
-                self.colors[payload.id] = np.random.rand(
-                    3,
-                )
-                self.drones[payload.id] = {
-                    "position": position,
-                    "attitude": attitude,
-                    "velocity": velocity,
-                    "t_speed": t_speed,
-                    "trail": [],
-                    "ip": ip,
-                    "last_update": time.time(),
-                    "short_id": ip_num,
-                }
-            else:
-                self.drones[payload.id]["position"] = position
-                self.drones[payload.id]["attitude"] = attitude
-                self.drones[payload.id]["velocity"] = velocity
-                self.drones[payload.id]["t_speed"] = t_speed
-                self.drones[payload.id]["last_update"] = time.time()
-                trail = self.drones[payload.id]["trail"]
-                trail.append(position.copy()[:2])
-                if len(trail) > self.trails_length:
-                    trail.pop(0)
+        # Позиция – индексы 1..3, скорость – 4..6, ориентация – 7..12, t_speed – 13..16
+        self.state.update_one(payload.id, payload.data)
 
     def update_plot(self, frame):
-        with self.lock:
-            self.ax.clear()
-            self.setup_plot()
-
-            current_time = time.time()
-            to_delete = []
-
-            # Итерация по дронам
-            for drone_key in list(self.drones.keys()):
-                data = self.drones[drone_key]
-
-                # Удаляем неактивных дронов (без обновлений >3 сек)
-                if current_time - data["last_update"] > 3:
-                    to_delete.append(drone_key)
-                    continue
-
-                color = self.colors[drone_key]
-                pos = data["position"]
-                trail = np.array(data["trail"])
-                velocity = data["velocity"]
-
-                # Рисуем дрона (точка)
-                size = 80 + pos[2] * 5
-                self.ax.scatter(
-                    pos[0],
-                    pos[1],
-                    c=[color],
-                    s=size,
-                    marker="o",
-                    edgecolors="k",
-                    label=f"Drone {data['short_id']}",
-                )
-
-                # Текст с высотой
-                self.ax.text(
-                    pos[0] + 0.3,
-                    pos[1] + 0.3,
-                    f"{pos[2]:.1f}m",
-                    color=color,
-                    fontsize=8,
-                )
-
-                # Рисуем траекторию (след)
-                if len(trail) > 1:
-                    self.ax.plot(
-                        trail[:, 0],
-                        trail[:, 1],
-                        c=color,
-                        linestyle=":",
-                        alpha=0.6,
-                        linewidth=1,
-                    )
-
-                # Рассчитываем угол (yaw) из вектора скорости (если ненулевой)
-                # if np.linalg.norm(velocity[:2]) > 0.001:
-                #     yaw = np.arctan2(velocity[1], velocity[0])
-                # else:
-                #     yaw = 0
-                yaw = data["attitude"][2]
-                t_speed = data["t_speed"]
-                # Рисуем стрелку направления (yaw) с фиксированной длиной
-                self.draw_orientation(pos[:2], yaw, color)
-                self.draw_t_speed_vector(pos[:2], t_speed, "red")
-                # Рисуем вектор скорости (масштабированный по модулю)
-                self.draw_velocity_vector(pos[:2], velocity, color)
-
-            # Удаление неактивных дронов
-            for did in to_delete:
-                del self.drones[did]
-                del self.colors[did]
-                # Не удаляем соответствующую запись из id_mapping, чтобы при повторном появлении тот же short_id использоваться было согласованно
-
-            if self.drones:
-                self.ax.legend(loc="upper right", bbox_to_anchor=(1.15, 1))
-
-        return self.ax
-
-    def draw_orientation(self, position, yaw, color):
-        print("draw_orientation, yaw = ", yaw)
-        arrow_length = 1.2  # фиксированная длина стрелки направления
-        dx = arrow_length * np.cos(yaw + np.pi / 2)
-        dy = arrow_length * np.sin(yaw + np.pi / 2)
-        self.ax.quiver(
-            position[0],
-            position[1],
-            dx,
-            dy,
-            color=color,
-            angles="xy",
-            scale_units="xy",
-            scale=1,
-            width=0.003,
-            headwidth=4,
-            headlength=5,
-        )
-
-    def draw_velocity_vector(self, position, velocity, color):
-        factor = 10  # масштабирование вектора скорости
-        arrow_dx = velocity[0] * factor
-        arrow_dy = velocity[1] * factor
-        self.ax.quiver(
-            position[0],
-            position[1],
-            arrow_dx,
-            arrow_dy,
-            color=color,
-            angles="xy",
-            scale_units="xy",
-            scale=1,
-            width=0.005,
-            headwidth=5,
-            headlength=7,
-            alpha=0.8,
-        )
-
-    def draw_t_speed_vector(self, position, t_speed, color):
-        factor = 1  # масштабирование вектора скорости
-        arrow_dx = t_speed[0] * factor
-        arrow_dy = t_speed[1] * factor
-        self.ax.quiver(
-            position[0],
-            position[1],
-            arrow_dx,
-            arrow_dy,
-            color=color,
-            angles="xy",
-            scale_units="xy",
-            scale=1,
-            width=0.005,
-            headwidth=5,
-            headlength=7,
-            alpha=0.8,
-        )
-
-    def run(self):
+        # Удаляем неактивных дронов (без обновлений >3 сек).
+        # Запись в id_mapping не удаляем, чтобы при повторном появлении использовался тот же short_id
+        started = time.perf_counter()
+        snap = self.current_frame()
+        if snap is None:
+            return self.renderer.draw(self.last_frame) if self.last_frame is not None else []
+        self.last_frame = snap
+        artists = self.renderer.draw(snap)
+        if self.metrics is not None:
+            self.frame_metric.observe(time.perf_counter() - started)
+        return artists
+
+    def on_hover(self, event):
+        self.renderer.hovered = self.renderer.pick(event.xdata, event.ydata) if event.inaxes is self.ax else None
+
+    def on_click(self, event):
+        if event.inaxes is not self.ax:
+            return
+        drone_id = self.renderer.pick(event.xdata, event.ydata)
+        if drone_id is not None:
+            self.renderer.selected ^= {drone_id}
+
+    def current_frame(self):
+        """
+        Снимок для отрисовки: из общей памяти (приём в отдельном процессе) или из SwarmState.
+        None – снимок из общей памяти не прочитан, рисуется предыдущий.
+        """
+        if self.shared is not None:
+            # Неактивных дронов удаляет процесс приёма
+            return self.shared.frame()
+        self.state.expire(3)
+        snap = self.state.snapshot()
+        snap["trails"] = self.state.trails_ordered()
+        return snap
+
+    def run(self, interval=33, duration=None):
+        if self.headless_output is not None:
+            self.run_headless(duration)
+            return
         ani = FuncAnimation(
-            self.fig, self.update_plot, interval=500, cache_frame_data=False
+            self.fig, self.update_plot, interval=interval, blit=True, cache_frame_data=False
         )
         plt.show()
 
+    def run_headless(self, duration=None):
+        """
+        Headless-режим: с частотой fps снимок состояния передаётся в процесс
+        рендера (Agg), который пишет PNG-кадры или видео через ffmpeg.
+        Приём телеметрии остаётся в этом процессе и не ждёт отрисовку.
+        """
+        renderer = HeadlessRenderer(self.headless_output, fps=self.fps)
+        renderer.start()
+        period = 1.0 / self.fps
+        start = time.monotonic()
+        next_frame = start
+        try:
+            while self.running and (duration is None or next_frame - start < duration):
+                delay = next_frame - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                if self.shared is not None:
+                    frame = self.shared.frame()
+                    if frame is not None:
+                        renderer.submit(frame)
+                else:
+                    self.state.expire(3)
+                    renderer.submit(self.state.frame())
+                next_frame += period
+        finally:
+            renderer.close()
+            print(f"Кадров отправлено в рендер: {renderer.submitted}, пропущено: {renderer.dropped}")
+
     def shutdown(self):
         self.running = False
-        self.sock.close()
-        plt.close("all")
+        self.stop_event.set()
+        if self.receiver is not None:
+            print("Статистика приёма:", self.receiver.stats())
+        if self.telemetry_process is not None:
+            print("Статистика приёма:", self.shared.stats())
+            self.telemetry_process.close()
+            self.telemetry_process = None
+            self.shared = None
+        if self.sock is not None:
+            self.sock.close()
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if self.fig is not None:
+            plt.close("all")
 
 
 if __name__ == "__main__":
-    visualizer = SwarmVisualizer2D(port=37020)
+    parser = argparse.ArgumentParser(description="2D-визуализация телеметрии роя")
+    parser.add_argument("--port", type=int, default=37020)
+    parser.add_argument("--headless", metavar="OUTPUT", default=None,
+                        help="без окна: каталог для PNG-кадров или файл видео (.mp4, .mkv, ...)")
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--duration", type=float, default=None, help="длительность записи, с")
+    parser.add_argument("--debug", action="store_true", help="печатать каждый пакет")
+    parser.add_argument("--record", default=None, help="записывать принятые пакеты в журнал")
+    parser.add_argument("--replay", default=None, help="проиграть журнал вместо приёма из сети")
+    parser.add_argument("--speed", type=float, default=1.0, help="скорость проигрывания, 0 – без пауз")
+    parser.add_argument("--metrics-port", type=int, default=None, help="HTTP-порт метрик (/metrics, /metrics.json)")
+    parser.add_argument("--metrics-json", default=None, help="файл для периодической записи метрик в JSON")
+    parser.add_argument("--process-receive", action="store_true",
+                        help="приём и декодирование в отдельном процессе, состояние – в общей памяти")
+    parser.add_argument("--shared-name", default=None,
+                        help="имя блока общей памяти (для подключения консоли: --shared-state)")
+    args = parser.parse_args()
+
+    metrics = MetricsRegistry() if args.metrics_port is not None or args.metrics_json else None
+    visualizer = SwarmVisualizer2D(port=args.port, debug=args.debug, headless_output=args.headless, fps=args.fps,
+                                   record_path=args.record, replay_log=args.replay, replay_speed=args.speed,
+                                   metrics=metrics, process_receive=args.process_receive,
+                                   shared_name=args.shared_name)
+    exporters = start_exporters(metrics, args.metrics_port, args.metrics_json) if metrics is not None else []
     try:
-        visualizer.run()
+        visualizer.run(duration=args.duration)
     except KeyboardInterrupt:
-        visualizer.shutdown()
+        pass
     finally:
+        # Метрики читают состояние визуализатора – экспорт закрывается до его остановки
+        for exporter in exporters:
+            exporter.close()
         visualizer.shutdown()
@@ -0,0 +1,271 @@
+import asyncio
+import itertools
+import os
+import sys
+import threading
+from swarm_server import CMD
+from pionsrv.commands import CommandError, compile_line
+from pionsrv.control_server import ControlServer, build_parser, server_options
+from pionsrv.metrics import MetricsRegistry, start_exporters
+from pionsrv.scheduler import format_lateness, summarize_lateness
+# Команды безопасности: отправляются в обход очереди транспорта и останавливают скрипты
+from pionsrv.send_queue import SAFETY_COMMANDS
+
+
+class _CommandProtocol(asyncio.DatagramProtocol):
+    def error_received(self, exc):
+        print(f"Ошибка отправки: {exc}")
+
+
+def _pipe_lines(fd: int):
+    """
+    Строки из файлового дескриптора без буфера sys.stdin.
+    """
+    buffer = b""
+    while True:
+        while b"\n" not in buffer:
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                if buffer:
+                    yield buffer.decode()
+                return
+            buffer += chunk
+        line, buffer = buffer.split(b"\n", 1)
+        yield line.decode()
+
+
+class AsyncControlServer(ControlServer):
+    """
+    Асинхронный режим управляющей консоли.
+
+    Сокет UDPBroadcastClient оборачивается в datagram endpoint asyncio, ввод
+    консоли читается в отдельном daemon-потоке (не задерживает выход по Ctrl+C),
+    а скрипты выполняются как отменяемые задачи – несколько скриптов могут идти
+    одновременно. sleep в консоли не выполняется: он задержал бы ввод, в том числе
+    аварийный land, – задержки пишутся в скриптах.
+
+    Команды из консоли исполняются сразу по вводу, между шагами скриптов.
+    stop/land/disarm, введённые вручную, отправляются напрямую в сокет
+    (без очереди транспорта) и отменяют все работающие скрипты, чтобы
+    следующий goto из скрипта не перебил аварийную посадку.
+
+    Дополнительные команды консоли:
+      scripts                    - список работающих скриптов
+      cancel <номер|all>         - остановить скрипт
+    """
+
+    def __init__(self, *args, cancel_scripts_on_safety: bool = True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cancel_scripts_on_safety = cancel_scripts_on_safety
+        self.transport = None
+        self.loop = None
+        self.scripts = {}
+        self._script_ids = itertools.count(1)
+        self.server_handlers["script"] = self.start_script
+        self.server_handlers["play"] = self.start_play
+
+    def transmit(self, serialized: bytes, command: CMD) -> None:
+        if self.transport is None:
+            super().transmit(serialized, command)
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Вызов из потока очереди отправки: транспорт asyncio не потокобезопасен
+            self.loop.call_soon_threadsafe(self._transport_send, serialized, command)
+            return
+        self._transport_send(serialized, command)
+
+    def _transport_send(self, serialized: bytes, command: CMD) -> None:
+        if self.transport is None:
+            super().transmit(serialized, command)
+            return
+        address = ("<broadcast>", self.broadcast_port)
+        if command in SAFETY_COMMANDS:
+            try:
+                self.client.socket.sendto(serialized, address)
+                return
+            except BlockingIOError:
+                pass
+        self.transport.sendto(serialized, address)
+
+    def start_script(self, filename: str):
+        """
+        Компилирует скрипт и запускает его отдельной задачей. Возвращает задачу или None.
+        """
+        timeline = self.load_script(filename)
+        if timeline is None:
+            return None
+        script_id = next(self._script_ids)
+
+        def execute(command):
+            print(f"[{script_id}] > {command.source}")
+            self.execute(command)
+
+        return self._start_timeline(script_id, filename, timeline, execute)
+
+    def start_play(self, filename: str):
+        """
+        Запускает проигрывание траектории отдельной задачей (отменяется как скрипт). Возвращает задачу или None.
+        """
+        trajectory = self.load_trajectory(filename)
+        if trajectory is None:
+            return None
+        timeline = self.playback_timeline(trajectory)
+        return self._start_timeline(next(self._script_ids), filename, timeline,
+                                    lambda t: self.send_setpoints(trajectory, t))
+
+    def _start_timeline(self, script_id: int, filename: str, timeline: list, execute):
+        task = asyncio.get_running_loop().create_task(self._run_script(script_id, filename, timeline, execute))
+        self.scripts[script_id] = (filename, task)
+        print(f"Скрипт {script_id} запущен: {filename}")
+        return task
+
+    async def _run_script(self, script_id: int, filename: str, timeline: list, execute) -> None:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        lateness = []
+        try:
+            for offset, item in timeline:
+                deadline = start + offset
+                delay = deadline - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                lateness.append(loop.time() - deadline)
+                execute(item)
+            print(f"Скрипт {script_id} ({filename}) завершён.")
+        except asyncio.CancelledError:
+            print(f"Скрипт {script_id} ({filename}) остановлен.")
+            raise
+        finally:
+            self.scripts.pop(script_id, None)
+            print(f"[{script_id}] " + format_lateness(summarize_lateness(lateness)))
+
+    def cancel_scripts(self, script_id: str = "all") -> None:
+        if script_id == "all":
+            ids = list(self.scripts)
+        else:
+            try:
+                ids = [int(script_id)]
+            except ValueError:
+                print("Использование: cancel <номер|all>")
+                return
+        for sid in ids:
+            entry = self.scripts.get(sid)
+            if entry is None:
+                print(f"Скрипт {sid} не найден.")
+                continue
+            entry[1].cancel()
+
+    def list_scripts(self) -> None:
+        if not self.scripts:
+            print("Нет работающих скриптов.")
+        for sid, (filename, _) in self.scripts.items():
+            print(f"  {sid}: {filename}")
+
+    async def handle_line(self, line: str) -> None:
+        """
+        Обработка строки, введённой в консоли.
+        """
+        parts = line.split()
+        if parts[0].lower() == "scripts":
+            self.list_scripts()
+            return
+        if parts[0].lower() == "cancel":
+            self.cancel_scripts(parts[1] if len(parts) > 1 else "all")
+            return
+        try:
+            command = compile_line(line)
+        except CommandError as e:
+            print(e)
+            return
+        if command is None:
+            return
+        if command.spec.name == "sleep":
+            print("sleep в асинхронной консоли не выполняется: задержки – в скрипте (sleep или @t=).")
+            return
+        if command.spec.name == "discover":
+            # Поиск длится около секунды – не задерживаем скрипты и отправку
+            await asyncio.get_running_loop().run_in_executor(None, self.execute, command)
+            return
+        if command.spec.cmd in SAFETY_COMMANDS and self.cancel_scripts_on_safety and self.scripts:
+            print("Команда безопасности: работающие скрипты останавливаются.")
+            self.execute(command)
+            self.cancel_scripts()
+            return
+        self.execute(command)
+
+    @staticmethod
+    def _read_console(loop, lines: asyncio.Queue, ready: threading.Event) -> None:
+        """
+        Поток чтения консоли: следующая строка запрашивается после обработки предыдущей (ready),
+        None в очереди – конец ввода. Терминал читается через input() (readline, история),
+        перенаправленный ввод – os.read: daemon-поток, ждущий в буферизованном sys.stdin,
+        не даёт интерпретатору завершиться по Ctrl+C.
+        """
+        piped = None if sys.stdin.isatty() else _pipe_lines(sys.stdin.fileno())
+        while True:
+            ready.wait()
+            ready.clear()
+            try:
+                if piped is None:
+                    line = input("Command> ")
+                else:
+                    print("Command> ", end="", flush=True)
+                    line = next(piped)
+            except (EOFError, KeyboardInterrupt, StopIteration):
+                line = None
+            try:
+                loop.call_soon_threadsafe(lines.put_nowait, line)
+            except RuntimeError:
+                return  # цикл событий уже закрыт
+            if line is None:
+                return
+
+    async def console_loop_async(self) -> None:
+        loop = self.loop = asyncio.get_running_loop()
+        self.transport, _ = await loop.create_datagram_endpoint(_CommandProtocol, sock=self.client.socket)
+        print("Запущен асинхронный консольный интерфейс управления.")
+        lines = asyncio.Queue()
+        ready = threading.Event()
+        threading.Thread(target=self._read_console, args=(loop, lines, ready), daemon=True).start()
+        try:
+            while True:
+                ready.set()
+                line = await lines.get()
+                if line is None:
+                    print("\nВыход из консоли.")
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                if line.lower() in ["exit", "quit"]:
+                    print("Выход из консоли.")
+                    break
+                await self.handle_line(line)
+        finally:
+            tasks = [task for _, task in self.scripts.values()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.transport.close()
+            self.transport = None
+
+
+def main():
+    args = build_parser("Асинхронная консоль управления роем").parse_args()
+    metrics = MetricsRegistry() if args.metrics_port is not None or args.metrics_json else None
+    cs = AsyncControlServer(**server_options(args, metrics))
+    exporters = start_exporters(metrics, args.metrics_port, args.metrics_json) if metrics is not None else []
+    try:
+        asyncio.run(cs.console_loop_async())
+    except KeyboardInterrupt:
+        print("\nВыход из консоли.")
+    finally:
+        cs.close()
+        for exporter in exporters:
+            exporter.close()
+
+
+if __name__ == '__main__':
+    main()
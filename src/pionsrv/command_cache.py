@@ -0,0 +1,65 @@
+from collections import OrderedDict
+from swarm_server import DDatagram, CMD
+
+
+class CommandCache:
+    """
+    Ограниченный LRU-кеш сериализованных команд.
+
+    Ключ кеша – (команда, target_id, group_id, данные). Повторная отправка той же
+    команды тому же адресату возвращает уже готовые байты без сборки DDatagram.
+
+    Для параметризованных команд (goto, set_speed, ...) хранится заготовка DDatagram
+    с заполненным заголовком: при промахе меняется только поле data. Сам protobuf
+    и MD5-хеш всё равно пересчитываются, так как хеш покрывает весь пакет и
+    «заплатка» отдельных байт полезной нагрузки сделала бы его недействительным.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._frames = OrderedDict()
+        self._templates = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, command: CMD, data: list, target_id: str = "", group_id: int = 0) -> bytes:
+        """
+        Возвращает сериализованную команду, собирая её только при промахе кеша.
+        """
+        header = (command.value, target_id, group_id)
+        key = header + (tuple(data),)
+        frame = self._frames.get(key)
+        if frame is not None:
+            self._frames.move_to_end(key)
+            self.hits += 1
+            return frame
+
+        self.misses += 1
+        dt = self._templates.get(header)
+        if dt is None:
+            dt = DDatagram()
+            dt.command = command.value
+            dt.target_id = target_id
+            dt.group_id = group_id
+            self._templates[header] = dt
+            if len(self._templates) > self.maxsize:
+                self._templates.popitem(last=False)
+        else:
+            self._templates.move_to_end(header)
+        dt.data = list(data)
+        frame = dt.export_serialized()
+
+        self._frames[key] = frame
+        if len(self._frames) > self.maxsize:
+            self._frames.popitem(last=False)
+        return frame
+
+    def clear(self) -> None:
+        self._frames.clear()
+        self._templates.clear()
+
+    def stats(self) -> dict:
+        """
+        Счётчики попаданий и промахов кеша.
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._frames)}
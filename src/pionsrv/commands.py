@@ -0,0 +1,160 @@
+from dataclasses import dataclass
+from typing import Iterable, Optional
+from swarm_server import CMD
+
+
+class CommandError(ValueError):
+    """
+    Ошибка разбора строки команды. Хранит номер строки скрипта (если известен).
+    """
+
+    def __init__(self, message: str, line_no: Optional[int] = None):
+        super().__init__(message)
+        self.message = message
+        self.line_no = line_no
+
+    def __str__(self):
+        if self.line_no is None:
+            return self.message
+        return f"строка {self.line_no}: {self.message}"
+
+
+@dataclass(frozen=True)
+class CommandSpec:
+    """
+    Описание команды: имя, CMD для отправки (None – локальная команда сервера),
+    типы аргументов и строка использования.
+    """
+    name: str
+    cmd: Optional[CMD]
+    arg_types: tuple
+    usage: str
+
+    @property
+    def arity(self) -> int:
+        return len(self.arg_types)
+
+
+@dataclass(frozen=True)
+class CompiledCommand:
+    """
+    Разобранная и проверенная команда, готовая к исполнению без повторного разбора.
+    """
+    spec: CommandSpec
+    target: Optional[str]
+    args: tuple
+    line_no: Optional[int] = None
+    source: str = ""
+    at: Optional[float] = None
+
+
+def _spec(name, cmd, arg_types, usage):
+    return CommandSpec(name, cmd, tuple(arg_types), usage)
+
+
+# Команды, отправляемые дронам: [target] command [параметры]
+DRONE_COMMANDS = {
+    spec.name: spec for spec in (
+        _spec("set_speed", CMD.SET_SPEED, (float,) * 4, "[target] set_speed vx vy vz yaw_rate"),
+        _spec("setgroup", CMD.SET_GROUP, (int,), "[target] setgroup <новая_группа>"),
+        _spec("goto", CMD.GOTO, (float,) * 4, "[target] goto x y z yaw"),
+        _spec("smart_goto", CMD.SMART_GOTO, (float,) * 4, "[target] smart_goto x y z yaw"),
+        _spec("takeoff", CMD.TAKEOFF, (), "[target] takeoff"),
+        _spec("land", CMD.LAND, (), "[target] land"),
+        _spec("arm", CMD.ARM, (), "[target] arm"),
+        _spec("disarm", CMD.DISARM, (), "[target] disarm"),
+        _spec("trp", CMD.SWARM_ON, (), "[target] trp"),
+        _spec("stop", CMD.STOP, (), "[target] stop"),
+        _spec("save", CMD.SAVE, (), "[target] save"),
+        _spec("set_mode", CMD.SET_MOD, (int,), "[target] set_mode [1 или 2 или 3]"),
+        _spec("led", CMD.LED, (int,) * 4, "[target] led led_id r g b"),
+    )
+}
+
+# Локальные команды сервера: command [параметры]
+SERVER_COMMANDS = {
+    spec.name: spec for spec in (
+        _spec("sleep", None, (float,), "sleep <сек>"),
+        _spec("script", None, (str,), "script <имя_файла>"),
+        _spec("play", None, (str,), "play <файл_траектории.csv|.npy|.npz>"),
+        _spec("updategroups", None, (), "updategroups"),
+        _spec("status", None, (), "status"),
+        _spec("delivery", None, (), "delivery"),
+        _spec("discover", None, (), "discover"),
+        _spec("proximity", None, (), "proximity"),
+    )
+}
+
+
+# Серверные команды, которые принимаются и с target (как "all updategroups" до реестра команд);
+# target при этом не используется
+TARGET_TOLERANT_SERVER_COMMANDS = frozenset({"updategroups"})
+
+
+def _convert(spec: CommandSpec, tokens: list, line_no: Optional[int]) -> tuple:
+    if len(tokens) != spec.arity:
+        raise CommandError(f"Использование: {spec.usage}", line_no)
+    try:
+        return tuple(t(v) for t, v in zip(spec.arg_types, tokens))
+    except ValueError:
+        raise CommandError(f"Неверные параметры для {spec.name}", line_no) from None
+
+
+def compile_line(line: str, line_no: Optional[int] = None) -> Optional[CompiledCommand]:
+    """
+    Компилирует одну строку в CompiledCommand.
+    Для пустых строк и комментариев (#) возвращает None, при ошибке бросает CommandError.
+    Строка может начинаться с метки времени @t=<сек> (время от начала скрипта).
+    """
+    parts = line.strip().split()
+    if not parts or parts[0].startswith("#"):
+        return None
+
+    at = None
+    if parts[0].lower().startswith("@t="):
+        try:
+            at = float(parts[0][3:])
+        except ValueError:
+            raise CommandError(f"Неверная метка времени {parts[0]}", line_no) from None
+        if at < 0:
+            raise CommandError(f"Метка времени не может быть отрицательной: {parts[0]}", line_no)
+        parts = parts[1:]
+        if not parts:
+            raise CommandError("Не указана команда.", line_no)
+
+    spec = SERVER_COMMANDS.get(parts[0].lower())
+    if spec is not None:
+        return CompiledCommand(spec, None, _convert(spec, parts[1:], line_no), line_no, line.strip(), at)
+
+    if len(parts) < 2:
+        raise CommandError("Не указана команда.", line_no)
+    if parts[1].lower() in TARGET_TOLERANT_SERVER_COMMANDS:
+        spec = SERVER_COMMANDS[parts[1].lower()]
+        return CompiledCommand(spec, None, _convert(spec, parts[2:], line_no), line_no, line.strip(), at)
+    spec = DRONE_COMMANDS.get(parts[1].lower())
+    if spec is None:
+        raise CommandError(
+            "Неизвестная команда. Доступны: " + ", ".join(list(DRONE_COMMANDS) + list(SERVER_COMMANDS)),
+            line_no,
+        )
+    target = "<broadcast>" if parts[0].lower() == "all" else parts[0]
+    return CompiledCommand(spec, target, _convert(spec, parts[2:], line_no), line_no, line.strip(), at)
+
+
+def compile_script(lines: Iterable[str]) -> tuple:
+    """
+    Компилирует все строки скрипта. Возвращает (список команд, список ошибок);
+    ошибки собираются целиком, чтобы сообщить о каждой до начала отправки.
+    """
+    compiled = []
+    errors = []
+    for line_no, line in enumerate(lines, start=1):
+        try:
+            command = compile_line(line, line_no)
+        except CommandError as e:
+            errors.append(e)
+            continue
+        if command is not None:
+            compiled.append(command)
+    return compiled, errors
+
@@ -1,10 +1,28 @@
+import argparse
 import os
-import json
 import readline
 import atexit
+import sys
+import threading
 import time
 from queue import Queue
+from typing import Optional
+import numpy as np
 from swarm_server import DDatagram, UDPBroadcastClient, CMD
+from pionsrv.command_cache import CommandCache
+from pionsrv.commands import CommandError, CompiledCommand, compile_line, compile_script
+from pionsrv.discovery import NetworkScanner
+from pionsrv.fanout import UnicastFanout
+from pionsrv.metrics import MetricsRegistry, start_exporters
+from pionsrv.proximity import ProximityMonitor
+from pionsrv.recorder import TX, FlightRecorder
+from pionsrv.registry import SwarmRegistry
+from pionsrv.reliable import ReliableSender
+from pionsrv.telemetry import TelemetryReceiver, TelemetryTable
+from pionsrv.send_queue import SendQueue
+from pionsrv.shared_state import SharedSwarmState
+from pionsrv.scheduler import TimelineScheduler, build_timeline, format_lateness, summarize_lateness
+from pionsrv.trajectory import Trajectory, load_trajectory_data
 
 history_file = os.path.join(os.path.expanduser("~"), ".my_console_history")
 if os.path.exists(history_file):
@@ -12,12 +30,12 @@ if os.path.exists(history_file):
 atexit.register(readline.write_history_file, history_file)
 
 
-def load_drone_config(config_file: str = "drones_config.json"):
-    if os.path.exists(config_file):
-        with open(config_file, "r") as f:
-            return json.load(f)
-    else:
-        return {}
+# Команды движения, для которых действует проверка gate_motion
+MOTION_COMMANDS = frozenset({CMD.GOTO, CMD.SMART_GOTO, CMD.SET_SPEED})
+# Команды с целью-точкой, которую проверяет контроль сближения
+TARGET_COMMANDS = frozenset({CMD.GOTO, CMD.SMART_GOTO})
+# После этих команд дрон больше не летит к своей цели
+TARGET_CLEAR_COMMANDS = frozenset({CMD.LAND, CMD.DISARM, CMD.STOP})
 
 
 #####################################
@@ -35,188 +53,508 @@ class ControlServer:
       g:1 takeoff                - дронам группы 1 выполнить takeoff
       g:2 goto 1 1 1 1            - дронам группы 2 выполнить goto с координатами 1 1 1 1
       8001 arm                   - дрону с id 8001 выполнить arm
+      g:1+g:2 land               - дронам групп 1 и 2 выполнить land
+      8000-8005 arm              - известным дронам с id от 8000 до 8005 выполнить arm
+      t:left takeoff             - дронам с тегом left (поле tags в drones_config.json)
 
     Дополнительно:
       script <имя_файла>         - выполнить команды из файла, каждая команда с новой строки.
+      play <файл>               - проиграть траекторию (t, id, x, y, z, yaw) уставками с частотой play_rate
       sleep <сек>               - задержка на указанное число секунд (работает при выполнении скрипта или при вводе с консоли)
+      @t=<сек> [target] command - в скрипте: выполнить команду в момент <сек> от начала скрипта
+      status                    - таблица состояний дронов (позиция, скорость, ориентация, время с последнего пакета)
+      delivery                  - статистика очереди отправки, unicast и доставки (режим reliable)
+      updategroups              - отправить дронам группы, изменившиеся в drones_config.json
+      discover                  - найти дроны в сети (телеметрия и опрос discover_subnet) и запомнить их адреса
+      proximity                 - текущие и предсказанные сближения дронов (запуск с separation)
     """
 
-    def __init__(self, broadcast_port: int = 37020, path_to_config: str = "./scripts/drones_config.json"):
+    def __init__(self, broadcast_port: int = 37020, path_to_config: str = "./scripts/drones_config.json",
+                 command_cache_size: int = 256, telemetry: bool = True, gate_motion: bool = False,
+                 record_path: Optional[str] = None, reliable: bool = False, unicast: bool = True,
+                 play_rate: float = 10.0, play_mode: str = "goto", send_rate: float = 0.0,
+                 metrics: Optional[MetricsRegistry] = None, discover_subnet: Optional[str] = None,
+                 shared_state: Optional[str] = None, separation: Optional[float] = None,
+                 conflict_horizon: float = 2.0, reject_conflicts: bool = False):
         self.path_to_config = path_to_config
+        # Сообщения фоновых потоков (notify) не разрывают строку ввода консоли
+        self._output_lock = threading.Lock()
         self.client = UDPBroadcastClient(port=broadcast_port, unique_id=666)
         self.broadcast_port = broadcast_port
         self.receive_queue = Queue()
-        # Загружаем конфигурацию групп дронов
-        self.drone_config = load_drone_config(path_to_config)
+        # Таблица состояний дронов по телеметрии (команда status)
+        self.telemetry = TelemetryTable()
+        self.telemetry_receiver = None
+        # Состояние роя из общей памяти процесса приёма (визуализатор с --process-receive), только чтение
+        self.shared_state = SharedSwarmState.attach(shared_state) if shared_state else None
+        # Если True, команды движения конкретному дрону отправляются только живым дронам после arm
+        self.gate_motion = gate_motion
+        # Метрики (MetricsRegistry); None – метрики выключены
+        self.metrics = metrics
+        # Журнал полёта: принятая телеметрия и отправленные команды
+        self.recorder = FlightRecorder(record_path) if record_path else None
+        # Команды одному дрону – unicast на его известный адрес, группам и all – широковещательно
+        self.fanout = UnicastFanout(port=broadcast_port) if unicast else None
+        # Очередь отправки: ограничение скорости, приоритеты, замена устаревших уставок (0 – без очереди)
+        self.send_queue = SendQueue(self.deliver, rate=send_rate) if send_rate > 0 else None
+        # Надёжная доставка: номер последовательности в token, ack от дронов, выборочные повторы
+        self.reliable = ReliableSender(self.send_frame, self.drone_address) if reliable else None
+        # Контроль сближения по телеметрии (None – выключен); reject_conflicts – не отправлять
+        # goto/smart_goto (и уставки play), если цель дрона ближе separation к цели или позиции другого дрона
+        self.proximity = ProximityMonitor(separation, conflict_horizon, notify=self.notify) if separation else None
+        self.reject_conflicts = reject_conflicts
+        self._setpoint_conflicts = set()
+        if telemetry:
+            try:
+                self.telemetry_receiver = TelemetryReceiver(
+                    self.receive_queue, self.telemetry, port=broadcast_port, recorder=self.recorder,
+                    ack_handler=self.reliable.ack if self.reliable is not None else None, metrics=metrics,
+                    monitor=self.proximity,
+                )
+                self.telemetry_receiver.start()
+            except OSError as error:
+                print("Приём телеметрии не запущен:", error)
+        # Проигрывание траекторий: частота уставок (Гц) и команда – goto (позиция) или speed (скорость)
+        self.play_rate = play_rate
+        self.play_mode = play_mode
+        self._setpoint_encoder = DDatagram()
+        # Кеш готовых к отправке пакетов (command_cache.stats() – попадания/промахи)
+        self.command_cache = CommandCache(maxsize=command_cache_size)
+        # Обработчики локальных команд сервера (см. commands.SERVER_COMMANDS)
+        self.server_handlers = {
+            "sleep": self.sleep,
+            "script": self.run_script,
+            "play": self.play,
+            "updategroups": self.update_groups,
+            "status": self.show_status,
+            "delivery": self.show_delivery,
+            "discover": self.discover,
+            "proximity": self.show_proximity,
+        }
+        # Поиск дронов в сети для команды discover (адреса без ip в drones_config.json)
+        self.scanner = NetworkScanner(port=broadcast_port, subnet=discover_subnet)
+        # Конфигурация роя: группы, адреса и теги дронов, перечитывается при изменении файла
+        self.registry = SwarmRegistry(path_to_config)
+        if metrics is not None:
+            self.register_metrics(metrics)
         print("Управляющая консоль запущена.")
         print("Синтаксис команд:")
         print("  all takeoff                   - всем дронам выполнить takeoff")
         print("  g:<group> takeoff              - дронам указанной группы выполнить takeoff")
         print("  8001 arm                      - дрону с id 8001 выполнить arm")
+        print("  g:1+g:2 land, 8000-8005 arm   - дронам из набора групп, диапазона id или тега (t:<тег>)")
         print("  script <имя_файла>            - выполнить команды из файла")
+        print("  play <файл>                   - проиграть траекторию из .csv/.npy/.npz")
         print("  sleep <сек>                  - задержка в секундах (например, sleep 5)")
+        print("  status                        - таблица состояний дронов по телеметрии")
+        print("  delivery                      - статистика очереди отправки и доставки команд")
+        print("  proximity                     - сближения дронов (контроль включается --separation)")
+        print("  @t=<сек> all takeoff          - в скрипте: команда в момент <сек> от начала")
+
+    def register_metrics(self, metrics: MetricsRegistry) -> None:
+        self.send_latency_metric = metrics.histogram("send_command_seconds", "Время send_command до передачи в сеть")
+        self.commands_metric = metrics.counter("commands_total", "Отправленные команды", label="command")
+        metrics.gauge("receive_queue_depth", "Пачки телеметрии, ожидающие обработки", func=self.receive_queue.qsize)
+        metrics.gauge("telemetry_staleness_seconds", "Время с последней телеметрии дрона", label="drone",
+                      func=self.telemetry.staleness)
+        metrics.gauge("drones_alive", "Дроны на связи", func=lambda: len(self.telemetry.alive_ids()))
+        if self.send_queue is not None:
+            metrics.gauge("send_queue_depth", "Команды в очереди отправки", label="class",
+                          func=lambda: self.send_queue.stats()["depth"])
+            metrics.gauge("send_queue_dropped", "Команды, отброшенные очередью отправки",
+                          func=lambda: self.send_queue.dropped)
+            metrics.gauge("send_queue_coalesced", "Уставки, заменённые в очереди", func=lambda: self.send_queue.coalesced)
+        if self.fanout is not None:
+            metrics.gauge("unicast_dropped", "Unicast-пакеты, потерянные при полном буфере",
+                          func=lambda: self.fanout.dropped)
+        if self.reliable is not None:
+            metrics.gauge("reliable_pending", "Команды, ожидающие подтверждения",
+                          func=lambda: len(self.reliable.pending))
+            metrics.gauge("reliable_failed", "Команды без подтверждения после всех повторов",
+                          func=lambda: self.reliable.failed)
+        if self.proximity is not None:
+            metrics.gauge("proximity_close_pairs", "Пары дронов ближе допустимого расстояния",
+                          func=lambda: self.proximity.stats()["close"])
+            metrics.gauge("proximity_predicted_pairs", "Пары дронов, сближающиеся в пределах горизонта прогноза",
+                          func=lambda: self.proximity.stats()["predicted"])
 
     def send_command(self, command: CMD, data: list, target: str = "<broadcast>") -> None:
-        dt = DDatagram()
-        dt.command = command.value
-        dt.data = data
-        if target != "<broadcast>" and not target.startswith("g:"):
-            dt.target_id = target
-            dt.group_id = self.drone_config.get(target, 0)
-        elif target.startswith("g:"):
+        started = time.perf_counter()
+        self.registry.reload_if_changed()
+        target_id = ""
+        group_id = 0
+        if target.isdigit():
+            target_id = target
+            group_id = self.registry.group_of(target)
+        elif target.startswith("g:") and target[2:].isdigit():
+            group_id = int(target[2:])
+        elif target != "<broadcast>":
+            # Набор дронов (g:1+g:2, 8000-8005, t:left). Группы – широковещательно с group_id, как g:N:
+            # состав группы после setgroup знает сам дрон; остальным дронам – отдельный пакет каждому
             try:
-                group_id = int(target.split(":")[1])
-            except Exception:
-                group_id = 0
-            dt.group_id = group_id
-        serialized = dt.export_serialized()
-        self.client.socket.sendto(serialized, ("<broadcast>", self.broadcast_port))
-        print(f"Команда {command} с данными {data} отправлена для target='{target}' group={dt.group_id}.")
+                everyone, groups, drone_ids = self.registry.parse(target, known=list(self.telemetry.drones))
+            except ValueError as e:
+                print(e)
+                return
+            if everyone:
+                self.send_command(command, data)
+                return
+            for group in groups:
+                drone_ids -= self.registry.group_members(group)
+            if not groups and not drone_ids:
+                print(f"Команда {command} не отправлена: в '{target}' нет дронов.")
+                return
+            for group in sorted(groups):
+                self.send_command(command, data, f"g:{group}")
+            for drone_id in sorted(drone_ids):
+                self.send_command(command, data, drone_id)
+            return
+        if self.gate_motion and target_id and command in MOTION_COMMANDS and not self.is_ready(target_id):
+            print(f"Команда {command} не отправлена: дрон {target_id} не на связи или не выполнен arm.")
+            return
+        if self.proximity is not None and command in TARGET_COMMANDS and len(data) >= 3:
+            # Группа и broadcast проверяются подронно: каждый дрон группы получает ту же цель
+            targets = {drone_id: data for drone_id in sorted(self.resolve_ids(target_id, group_id))}
+            conflicts = self.proximity.check_targets(targets)
+            if conflicts:
+                self.report_conflicts(conflicts, targets)
+                if self.reject_conflicts:
+                    print(f"Команда {command} не отправлена.")
+                    return
+            self.proximity.set_targets(targets)
+        if self.proximity is not None and command in TARGET_CLEAR_COMMANDS:
+            self.proximity.clear_targets(self.resolve_ids(target_id, group_id))
+        if command in (CMD.ARM, CMD.DISARM):
+            self.telemetry.set_armed(self.resolve_ids(target_id, group_id), command == CMD.ARM)
+        if command == CMD.SET_GROUP and data:
+            for drone_id in self.resolve_ids(target_id, group_id):
+                self.registry.mark_synced(drone_id, int(data[0]))
+        if self.reliable is not None:
+            seq, serialized = self.reliable.send(command, data, target_id, group_id,
+                                                 self.expected_acks(target_id, group_id))
+        else:
+            serialized = self.command_cache.get(command, data, target_id, group_id)
+        addresses = self.unicast_addresses(target_id)
+        frames = [(serialized, address) for address in addresses] if addresses else [(serialized, None)]
+        self.dispatch(command, frames, key=(command, target_id, group_id))
+        if self.metrics is not None:
+            self.send_latency_metric.observe(time.perf_counter() - started)
+            self.commands_metric.inc(label=command.name)
+        if self.recorder is not None:
+            self.recorder.record(serialized, int(target_id) if target_id.isdigit() else 0, TX)
+        print(f"Команда {command} с данными {data} отправлена для target='{target}' group={group_id}.")
 
-    def process_command(self, line: str) -> None:
+    def resolve_ids(self, target_id: str, group_id: int) -> list:
         """
-        Обработка одной строки команды. Если команда начинается с sleep, выполняется time.sleep.
-        Иначе – стандартная обработка команды.
+        Список id дронов, к которым относится команда (по конфигурации и телеметрии).
         """
-        parts = line.strip().split()
-        if not parts:
-            return
+        if target_id:
+            return [target_id]
+        if group_id:
+            return list(self.registry.group_members(group_id))
+        return list(set(self.registry.groups) | set(self.telemetry.drones))
 
-        # Обработка команды задержки
-        if parts[0].lower() == "sleep":
-            if len(parts) != 2:
-                print("Использование: sleep <сек>")
-            else:
-                try:
-                    delay = float(parts[1])
-                    print(f"Задержка на {delay} сек...")
-                    time.sleep(delay)
-                except ValueError:
-                    print("Неверное значение задержки.")
-            return
-        elif parts[0].lower() == "script":
-            if len(parts) != 2:
-                print("Использование: script <имя_файла>")
+    def expected_acks(self, target_id: str, group_id: int) -> list:
+        """
+        Дроны, от которых ждём подтверждения: только те, что на связи по телеметрии –
+        выключенные дроны из конфигурации ack не пришлют.
+        """
+        return [d for d in self.resolve_ids(target_id, group_id) if self.telemetry.is_alive(d)]
+
+    def is_ready(self, drone_id: str) -> bool:
+        state = self.telemetry.get(drone_id)
+        return self.telemetry.is_alive(drone_id) and state.armed is True
+
+    def show_status(self) -> None:
+        print(self.telemetry.format())
+        if self.shared_state is not None:
+            print(self.shared_state.format())
+
+    def report_conflicts(self, conflicts: dict, targets: dict) -> None:
+        for drone_id, found in conflicts.items():
+            print(f"Цель {list(targets[drone_id][:3])} дрона {drone_id} ближе {self.proximity.separation:g} м к: "
+                  + ", ".join(f"{kind} {other} ({distance:.2f} м)" for other, distance, kind in found))
+
+    def notify(self, message: str) -> None:
+        """
+        Сообщение из фонового потока (приём телеметрии): печатается над строкой ввода,
+        набранный текст и приглашение Command> выводятся заново.
+        """
+        with self._output_lock:
+            if sys.stdin.isatty():
+                sys.stdout.write(f"\r\033[K{message}\nCommand> {readline.get_line_buffer()}")
             else:
-                self.run_script(parts[1])
-            return
-        elif parts[0].lower()  == "updategroups":
-            # Загрузка конфигурации и обновление группы для каждого дрона
-            self.drone_config = load_drone_config(self.path_to_config)
-            for drone_id, group in self.drone_config.items():
-                self.send_command(CMD.SET_GROUP, [group], target=drone_id)
-                print(f"Отправлена команда для дрона {drone_id}: установка группы {group}")
-
-        target_token = parts[0]
-        if target_token.lower() == "all":
-            target = "<broadcast>"
+                sys.stdout.write(message + "\n")
+            sys.stdout.flush()
+
+    def show_proximity(self) -> None:
+        if self.proximity is None:
+            print("Контроль сближения выключен (запуск с --separation).")
         else:
-            target = target_token
+            print(self.proximity.format())
 
-        if len(parts) < 2:
-            print("Не указана команда.")
-            return
+    def discover(self) -> None:
+        """
+        Ищет дроны в сети и добавляет найденные адреса в таблицу адресатов unicast.
+        """
+        self.scanner.scan(force=True)
+        print(self.scanner.format())
+        addresses = self.scanner.addresses()
+        with self.telemetry.lock:
+            addresses.update({d: s.ip for d, s in self.telemetry.drones.items() if s.ip})
+        self.registry.learn_addresses(addresses)
+        print(f"Известно адресов: {len(addresses)}")
 
-        cmd = parts[1].lower()
-        if cmd == "set_speed":
-            if len(parts) != 6:
-                print("Использование: [target] set_speed vx vy vz yaw_rate")
-                return
-            try:
-                vx, vy, vz, yaw_rate = map(float, parts[2:6])
-                self.send_command(CMD.SET_SPEED, [vx, vy, vz, yaw_rate], target)
-            except ValueError:
-                print("Неверные параметры для set_speed")
-        elif cmd == "setgroup":
-            if len(parts) != 3:
-                print("Использование: [target] setgroup <новая_группа>")
-                return
-            try:
-                new_group = int(parts[2])
-                self.send_command(CMD.SET_GROUP, [new_group], target)
-            except ValueError:
-                print("Неверное значение для новой группы")
-        elif cmd == "goto":
-            if len(parts) != 6:
-                print("Использование: [target] goto x y z yaw")
-                return
-            try:
-                x, y, z, yaw = map(float, parts[2:6])
-                self.send_command(CMD.GOTO, [x, y, z, yaw], target)
-            except ValueError:
-                print("Неверные параметры для goto")
-        elif cmd == "takeoff":
-            self.send_command(CMD.TAKEOFF, [], target)
-        elif cmd == "land":
-            self.send_command(CMD.LAND, [], target)
-        elif cmd == "arm":
-            self.send_command(CMD.ARM, [], target)
-        elif cmd == "disarm":
-            self.send_command(CMD.DISARM, [], target)
-        elif cmd == "trp":
-            self.send_command(CMD.SWARM_ON, [], target)
-        elif cmd == "stop":
-            self.send_command(CMD.STOP, [], target)
-        elif cmd == "save":
-            self.send_command(CMD.SAVE, [], target)
-        elif cmd == "set_mode":
-            # Здесь нужно уточнить применение (пример приведён для справки)
-            if len(parts) > 3:
-                print("Использование: [target] set_mode [1 или 2 или 3]")
-                return
+    def show_delivery(self) -> None:
+        if self.send_queue is not None:
+            print(self.send_queue.format())
+        if self.reliable is None:
+            print("Надёжная доставка выключена (запуск с --reliable).")
+        else:
+            print(self.reliable.format())
+        if self.fanout is not None:
+            stats = self.fanout.stats()
+            print(f"Unicast: отправлено {stats['sent']}, ожиданий буфера {stats['blocked']}, "
+                  f"потеряно {stats['dropped']}")
+
+    def drone_address(self, drone_id: str) -> Optional[str]:
+        """
+        IP дрона: из телеметрии, если он на связи, иначе из drones_config.json
+        (или найденный командой discover).
+        """
+        state = self.telemetry.get(drone_id)
+        if state is not None and state.ip and self.telemetry.is_alive(drone_id):
+            return state.ip
+        return self.registry.address_of(drone_id)
+
+    def unicast_addresses(self, target_id: str) -> Optional[list]:
+        """
+        Адрес для unicast-отправки команды одному дрону. None – отправлять широковещательно:
+        команда для всех или для группы (состав группы знает только сам дрон – после
+        setgroup он фильтрует по новой группе, а конфигурация может быть устаревшей)
+        или адрес дрона неизвестен.
+        """
+        if self.fanout is None or not target_id:
+            return None
+        address = self.drone_address(target_id)
+        return None if address is None else [address]
+
+    def send_frame(self, serialized: bytes, address: Optional[str] = None, command: Optional[CMD] = None) -> None:
+        """
+        Отправка пакета на адрес дрона (unicast) или широковещательно при address=None.
+        """
+        self.dispatch(command, [(serialized, address)])
+
+    def dispatch(self, command: Optional[CMD], frames: list, key=None) -> None:
+        """
+        Передаёт пакеты команды [(байты, адрес или None), ...] в очередь отправки
+        (или сразу в сеть, если очередь выключена). key – адресат для замены устаревших уставок.
+        """
+        if self.send_queue is None:
+            self.deliver(command, frames)
+        else:
+            self.send_queue.submit(command, frames, key)
+
+    def deliver(self, command: Optional[CMD], frames: list) -> None:
+        """
+        Фактическая отправка: пакеты с адресом – unicast через fanout, остальные – широковещательно.
+        """
+        unicast = [(frame, address) for frame, address in frames if address]
+        if unicast:
+            if self.fanout is not None:
+                self.fanout.send_frames(unicast)
             else:
-                try:
-                    mod = int(parts[2])
-                    self.send_command(CMD.SAVE, [mod], target)
-                except (IndexError, ValueError):
-                    print("Неверные параметры для set_mode")
-        elif cmd == "smart_goto":
-            if len(parts) != 6:
-                print("Использование: [target] smart_goto x y z yaw")
-                return
-            try:
-                x, y, z, yaw = map(float, parts[2:6])
-                self.send_command(CMD.SMART_GOTO, [x, y, z, yaw], target)
-            except ValueError:
-                print("Неверные параметры для smart_goto")
-        elif cmd == "led":
-            if len(parts) != 6:
-                print("Использование: [target] led led_id r g b")
-                return
-            try:
-                led_id = int(parts[2])
-                r, g, b = map(int, parts[3:6])
-                self.send_command(CMD.LED, [led_id, r, g, b], target)
-                print(f"Команда LED отправлена: led_id={led_id}, r={r}, g={g}, b={b}")
-            except ValueError:
-                print("Неверные параметры для led")
-        elif cmd == "updategroups":
-            # Загрузка конфигурации и обновление группы для каждого дрона
-            self.drone_config = load_drone_config(self.path_to_config)
-            for drone_id, group in self.drone_config.items():
-                self.send_command(CMD.SET_GROUP, [group], target=drone_id)
-                print(f"Отправлена команда для дрона {drone_id}: установка группы {group}")
+                for frame, address in unicast:
+                    self.client.socket.sendto(frame, (address, self.broadcast_port))
+        for frame, address in frames:
+            if not address:
+                self.transmit(frame, command)
+
+    def transmit(self, serialized: bytes, command: CMD) -> None:
+        """
+        Отправка готового пакета в сеть.
+        """
+        self.client.socket.sendto(serialized, ("<broadcast>", self.broadcast_port))
+
+    def process_command(self, line: str) -> None:
+        """
+        Обработка одной строки команды: строка компилируется в CompiledCommand
+        и исполняется диспетчером.
+        """
+        try:
+            command = compile_line(line)
+        except CommandError as e:
+            print(e)
+            return
+        if command is not None:
+            self.execute(command)
+
+    def execute(self, command: CompiledCommand) -> None:
+        """
+        Исполняет скомпилированную команду: отправка дронам или локальный обработчик.
+        """
+        spec = command.spec
+        if spec.cmd is not None:
+            self.send_command(spec.cmd, list(command.args), command.target)
         else:
-            print("Неизвестная команда. Доступны: set_speed, goto, takeoff, land, arm, disarm, smart_goto, led, updategroups, sleep, script")
+            self.server_handlers[spec.name](*command.args)
 
-    def run_script(self, filename: str) -> None:
+    def sleep(self, delay: float) -> None:
+        print(f"Задержка на {delay} сек...")
+        time.sleep(delay)
+
+    def update_groups(self) -> None:
+        """
+        Отправка групп дронам по конфигурации. Отправляются только группы,
+        изменившиеся с последней синхронизации (первый вызов – все).
         """
-        Считывает команды из файла и выполняет их построчно.
-        Поддерживается команда sleep для задержки.
+        pending = self.registry.pending_groups()
+        if not pending:
+            print("Группы дронов не изменились.")
+            return
+        for drone_id, group in sorted(pending.items()):
+            self.send_command(CMD.SET_GROUP, [group], target=drone_id)
+            print(f"Отправлена команда для дрона {drone_id}: установка группы {group}")
+
+    def load_script(self, filename: str) -> Optional[list]:
+        """
+        Считывает команды из файла и компилирует их целиком в расписание (см. build_timeline).
+        При ошибках разбора выводит все ошибки с номерами строк и возвращает None.
         """
         if not os.path.exists(filename):
             print(f"Файл {filename} не найден.")
+            return None
+
+        with open(filename, "r") as f:
+            commands, errors = compile_script(f)
+        if errors:
+            print(f"Скрипт {filename} не выполнен, найдены ошибки:")
+            for error in errors:
+                print(f"  {error}")
+            return None
+        return build_timeline(commands)
+
+    def run_script(self, filename: str) -> None:
+        """
+        Выполняет скрипт из файла. Пока весь файл не скомпилирован без ошибок, ничего не отправляется.
+
+        Выполнение идёт по расписанию с монотонными часами: sleep и метки @t=<сек>
+        задают абсолютное время каждой команды от начала скрипта, поэтому задержки
+        на отправку не накапливаются. В конце выводится статистика опоздания.
+        """
+        timeline = self.load_script(filename)
+        if timeline is None:
             return
 
         print(f"Выполнение скрипта из файла {filename}...")
-        with open(filename, "r") as f:
-            for line in f:
-                line = line.strip()
-                # Пропускаем пустые строки и комментарии (если начинаются с #)
-                if not line or line.startswith("#"):
-                    continue
-                print(f"> {line}")
-                self.process_command(line)
+        scheduler = TimelineScheduler()
+
+        def execute(command: CompiledCommand) -> None:
+            print(f"> {command.source}")
+            self.execute(command)
+
+        try:
+            stats = scheduler.run(timeline, execute)
+        except KeyboardInterrupt:
+            scheduler.cancel()
+            stats = summarize_lateness(scheduler.lateness)
+            print("Выполнение скрипта прервано.")
+        print(format_lateness(stats))
+
+    def load_trajectory(self, filename: str) -> Optional[Trajectory]:
+        if not os.path.exists(filename):
+            print(f"Файл {filename} не найден.")
+            return None
+        try:
+            trajectory = Trajectory(load_trajectory_data(filename))
+        except (ValueError, KeyError, OSError) as e:
+            print(f"Траектория {filename} не загружена: {e}")
+            return None
+        if not len(trajectory):
+            print(f"Траектория {filename} пуста.")
+            return None
+        print(f"Траектория {filename}: {len(trajectory)} точек, {len(trajectory.drone_ids)} дронов, "
+              f"{trajectory.end_time - trajectory.start_time:.1f} с")
+        return trajectory
+
+    def playback_timeline(self, trajectory: Trajectory) -> list:
+        """
+        Расписание тактов проигрывания [(время_от_старта, время_траектории), ...] с шагом 1 / play_rate.
+        """
+        period = 1.0 / self.play_rate
+        ticks = np.arange(trajectory.start_time, trajectory.end_time + period, period)
+        return [(float(t - trajectory.start_time), float(t)) for t in ticks]
+
+    def send_setpoints(self, trajectory: Trajectory, time_point: float) -> int:
+        """
+        Один такт проигрывания: уставки всех дронов, активных в момент time_point,
+        отправляются одним циклом (через очередь – каждая уставка своему дрону,
+        с заменой не успевшей уйти). Пакеты адресные (target_id дрона), без
+        подтверждений – следующая уставка всё равно заменит потерянную.
+        """
+        ids, positions, velocities = trajectory.sample(time_point, hold=1.0 / self.play_rate)
+        if self.play_mode == "speed":
+            command, values = CMD.SET_SPEED, velocities
+        else:
+            command, values = CMD.GOTO, positions
+        setpoints = {}
+        for drone_id, row in zip(ids.tolist(), values.tolist()):
+            target_id = str(drone_id)
+            if self.gate_motion and not self.is_ready(target_id):
+                continue
+            setpoints[target_id] = row
+        if self.proximity is not None and command in TARGET_COMMANDS and setpoints:
+            conflicts = self.proximity.check_targets(setpoints)
+            # Печатаются только новые конфликты, а не каждый такт
+            new = {d: found for d, found in conflicts.items() if d not in self._setpoint_conflicts}
+            if new:
+                self.report_conflicts(new, setpoints)
+                if self.reject_conflicts:
+                    print(f"Уставки дронов {', '.join(new)} не отправляются, пока цели в конфликте.")
+            self._setpoint_conflicts = set(conflicts)
+            if self.reject_conflicts:
+                for drone_id in conflicts:
+                    del setpoints[drone_id]
+            self.proximity.set_targets(setpoints)
+        frames = []
+        encoder = self._setpoint_encoder
+        encoder.command = command.value
+        encoder.group_id = 0
+        for target_id, row in setpoints.items():
+            encoder.target_id = target_id
+            encoder.data = row
+            frame = encoder.export_serialized()
+            address = self.drone_address(target_id) if self.fanout is not None else None
+            frames.append((frame, address))
+            if self.send_queue is not None:
+                self.send_queue.submit(command, [(frame, address)], key=(command, target_id, 0))
+            if self.recorder is not None:
+                self.recorder.record(frame, int(target_id), TX)
+        if self.send_queue is None:
+            self.deliver(command, frames)
+        if self.metrics is not None:
+            self.commands_metric.inc(len(frames), label=command.name)
+        return len(frames)
+
+    def play(self, filename: str) -> None:
+        """
+        Проигрывает траекторию с фиксированной частотой play_rate по монотонным часам
+        (как run_script). Между ключевыми точками уставки интерполируются линейно.
+        """
+        trajectory = self.load_trajectory(filename)
+        if trajectory is None:
+            return
+        timeline = self.playback_timeline(trajectory)
+        print(f"Проигрывание {filename}: {len(timeline)} тактов по {self.play_rate:g} Гц ({self.play_mode})...")
+        self._setpoint_conflicts = set()
+        scheduler = TimelineScheduler()
+        try:
+            stats = scheduler.run(timeline, lambda t: self.send_setpoints(trajectory, t))
+        except KeyboardInterrupt:
+            scheduler.cancel()
+            stats = summarize_lateness(scheduler.lateness)
+            print("Проигрывание прервано.")
+        print(format_lateness(stats))
 
     def console_loop(self):
         print("Запущен консольный интерфейс управления.")
@@ -235,10 +573,69 @@ class ControlServer:
 
             self.process_command(line)
 
+    def close(self) -> None:
+        if self.reliable is not None:
+            self.reliable.stop()
+        if self.send_queue is not None:
+            self.send_queue.close()
+        if self.fanout is not None:
+            self.fanout.close()
+        if self.telemetry_receiver is not None:
+            self.telemetry_receiver.stop()
+        if self.shared_state is not None:
+            self.shared_state.close()
+        if self.recorder is not None:
+            self.recorder.close()
+            print(f"Журнал полёта сохранён: {self.recorder.path}")
+
+
+def build_parser(description: str) -> argparse.ArgumentParser:
+    """
+    Аргументы командной строки консоли (общие для ControlServer и AsyncControlServer).
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--port", type=int, default=37020)
+    parser.add_argument("--config", default="./scripts/drones_config.json")
+    parser.add_argument("--record", default=None, help="файл журнала полёта (телеметрия и команды)")
+    parser.add_argument("--reliable", action="store_true", help="подтверждения и выборочные повторы команд")
+    parser.add_argument("--no-unicast", action="store_true", help="все команды только широковещательно")
+    parser.add_argument("--play-rate", type=float, default=10.0, help="частота уставок команды play, Гц")
+    parser.add_argument("--play-mode", choices=("goto", "speed"), default="goto", help="уставки play: goto или set_speed")
+    parser.add_argument("--send-rate", type=float, default=0.0,
+                        help="ограничение отправки, пакетов/с (0 – без очереди); для play – не меньше play_rate × число дронов")
+    parser.add_argument("--metrics-port", type=int, default=None, help="HTTP-порт метрик (/metrics, /metrics.json)")
+    parser.add_argument("--metrics-json", default=None, help="файл для периодической записи метрик в JSON")
+    parser.add_argument("--discover-subnet", default=None, help="подсеть для опроса командой discover, например 10.1.100.0/24")
+    parser.add_argument("--shared-state", default=None, help="имя общей памяти процесса приёма телеметрии (только чтение)")
+    parser.add_argument("--separation", type=float, default=None, help="допустимое расстояние между дронами, м (контроль сближения)")
+    parser.add_argument("--conflict-horizon", type=float, default=2.0, help="горизонт прогноза сближения, с")
+    parser.add_argument("--reject-conflicts", action="store_true", help="не отправлять goto с конфликтующей целью")
+    return parser
+
+
+def server_options(args: argparse.Namespace, metrics: Optional[MetricsRegistry]) -> dict:
+    """
+    Параметры конструктора ControlServer из аргументов build_parser.
+    """
+    return dict(broadcast_port=args.port, path_to_config=args.config, record_path=args.record,
+                reliable=args.reliable, unicast=not args.no_unicast,
+                play_rate=args.play_rate, play_mode=args.play_mode, send_rate=args.send_rate,
+                metrics=metrics, discover_subnet=args.discover_subnet, shared_state=args.shared_state,
+                separation=args.separation, conflict_horizon=args.conflict_horizon,
+                reject_conflicts=args.reject_conflicts)
+
 
 def main():
-    cs = ControlServer()
-    cs.console_loop()
+    args = build_parser("Консоль управления роем").parse_args()
+    metrics = MetricsRegistry() if args.metrics_port is not None or args.metrics_json else None
+    cs = ControlServer(**server_options(args, metrics))
+    exporters = start_exporters(metrics, args.metrics_port, args.metrics_json) if metrics is not None else []
+    try:
+        cs.console_loop()
+    finally:
+        cs.close()
+        for exporter in exporters:
+            exporter.close()
 
 
 if __name__ == '__main__':
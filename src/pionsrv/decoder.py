@@ -0,0 +1,224 @@
+from hashlib import md5
+from typing import Optional
+import numpy as np
+from swarm_server import DDatagram
+from pionsrv.reliable import ACK_SOURCE
+
+# Запись телеметрии: id дрона и поля data (ip числом, позиция, скорость, ориентация, t_speed).
+# Поля после id – 17 подряд идущих float64, т.е. раскладка RECORD_LENGTH из swarm_state
+TELEMETRY_DTYPE = np.dtype([
+    ("id", np.int64),
+    ("ip", np.float64),
+    ("position", np.float64, 3),
+    ("velocity", np.float64, 3),
+    ("attitude", np.float64, 6),
+    ("t_speed", np.float64, 4),
+])
+TELEMETRY_FIELDS = 17
+# Проверяем, что данных достаточно (1 - IP, 3 - позиция, 3 - скорость)
+TELEMETRY_MIN_LENGTH = 7
+
+# Номера полей protobuf Datagram
+_TOKEN, _ID, _SOURCE, _COMMAND, _DATA, _TARGET_ID, _GROUP_ID, _HASH = range(1, 9)
+_VARINT, _LENGTH = 0, 2
+# Хеш – последнее поле: тег 0x42, длина 32, MD5 в hex
+_HASH_TAIL = 34
+
+
+def _parse_layout(frame) -> Optional[tuple]:
+    """
+    Разбор заголовков полей одного кадра. Возвращает (fields, columns, masks):
+    fields – номер поля -> (начало, конец значения); columns и masks – байты, по
+    которым другой кадр той же длины проверяется на ту же раскладку (теги и длины
+    целиком, у varint-значений – бит продолжения).
+    None – кадр не в канонической раскладке (поля по возрастанию номеров, хеш последним).
+    """
+    n = len(frame)
+    if n < _HASH_TAIL or frame[n - _HASH_TAIL] != (_HASH << 3 | _LENGTH) or frame[n - _HASH_TAIL + 1] != 32:
+        return None
+    end = n - _HASH_TAIL
+    fields = {}
+    columns = [end, end + 1]
+    masks = [0xFF, 0xFF]
+    pos = 0
+    last = 0
+    while pos < end:
+        tag = frame[pos]
+        field, wire = tag >> 3, tag & 7
+        if field <= last or field >= _HASH:
+            return None
+        last = field
+        columns.append(pos)
+        masks.append(0xFF)
+        pos += 1
+        start = pos
+        while pos < end and frame[pos] & 0x80:
+            pos += 1
+        pos += 1
+        columns.extend(range(start, pos))
+        if wire == _VARINT:
+            masks.extend([0x80] * (pos - start))
+            fields[field] = (start, pos)
+        elif wire == _LENGTH:
+            masks.extend([0xFF] * (pos - start))
+            length = 0
+            for shift, byte in enumerate(frame[start:pos]):
+                length |= (byte & 0x7F) << (7 * shift)
+            fields[field] = (pos, pos + length)
+            pos += length
+        else:
+            return None
+    if pos != end:
+        return None
+    if _DATA in fields and (fields[_DATA][1] - fields[_DATA][0]) % 8:
+        return None
+    return fields, np.array(columns), np.array(masks, dtype=np.uint8)
+
+
+def _varints(rows: np.ndarray, span: Optional[tuple]) -> np.ndarray:
+    """
+    Значения varint в одной и той же позиции всех строк (int64, отрицательные – дополнительный код).
+    """
+    if span is None:
+        return np.zeros(len(rows), dtype=np.int64)
+    start, end = span
+    value = np.zeros(len(rows), dtype=np.uint64)
+    for shift, column in enumerate(range(start, end)):
+        value |= (rows[:, column] & 0x7F).astype(np.uint64) << np.uint64(7 * shift)
+    return value.view(np.int64)
+
+
+class BatchDecoder:
+    """
+    Пакетное декодирование DDatagram без создания объектов protobuf на пакет.
+
+    Кадры одной длины обычно имеют одну раскладку полей (одинаковая длина
+    varint id, token, число значений data). Такая группа разбирается как
+    матрица байтов (m, длина): раскладка определяется по первому кадру,
+    проверяется для всех кадров сразу, varint-поля собираются векторно, а data
+    читается представлением np.frombuffer как float64. Хеш MD5 проверяется по
+    байтам кадра до поля hash – это те же байты, что сериализует DDatagram.
+
+    Кадры в другой раскладке декодируются обычным DDatagram.read_serialized.
+    """
+
+    def __init__(self, capacity: int = 64, verify: bool = True):
+        self.verify = verify
+        self.records = np.zeros(capacity, dtype=TELEMETRY_DTYPE)
+        self.fallback = DDatagram()
+        self.fallbacks = 0
+
+    def _reserve(self, n: int) -> None:
+        if len(self.records) < n:
+            self.records = np.zeros(max(n, 2 * len(self.records)), dtype=TELEMETRY_DTYPE)
+
+    def decode(self, frames: list) -> tuple:
+        """
+        frames – байты кадров (bytes или memoryview). Возвращает (records, index, acks, errors):
+          records – структурированный массив TELEMETRY_DTYPE пакетов телеметрии
+                    (command == 0, не ack, не меньше TELEMETRY_MIN_LENGTH полей),
+                    представление внутреннего буфера, действительно до следующего вызова;
+          index   – номер кадра в frames для каждой записи records;
+          acks    – [(id, token), ...] подтверждений команд (source == ACK_SOURCE);
+          errors  – число кадров, не прошедших проверку хеша или разбор.
+        """
+        self._reserve(len(frames))
+        groups = {}
+        for i, frame in enumerate(frames):
+            groups.setdefault(len(frame), []).append(i)
+        count = 0
+        index = [np.zeros(0, dtype=np.int64)]
+        acks = []
+        errors = 0
+        irregular = []
+        pending = [(length, np.array(members)) for length, members in groups.items()]
+        while pending:
+            length, members = pending.pop()
+            layout = _parse_layout(frames[members[0]])
+            if layout is None:
+                irregular.append(members[0])
+                if len(members) > 1:
+                    pending.append((length, members[1:]))
+                continue
+            fields, columns, masks = layout
+            rows = np.frombuffer(b"".join([frames[i] for i in members]), dtype=np.uint8).reshape(len(members), length)
+            same = ((rows[:, columns] & masks) == (rows[0, columns] & masks)).all(axis=1)
+            if not same.all():
+                # Кадры той же длины в другой раскладке – отдельная группа
+                pending.append((length, members[~same]))
+                rows = rows[same]
+                members = members[same]
+            if self.verify:
+                # DDatagram сверяет хеш с повторной сериализацией, а она приводит varint к
+                # канонической форме – кадр с несовпавшим хешем решает обычный разбор
+                digests = "".join([md5(frames[i][:-_HASH_TAIL]).hexdigest() for i in members]).encode()
+                valid = (np.frombuffer(digests, dtype=np.uint8).reshape(len(members), 32) == rows[:, -32:]).all(axis=1)
+                if not valid.all():
+                    irregular.extend(members[~valid].tolist())
+                    rows = rows[valid]
+                    members = members[valid]
+            if not len(members):
+                continue
+
+            ids = _varints(rows, fields.get(_ID))
+            sources = _varints(rows, fields.get(_SOURCE))
+            commands = _varints(rows, fields.get(_COMMAND))
+            is_ack = sources == ACK_SOURCE
+            if is_ack.any():
+                tokens = _varints(rows, fields.get(_TOKEN)).astype(np.int32)
+                acks.extend((int(d), int(t)) for d, t in zip(ids[is_ack], tokens[is_ack]) if t >= 0)
+            start, end = fields.get(_DATA, (0, 0))
+            values = (end - start) // 8
+            telemetry = ~is_ack & (commands == 0)
+            if values < TELEMETRY_MIN_LENGTH or not telemetry.any():
+                continue
+            k = min(values, TELEMETRY_FIELDS)
+            data = rows[telemetry, start:start + 8 * k].view("<f8")
+            n = len(data)
+            out = self.records[count:count + n]
+            out["id"] = ids[telemetry]
+            flat = out.view(np.float64).reshape(n, TELEMETRY_FIELDS + 1)
+            flat[:, 1:1 + k] = data
+            flat[:, 1 + k:] = 0.0
+            index.append(members[telemetry])
+            count += n
+
+        for i in irregular:
+            self.fallbacks += 1
+            valid, payload = self.fallback.read_serialized(bytes(frames[i]))
+            if not valid:
+                errors += 1
+                continue
+            if payload.source == ACK_SOURCE:
+                if payload.token >= 0:
+                    acks.append((payload.id, payload.token))
+                continue
+            if payload.command != 0 or len(payload.data) < TELEMETRY_MIN_LENGTH:
+                continue
+            self._reserve(count + 1)
+            record = self.records[count]
+            record["id"] = payload.id
+            values = np.zeros(TELEMETRY_FIELDS)
+            data = list(payload.data[:TELEMETRY_FIELDS])
+            values[:len(data)] = data
+            self.records[count:count + 1].view(np.float64)[1:] = values
+            index.append(np.array([i]))
+            count += 1
+        return self.records[:count], np.concatenate(index), acks, errors
+
+
+def as_matrix(records: np.ndarray) -> np.ndarray:
+    """
+    Поля data записей (n, TELEMETRY_FIELDS) без копирования – раскладка SwarmState.update.
+    """
+    return records.view(np.float64).reshape(len(records), TELEMETRY_FIELDS + 1)[:, 1:]
+
+
+def format_ips(ip: np.ndarray) -> list:
+    """
+    IP, переданные числом (поле [0] телеметрии), в виде строк "a.b.c.d"; вне диапазона – "Invalid IP".
+    """
+    ip = np.asarray(ip)
+    valid = (ip >= 0) & (ip < 2 ** 32)
+    octets = (np.where(valid, ip, 0).astype(np.uint64)[:, None] >> np.array([24, 16, 8, 0], dtype=np.uint64)) & 255
+    return [".".join(map(str, row)) if ok else "Invalid IP" for row, ok in zip(octets.tolist(), valid)]
@@ -0,0 +1,187 @@
+import ipaddress
+import select
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from pymavlink.dialects.v20 import common as mavlink2
+from swarm_server import DDatagram
+from pionsrv.reliable import ACK_SOURCE
+from pionsrv.telemetry import TELEMETRY_MIN_LENGTH
+
+
+class DiscoveredDrone:
+    """
+    Найденный в сети дрон. drone_id известен, только если дрон прислал телеметрию.
+    source – "telemetry" или "probe".
+    """
+
+    def __init__(self, ip: str, drone_id: Optional[str], source: str, seen_at: float):
+        self.ip = ip
+        self.drone_id = drone_id
+        self.source = source
+        self.seen_at = seen_at
+
+    def __repr__(self):
+        return f"DiscoveredDrone({self.ip!r}, {self.drone_id!r}, {self.source!r})"
+
+
+def _heartbeat() -> bytes:
+    """
+    MAVLink HEARTBEAT от наземной станции: автопилот в ответ начинает слать свои сообщения.
+    """
+    mav = mavlink2.MAVLink(None, srcSystem=255, srcComponent=mavlink2.MAV_COMP_ID_MISSIONPLANNER)
+    msg = mav.heartbeat_encode(mavlink2.MAV_TYPE_GCS, mavlink2.MAV_AUTOPILOT_INVALID, 0, 0, 0)
+    return bytes(msg.pack(mav))
+
+
+def listen_telemetry(port: int = 37020, duration: float = 1.0) -> dict:
+    """
+    Слушает широковещательную телеметрию duration секунд. Возвращает id -> DiscoveredDrone
+    (у нескольких id может быть один ip, например у симулятора).
+    Сокет открывается с SO_REUSEADDR, поэтому работает рядом с TelemetryReceiver.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    found = {}
+    try:
+        sock.bind(("", port))
+        decoder = DDatagram()
+        deadline = time.monotonic() + duration
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not select.select([sock], [], [], remaining)[0]:
+                break
+            data, (ip, _) = sock.recvfrom(4096)
+            valid, payload = decoder.read_serialized(data)
+            if not valid or payload.command != 0 or payload.source == ACK_SOURCE:
+                continue
+            if len(payload.data) >= TELEMETRY_MIN_LENGTH:
+                found[str(payload.id)] = DiscoveredDrone(ip, str(payload.id), "telemetry", time.time())
+    finally:
+        sock.close()
+    return found
+
+
+def probe_subnet(subnet: str, port: int = 5656, timeout: float = 0.5, max_in_flight: int = 64,
+                 window: float = 0.02) -> dict:
+    """
+    Параллельный опрос подсети (например, "10.1.100.0/24"): HEARTBEAT на MAVLink-порт
+    каждого адреса, ответившие адреса считаются дронами. Возвращает ip -> DiscoveredDrone.
+
+    Запросы уходят пачками по max_in_flight адресов с паузой window между пачками
+    (ответы собираются в эти паузы), после последней пачки ответы ждутся timeout
+    секунд. Один сокет, без потока на адрес: /24 опрашивается меньше чем за секунду.
+    """
+    hosts = [str(host) for host in ipaddress.ip_network(subnet, strict=False).hosts()]
+    wanted = set(hosts)
+    heartbeat = _heartbeat()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    found = {}
+
+    def collect(wait: float) -> None:
+        deadline = time.monotonic() + wait
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([sock], [], [], remaining)[0]:
+                return
+            try:
+                _, (ip, _) = sock.recvfrom(4096)
+            except (BlockingIOError, ConnectionRefusedError):
+                continue
+            if ip in wanted and ip not in found:
+                found[ip] = DiscoveredDrone(ip, None, "probe", time.time())
+
+    try:
+        for start in range(0, len(hosts), max_in_flight):
+            for ip in hosts[start:start + max_in_flight]:
+                try:
+                    sock.sendto(heartbeat, (ip, port))
+                except (BlockingIOError, OSError):
+                    pass  # недоступный адрес или переполненный буфер – адрес просто не ответит
+            collect(window)
+        collect(timeout)
+    finally:
+        sock.close()
+    return found
+
+
+class NetworkScanner:
+    """
+    Поиск дронов в сети: одновременно слушает телеметрию на порту роя и, если
+    задана подсеть, опрашивает её (probe_subnet). Дроны из телеметрии хранятся по
+    id, ответившие на опрос – по IP, если этот IP уже не известен из телеметрии.
+    Результаты кэшируются: scan() в течение ttl секунд после последнего поиска
+    возвращает кэш, дрон, не найденный дольше ttl, забывается.
+    """
+
+    def __init__(self, port: int = 37020, subnet: Optional[str] = None, mavlink_port: int = 5656,
+                 listen_time: float = 1.0, probe_timeout: float = 0.5, max_in_flight: int = 64,
+                 ttl: float = 30.0):
+        self.port = port
+        self.subnet = subnet
+        self.mavlink_port = mavlink_port
+        self.listen_time = listen_time
+        self.probe_timeout = probe_timeout
+        self.max_in_flight = max_in_flight
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.drones = {}  # id (или ip, если id неизвестен) -> DiscoveredDrone
+        self._scanned_at = None
+
+    def scan(self, force: bool = False) -> list:
+        """
+        Список найденных дронов, отсортированный по IP и id.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if force or self._scanned_at is None or now - self._scanned_at >= self.ttl:
+                self._merge(self._search())
+                self._scanned_at = time.monotonic()
+            return self._sorted()
+
+    def _sorted(self) -> list:
+        return sorted(self.drones.values(), key=lambda d: (ipaddress.ip_address(d.ip), d.drone_id or ""))
+
+    def _search(self) -> tuple:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            listening = executor.submit(listen_telemetry, self.port, self.listen_time)
+            probing = None
+            if self.subnet:
+                probing = executor.submit(probe_subnet, self.subnet, self.mavlink_port, self.probe_timeout,
+                                          self.max_in_flight)
+            return listening.result(), probing.result() if probing is not None else {}
+
+    def _merge(self, found: tuple) -> None:
+        heard, probed = found
+        expired = time.time() - self.ttl
+        drones = {key: d for key, d in self.drones.items() if d.seen_at >= expired}
+        drones.update(heard)
+        identified = {d.ip for d in drones.values() if d.drone_id is not None}
+        for ip, drone in probed.items():
+            if ip in identified:
+                for known in drones.values():
+                    if known.ip == ip:
+                        known.seen_at = drone.seen_at
+            else:
+                drones[ip] = drone
+        # IP, ответивший на опрос раньше, теперь известен по телеметрии
+        self.drones = {key: d for key, d in drones.items() if d.drone_id is not None or d.ip not in identified}
+
+    def addresses(self) -> dict:
+        """
+        id -> ip для дронов, чей id известен из телеметрии.
+        """
+        with self.lock:
+            return {d.drone_id: d.ip for d in self.drones.values() if d.drone_id is not None}
+
+    def format(self) -> str:
+        drones = self._sorted()
+        lines = [f"Найдено дронов: {len(drones)}"]
+        for d in drones:
+            lines.append(f"  {d.ip:<15} id {d.drone_id or '?':<8} ({d.source})")
+        return "\n".join(lines)
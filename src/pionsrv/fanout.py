@@ -0,0 +1,62 @@
+import select
+import socket
+from typing import Iterable
+
+
+class UnicastFanout:
+    """
+    Рассылка одного пакета на адреса нескольких дронов через неблокирующий сокет.
+
+    Адресные команды (8001 goto, g:2 ...) уходят unicast на полной скорости
+    канала и не будят остальных дронов. Если буфер сокета заполнен, рассылка
+    ждёт готовности сокета не дольше wait_timeout, после чего оставшиеся
+    пакеты считаются потерянными (dropped).
+    """
+
+    def __init__(self, port: int = 37020, wait_timeout: float = 0.05):
+        self.port = port
+        self.wait_timeout = wait_timeout
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self.sock.setblocking(False)
+        self.sent = 0
+        self.blocked = 0
+        self.dropped = 0
+
+    def send(self, frame: bytes, addresses: Iterable[str]) -> int:
+        """
+        Отправляет frame на каждый адрес. Возвращает число отправленных пакетов.
+        """
+        return self.send_frames([(frame, address) for address in addresses])
+
+    def send_frames(self, frames: list) -> int:
+        """
+        Отправляет пакеты [(байты, адрес), ...] – разные пакеты разным дронам
+        за один цикл отправки. Возвращает число отправленных пакетов.
+        """
+        sent = 0
+        i = 0
+        while i < len(frames):
+            frame, address = frames[i]
+            try:
+                self.sock.sendto(frame, (address, self.port))
+            except BlockingIOError:
+                self.blocked += 1
+                _, writable, _ = select.select([], [self.sock], [], self.wait_timeout)
+                if not writable:
+                    self.dropped += len(frames) - i
+                    break
+                continue
+            except OSError as error:
+                print(f"Ошибка отправки на {address}: {error}")
+                self.dropped += 1
+            else:
+                sent += 1
+            i += 1
+        self.sent += sent
+        return sent
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "blocked": self.blocked, "dropped": self.dropped}
+
+    def close(self) -> None:
+        self.sock.close()
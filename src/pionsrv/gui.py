@@ -1,37 +1,87 @@
+import argparse
+import contextlib
 import curses
+import socket
 import threading
 import time
+from collections import deque
 import numpy as np
 from pion import Pion  # Импортируем библиотеку для управления дроном
+from swarm_server import DDatagram
+from pionsrv.discovery import NetworkScanner
+from pionsrv.reliable import ACK_SOURCE
+from pionsrv.telemetry import TELEMETRY_MIN_LENGTH
 
 # Отключаем экспоненциальное представление numpy
 np.set_printoptions(suppress=True)
 
-def scan_network():
+def scan_network(scanner=None, force=False):
     """
-    Функция-симулятор сканирования сети.
-    В реальном приложении здесь можно реализовать пинг или рассылку UDP-сообщений.
+    Поиск дронов в сети: телеметрия на порту роя и опрос подсети (см. NetworkScanner).
+    Возвращает список найденных DiscoveredDrone; повторный вызов в пределах ttl берёт кэш.
     """
-    # Для демонстрации возвращаем статический список IP-адресов
-    return ["10.1.100.101", "10.1.100.102", "10.1.100.103"]
+    if scanner is None:
+        scanner = NetworkScanner()
+    return scanner.scan(force=force)
 
 class DroneController:
     """
     Обёртка для управления дроном с использованием Pion.
     В конструкторе создаётся экземпляр Pion с заданным IP.
+    status – текущий шаг последовательности команд (для отображения в интерфейсе).
+    Задержки внутри последовательностей прерываются через cancel_event.
     """
     def __init__(self, ip):
         self.ip = ip
-        self.drone = Pion(ip=ip, mavlink_port=5656, logger=True, dt=0., count_of_checking_points=5)
+        # Вывод Pion в консоль отключён: состояние дрона показывает панель телеметрии
+        self.drone = Pion(ip=ip, mavlink_port=5656, logger=False, dt=0., count_of_checking_points=5)
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
         self.led_thread = None
         self.track_thread = None
         self.stop_led_event = threading.Event()
         self.stop_track_event = threading.Event()
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()  # одна последовательность команд на дрон в каждый момент
+        self.status = "готов"
+
+    def wait(self, seconds):
+        """Задержка внутри последовательности. False – последовательность отменена."""
+        return not self.cancel_event.wait(seconds)
+
+    def in_use(self):
+        """Выполняется последовательность или работает поток LED/track."""
+        return (self.lock.locked()
+                or (self.led_thread is not None and self.led_thread.is_alive())
+                or (self.track_thread is not None and self.track_thread.is_alive()))
+
+    def healthy(self, timeout=5.0):
+        """
+        Сессия MAVLink жива: поток приёма сообщений работает, и сообщение от дрона
+        было не позже timeout секунд назад (отсчёт – с момента подключения).
+        """
+        handler = getattr(self.drone, "_message_handler_thread", None)
+        if not self.drone.message_handler_flag or handler is None or not handler.is_alive():
+            return False
+        return time.time() - max(self.drone.last_message_time, self.created_at) < timeout
+
+    def close(self):
+        """Останавливает потоки Pion и закрывает сокет MAVLink."""
+        self.cancel_event.set()
+        self.stop_led_event.set()
+        self.stop_track_event.set()
+        self.drone.stop()
+        try:
+            self.drone.mavlink_socket.close()
+        except OSError:
+            pass
+        for thread in list(self.drone.threads):
+            if thread is not threading.current_thread():
+                thread.join(timeout=1.0)
 
     def led_continuous(self):
         """Запускает LED в режиме continuous (-c)"""
         self.drone.led_control(255, 0, 255, 0)
-        self.drone.logger = True
         while not self.stop_led_event.is_set():
             time.sleep(0.02)
 
@@ -49,8 +99,11 @@ class DroneController:
     def land_command(self):
         """Команда -l: LED, посадка, задержка и disarm"""
         self.drone.led_control(255, 0, 0, 0)
+        self.status = "посадка"
         self.drone.land()
-        time.sleep(10)
+        if not self.wait(10):
+            return
+        self.status = "disarm"
         self.drone.disarm()
 
     def disarm_command(self):
@@ -71,11 +124,14 @@ class DroneController:
 
     def track_command(self):
         """Команда -tr: arm, takeoff, задержка, старт track point, затем цикл (запускается в отдельном потоке)"""
+        self.status = "взлёт"
         self.drone.arm()
         self.drone.takeoff()
-        time.sleep(8)
+        if not self.wait(8):
+            return
+        self.status = "слежение за точкой"
         self.drone.start_track_point()
-        while not self.stop_track_event.is_set():
+        while not self.stop_track_event.is_set() and not self.cancel_event.is_set():
             time.sleep(1)
 
     def start_track(self):
@@ -93,207 +149,609 @@ class DroneController:
         Действие по умолчанию:
           arm, takeoff, задержка, set_v, goto_from_outside, stop, land.
         """
+        self.status = "взлёт"
         self.drone.arm()
         self.drone.takeoff()
-        time.sleep(8)
+        if not self.wait(8):
+            return
+        self.status = f"полёт в {x, y, z, yaw}"
         self.drone.set_v()
         self.drone.goto_from_outside(x, y, z, yaw)
         self.drone.stop()
+        self.status = "посадка"
         self.drone.land()
 
+
+class ControllerPool:
+    """
+    Параллельное выполнение последовательностей команд на нескольких дронах.
+
+    Для каждого IP создаётся свой DroneController (подключение Pion – тоже в
+    пуле потоков, чтобы не блокировать интерфейс). Последовательности разных
+    дронов идут одновременно; на одном дроне новая последовательность отменяет
+    текущую (cancel_event) и начинается после её завершения. Задача, ещё не
+    занявшая дрон (например, ждущая подключения), выполняется, только если после
+    неё ничего не поставлено и не отменено (generations): последняя команда главнее.
+
+    Подключения переиспользуются между выборами дронов. Фоновая проверка раз в
+    check_interval секунд закрывает незанятые подключения, простаивающие дольше
+    idle_timeout, и подключения без сообщений от дрона дольше health_timeout;
+    следующая команда такому дрону подключается заново.
+
+    Задачи выполняются в daemon-потоках (не больше max_workers одновременно):
+    вызовы Pion вроде goto_yaw не прерываются и не должны задерживать выход.
+    """
+    def __init__(self, max_workers=32, idle_timeout=300.0, health_timeout=5.0, check_interval=5.0):
+        self.slots = threading.BoundedSemaphore(max_workers)
+        self.idle_timeout = idle_timeout
+        self.health_timeout = health_timeout
+        self.controllers = {}
+        self.tasks = {}  # ip -> (название, поток)
+        self.generations = {}  # ip -> номер последней поставленной задачи: выполняется только она
+        self.errors = {}
+        self.lock = threading.Lock()
+        self.connect_locks = {}  # ip -> Lock: одно подключение на IP одновременно
+        self.closed = threading.Event()
+        self.reaper = threading.Thread(target=self._reap_loop, args=(check_interval,), daemon=True)
+        self.reaper.start()
+
+    def controller(self, ip):
+        with self.lock:
+            connect_lock = self.connect_locks.setdefault(ip, threading.Lock())
+        with connect_lock:
+            controller = self.controllers.get(ip)
+            if controller is not None and not controller.in_use() and not controller.healthy(self.health_timeout):
+                self._close(ip, controller)
+                controller = None
+            if controller is None:
+                controller = DroneController(ip)
+                with self.lock:
+                    self.controllers[ip] = controller
+            controller.last_used = time.monotonic()
+        return controller
+
+    def warm(self, ips):
+        """Подключение к дронам заранее, в фоне: первая команда не ждёт установки связи."""
+        for ip in ips:
+            if ip not in self.controllers:
+                self._spawn(self.controller, ip)
+
+    def _spawn(self, target, *args):
+        def run():
+            with self.slots:
+                target(*args)
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def _close(self, ip, controller):
+        with self.lock:
+            if self.controllers.get(ip) is controller:
+                del self.controllers[ip]
+        try:
+            controller.close()
+        except Exception as e:
+            self.errors[ip] = f"закрытие подключения: {e}"
+
+    def _reap_loop(self, interval):
+        while not self.closed.wait(interval):
+            for ip, controller in list(self.controllers.items()):
+                if controller.in_use():
+                    continue
+                with self.lock:
+                    connect_lock = self.connect_locks.setdefault(ip, threading.Lock())
+                # Под connect_lock controller() не выдаёт это подключение, пока оно закрывается;
+                # выданное меньше interval назад могло ещё не занять controller.lock – не трогаем
+                with connect_lock:
+                    if self.controllers.get(ip) is not controller or controller.in_use():
+                        continue
+                    unused = time.monotonic() - controller.last_used
+                    if unused < interval:
+                        continue
+                    if unused > self.idle_timeout or not controller.healthy(self.health_timeout):
+                        self._close(ip, controller)
+
+    def _run(self, ip, name, action, generation):
+        try:
+            controller = self.controller(ip)
+            with controller.lock:
+                # Пока задача подключалась и ждала lock, могли поставить новую или отменить – эта устарела
+                if self.generations.get(ip) != generation:
+                    return
+                controller.cancel_event.clear()
+                controller.status = name
+                action(controller)
+                controller.status = "отменено" if controller.cancel_event.is_set() else "выполнено"
+            self.errors.pop(ip, None)
+        except Exception as e:
+            self.errors[ip] = f"{name}: ошибка: {e}"
+
+    def submit(self, ips, name, action):
+        """
+        Запускает action(controller) на каждом дроне из ips, не дожидаясь выполнения.
+        """
+        for ip in ips:
+            self.cancel([ip])
+            self.tasks[ip] = (name, self._spawn(self._run, ip, name, action, self.generations[ip]))
+
+    def cancel(self, ips):
+        """
+        Отменяет текущую последовательность и ещё не начатые (подключающиеся) задачи дронов ips.
+        """
+        for ip in ips:
+            self.generations[ip] = self.generations.get(ip, 0) + 1
+            controller = self.controllers.get(ip)
+            if controller is not None:
+                controller.cancel_event.set()
+
+    def busy(self, ips):
+        return [ip for ip in ips if ip in self.tasks and self.tasks[ip][1].is_alive()]
+
+    def status(self, ip):
+        if ip in self.errors:
+            return self.errors[ip]
+        if ip not in self.tasks:
+            return "нет задач"
+        name, thread = self.tasks[ip]
+        controller = self.controllers.get(ip)
+        if controller is None:
+            return f"{name}: подключение..." if thread.is_alive() else f"{name}: подключение закрыто"
+        return f"{name}: {controller.status}"
+
+    def connection_status(self, ip):
+        controller = self.controllers.get(ip)
+        if controller is None:
+            return "нет подключения"
+        if not controller.healthy(self.health_timeout):
+            return "нет сообщений от дрона"
+        return "на связи" if controller.drone.last_message_time else "подключение..."
+
+    def shutdown(self):
+        self.closed.set()
+        self.cancel(list(self.controllers))
+        for ip, controller in list(self.controllers.items()):
+            self._close(ip, controller)
+
+class TelemetryFeed:
+    """
+    Приём телеметрии роя в фоновом потоке. Пакеты передаются интерфейсу через
+    deque без блокировок (append/popleft атомарны): поток приёма не ждёт
+    отрисовку, а интерфейс забирает накопленное раз в кадр (drain).
+    """
+    def __init__(self, port=37020, maxlen=4096):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("", port))
+        self.sock.settimeout(0.5)
+        self.updates = deque(maxlen=maxlen)  # (id, ip, позиция, время приёма)
+        self.running = True
+        self.thread = threading.Thread(target=self._receive_loop, daemon=True)
+        self.thread.start()
+
+    def _receive_loop(self):
+        decoder = DDatagram()
+        while self.running:
+            try:
+                data, addr = self.sock.recvfrom(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            valid, payload = decoder.read_serialized(data)
+            if not valid or payload.command != 0 or payload.source == ACK_SOURCE:
+                continue
+            if len(payload.data) >= TELEMETRY_MIN_LENGTH:
+                self.updates.append((str(payload.id), addr[0], tuple(payload.data[1:4]), time.monotonic()))
+
+    def drain(self):
+        items = []
+        try:
+            while True:
+                items.append(self.updates.popleft())
+        except IndexError:
+            return items
+
+    def close(self):
+        self.running = False
+        self.thread.join(timeout=1.0)
+        self.sock.close()
+
 class CursesInterface:
     """
     Интерфейс на базе curses:
-      - Главное меню с возможностью сканирования сети, выбора IP дрона и выполнения команд.
+      - Главное меню с возможностью сканирования сети, выбора дронов и выполнения команд.
+      - Команда выполняется сразу на всех выбранных дронах параллельно (ControllerPool).
       - При выборе команды запрашиваются необходимые параметры.
+
+    Цикл событий не блокируется: клавиши читаются с таймаутом, сканирование и
+    команды идут в фоновых потоках, их результаты передаются в цикл через очередь
+    events. Окна (меню, телеметрия, журнал) перерисовываются с частотой
+    refresh_rate, и только изменившиеся строки. Панель телеметрии показывает для
+    каждого дрона позицию, напряжение батареи, время с последнего пакета и ход
+    выполнения команды.
     """
-    def __init__(self, stdscr):
+    MAIN_MENU = ["Сканировать сеть", "Выбрать дрон", "Выполнить команду", "Выход"]
+    COMMANDS = [
+        "LED Continuous (-c)",
+        "Land (-l)",
+        "Disarm (-d)",
+        "Arm+Takeoff (-at)",
+        "Reboot (-r)",
+        "Track (-tr)",
+        "Goto Yaw (yaw)",
+        "Default Command",
+        "Отменить выполнение",
+        "Вернуться"
+    ]
+
+    def __init__(self, stdscr, scanner=None, telemetry_port=37020, refresh_rate=10.0):
         self.stdscr = stdscr
-        self.selected_ip = None
-        self.drone_controller = None
-        self.log_lines = []
+        self.scanner = scanner if scanner is not None else NetworkScanner()
+        self.drone_ids = {}  # ip -> id дронов из телеметрии
+        self.available_ips = []
+        self.selected_ips = []
+        self.pool = ControllerPool()
+        self.log_lines = deque(maxlen=100)
+        self.events = deque()  # функции, которые фоновые потоки передают в цикл интерфейса
+        self.refresh_rate = refresh_rate
+        self.running = True
+        self.scanning = False
+        # Состояние меню: экран, позиция курсора, отмеченные дроны, ввод параметров
+        self.screen = "main"
+        self.cursor = 0
+        self.chosen = set()
+        self.prompt = None
+        self.wait = None
+        self.swarm = {}  # id -> (ip, позиция, время приёма) из телеметрии роя
+        self.drawn = {}  # окно -> строки, выведенные в прошлом кадре
+        try:
+            self.feed = TelemetryFeed(telemetry_port)
+        except OSError as e:
+            self.feed = None
+            self.add_log(f"Приём телеметрии не запущен: {e}")
+        self.layout()
 
     def add_log(self, msg):
         self.log_lines.append(msg)
-        if len(self.log_lines) > 100:
-            self.log_lines = self.log_lines[-100:]
 
-    def draw_logs(self, log_win):
-        log_win.clear()
-        height, width = log_win.getmaxyx()
-        start_line = max(0, len(self.log_lines) - height)
-        for idx, line in enumerate(self.log_lines[start_line:]):
+    def layout(self):
+        """Разбивка экрана на окна: меню слева, телеметрия справа, журнал снизу."""
+        height, width = self.stdscr.getmaxyx()
+        log_height = max(3, min(8, height // 4))
+        menu_width = max(20, min(44, width // 3))
+        top = max(1, height - log_height)
+        self.stdscr.erase()
+        self.stdscr.refresh()
+        self.menu_win = curses.newwin(top, menu_width, 0, 0)
+        self.telemetry_win = curses.newwin(top, max(1, width - menu_width), 0, menu_width)
+        self.log_win = curses.newwin(height - top, width, top, 0)
+        self.menu_win.keypad(True)
+        self.menu_win.timeout(int(1000 / self.refresh_rate))
+        self.drawn = {}
+
+    def draw_lines(self, win, lines):
+        """Выводит строки в окно, перерисовывая только изменившиеся."""
+        height, width = win.getmaxyx()
+        lines = [line[:width-1] for line in lines[:height]]
+        previous = self.drawn.get(win, [])
+        changed = False
+        for row in range(max(len(lines), len(previous))):
+            line = lines[row] if row < len(lines) else ""
+            if row < len(previous) and previous[row] == line:
+                continue
             try:
-                log_win.addstr(idx, 0, line[:width-1])
+                win.addstr(row, 0, line)
+                win.clrtoeol()
             except curses.error:
                 pass
-        log_win.refresh()
+            changed = True
+        self.drawn[win] = lines
+        if changed:
+            win.noutrefresh()
+        return changed
+
+    def draw_logs(self, log_win):
+        height, _ = log_win.getmaxyx()
+        lines = list(self.log_lines)
+        return self.draw_lines(log_win, lines[max(0, len(lines) - height):])
 
     def main_menu(self):
-        menu = ["Сканировать сеть", "Выбрать дрон", "Выполнить команду", "Выход"]
-        current_selection = 0
-        while True:
-            self.stdscr.clear()
-            self.stdscr.addstr(0, 0, "Главное меню:")
-            for idx, item in enumerate(menu):
-                if idx == current_selection:
-                    self.stdscr.addstr(idx+1, 2, "> " + item)
-                else:
-                    self.stdscr.addstr(idx+1, 2, "  " + item)
-            self.stdscr.refresh()
-            key = self.stdscr.getch()
-            if key == curses.KEY_UP and current_selection > 0:
-                current_selection -= 1
-            elif key == curses.KEY_DOWN and current_selection < len(menu)-1:
-                current_selection += 1
-            elif key == ord("\n"):
-                if menu[current_selection] == "Сканировать сеть":
-                    self.scan_network()
-                elif menu[current_selection] == "Выбрать дрон":
-                    self.select_drone()
-                elif menu[current_selection] == "Выполнить команду":
-                    self.command_menu()
-                elif menu[current_selection] == "Выход":
-                    break
+        """Цикл событий: клавиши, события фоновых потоков и перерисовка по таймеру."""
+        period = 1.0 / self.refresh_rate
+        next_frame = time.monotonic()
+        while self.running:
+            key = self.menu_win.getch()
+            while self.events:
+                self.events.popleft()()
+            if key != -1:
+                self.on_key(key)
+            now = time.monotonic()
+            if key != -1 or now >= next_frame:
+                self.render()
+                next_frame = now + period
+
+    def render(self):
+        if self.feed is not None:
+            for drone_id, ip, position, received in self.feed.drain():
+                self.swarm[drone_id] = (ip, position, received)
+        changed = self.draw_lines(self.menu_win, self.menu_lines())
+        changed = self.draw_lines(self.telemetry_win, self.telemetry_lines()) or changed
+        changed = self.draw_logs(self.log_win) or changed
+        if changed:
+            curses.doupdate()
+
+    def menu_lines(self):
+        if self.screen == "prompt":
+            field = self.prompt["fields"][len(self.prompt["values"])]
+            return [f"Введите {field}:", self.prompt["buffer"] + "_", "", "Enter – ввод, ESC – отмена"]
+        if self.screen == "wait":
+            return [self.wait["message"], "", "Нажмите любую клавишу для остановки."]
+        if self.screen == "select":
+            lines = ["Выберите дроны:"]
+            for idx, ip in enumerate(self.available_ips):
+                mark = "[x]" if ip in self.chosen else "[ ]"
+                prefix = "> " if idx == self.cursor else "  "
+                label = f"{ip} (id {', '.join(self.drone_ids[ip])})" if ip in self.drone_ids else ip
+                lines.append(f"  {prefix}{mark} {label}")
+            return lines + ["", "Пробел – отметить, a – все,", "Enter – подтвердить, ESC – возврат"]
+        if self.screen == "commands":
+            title, items = f"Команды для дронов ({len(self.selected_ips)}):", self.COMMANDS
+        else:
+            title, items = "Главное меню:" + (" (сканирование...)" if self.scanning else ""), self.MAIN_MENU
+        return [title] + [("  > " if idx == self.cursor else "    ") + item for idx, item in enumerate(items)]
+
+    def telemetry_lines(self):
+        height, _ = self.telemetry_win.getmaxyx()
+        now = time.monotonic()
+        rows = []
+        for drone_id, (ip, position, received) in sorted(self.swarm.items()):
+            rows.append((ip, drone_id, position, now - received))
+        known = {row[0] for row in rows}
+        for ip in self.selected_ips:
+            if ip not in known:
+                rows.append((ip, "?", None, None))
+        lines = [f"{'IP':<15} {'id':>6} {'x':>7} {'y':>7} {'z':>7} {'бат,В':>6} {'пакет':>6}  состояние"]
+        for ip, drone_id, position, age in rows:
+            battery = None
+            status = ""
+            controller = self.pool.controllers.get(ip)
+            if controller is not None:
+                drone = controller.drone
+                battery = drone.battery_voltage
+                if drone.last_message_time:
+                    pion_age = time.time() - drone.last_message_time
+                    if age is None or pion_age < age:
+                        age, position = pion_age, tuple(drone.position[0:3])
+                status = self.pool.connection_status(ip)
+            if ip in self.pool.tasks:
+                status = self.pool.status(ip)
+            xyz = " ".join(f"{v:7.2f}" for v in position) if position is not None else f"{'—':>7} " * 3
+            lines.append(f"{ip:<15} {drone_id:>6} {xyz.rstrip():<23} "
+                         f"{f'{battery:.2f}' if battery is not None else '—':>6} "
+                         f"{f'{age:.1f}с' if age is not None else '—':>6}  {status}")
+        if len(lines) > height:
+            lines = lines[:height - 1] + [f"... ещё {len(lines) - height + 1}"]
+        return lines if rows else lines + ["Телеметрия не получена."]
+
+    def set_screen(self, screen):
+        self.screen = screen
+        self.cursor = 0
+
+    def on_key(self, key):
+        if key == curses.KEY_RESIZE:
+            self.layout()
+            return
+        if self.screen == "prompt":
+            self.on_prompt_key(key)
+            return
+        if self.screen == "wait":
+            wait, self.wait = self.wait, None
+            self.set_screen("commands")
+            wait["on_key"]()
+            return
+        count = {"main": len(self.MAIN_MENU), "select": len(self.available_ips),
+                 "commands": len(self.COMMANDS)}[self.screen]
+        if key == curses.KEY_UP and self.cursor > 0:
+            self.cursor -= 1
+        elif key == curses.KEY_DOWN and self.cursor < count - 1:
+            self.cursor += 1
+        elif self.screen == "select":
+            self.on_select_key(key)
+        elif key == 27 and self.screen == "commands":  # ESC
+            self.set_screen("main")
+        elif key == ord("\n"):
+            if self.screen == "main":
+                self.on_main_item(self.MAIN_MENU[self.cursor])
+            else:
+                self.execute_command(self.COMMANDS[self.cursor])
+
+    def on_main_item(self, item):
+        if item == "Сканировать сеть":
+            self.scan_network()
+        elif item == "Выбрать дрон":
+            self.select_drone()
+        elif item == "Выполнить команду":
+            self.command_menu()
+        elif item == "Выход":
+            self.running = False
 
     def scan_network(self):
+        if self.scanning:
+            self.add_log("Сканирование уже идёт.")
+            return
+        self.scanning = True
         self.add_log("Сканирование сети...")
-        ips = scan_network()
-        self.add_log("Найденные IP: " + ", ".join(ips))
+        threading.Thread(target=self._scan_worker, daemon=True).start()
+
+    def _scan_worker(self):
+        try:
+            drones = scan_network(self.scanner, force=True)
+        except OSError as e:
+            self.events.append(lambda: self._scan_done([], e))
+            return
+        self.events.append(lambda: self._scan_done(drones))
+
+    def _scan_done(self, drones, error=None):
+        self.scanning = False
+        if error is not None:
+            self.add_log(f"Ошибка сканирования: {error}")
+            return
+        self.drone_ids = {}
+        for d in drones:
+            if d.drone_id is not None:
+                self.drone_ids.setdefault(d.ip, []).append(d.drone_id)
+        ips = list(dict.fromkeys(d.ip for d in drones))
+        self.add_log("Найденные IP: " + (", ".join(ips) if ips else "нет"))
         self.available_ips = ips
+        # Повторное сканирование могло прийти во время выбора: курсор и отметки – по новому списку
+        self.chosen &= set(ips)
+        if self.screen == "select":
+            if ips:
+                self.cursor = min(self.cursor, len(ips) - 1)
+            else:
+                self.set_screen("main")
 
     def select_drone(self):
-        if not hasattr(self, "available_ips") or not self.available_ips:
+        if not self.available_ips:
             self.add_log("Сначала выполните сканирование сети!")
             return
-        current_selection = 0
-        while True:
-            self.stdscr.clear()
-            self.stdscr.addstr(0, 0, "Выберите дрон:")
-            for idx, ip in enumerate(self.available_ips):
-                if idx == current_selection:
-                    self.stdscr.addstr(idx+1, 2, "> " + ip)
-                else:
-                    self.stdscr.addstr(idx+1, 2, "  " + ip)
-            self.stdscr.addstr(len(self.available_ips)+2, 0, "Нажмите Enter для выбора, ESC для возврата")
-            self.stdscr.refresh()
-            key = self.stdscr.getch()
-            if key == curses.KEY_UP and current_selection > 0:
-                current_selection -= 1
-            elif key == curses.KEY_DOWN and current_selection < len(self.available_ips)-1:
-                current_selection += 1
-            elif key == 27:  # ESC
-                break
-            elif key == ord("\n"):
-                self.selected_ip = self.available_ips[current_selection]
-                self.add_log(f"Выбран дрон: {self.selected_ip}")
-                self.drone_controller = DroneController(self.selected_ip)
-                break
+        self.chosen = set(self.selected_ips)
+        self.set_screen("select")
+
+    def on_select_key(self, key):
+        if not self.available_ips:
+            self.set_screen("main")
+        elif key == ord(" "):
+            self.chosen ^= {self.available_ips[self.cursor]}
+        elif key == ord("a"):
+            self.chosen = set() if len(self.chosen) == len(self.available_ips) else set(self.available_ips)
+        elif key == 27:  # ESC
+            self.set_screen("main")
+        elif key == ord("\n"):
+            if not self.chosen:
+                self.chosen = {self.available_ips[self.cursor]}
+            self.selected_ips = [ip for ip in self.available_ips if ip in self.chosen]
+            self.add_log(f"Выбраны дроны: {', '.join(self.selected_ips)}")
+            self.pool.warm(self.selected_ips)
+            self.set_screen("main")
 
     def command_menu(self):
-        if not self.drone_controller:
-            self.add_log("Сначала выберите дрон!")
+        if not self.selected_ips:
+            self.add_log("Сначала выберите дроны!")
             return
-        commands = [
-            "LED Continuous (-c)",
-            "Land (-l)",
-            "Disarm (-d)",
-            "Arm+Takeoff (-at)",
-            "Reboot (-r)",
-            "Track (-tr)",
-            "Goto Yaw (yaw)",
-            "Default Command",
-            "Вернуться"
-        ]
-        current_selection = 0
-        while True:
-            self.stdscr.clear()
-            self.stdscr.addstr(0, 0, f"Команды для дрона {self.selected_ip}:")
-            for idx, cmd in enumerate(commands):
-                if idx == current_selection:
-                    self.stdscr.addstr(idx+1, 2, "> " + cmd)
-                else:
-                    self.stdscr.addstr(idx+1, 2, "  " + cmd)
-            self.stdscr.refresh()
-            key = self.stdscr.getch()
-            if key == curses.KEY_UP and current_selection > 0:
-                current_selection -= 1
-            elif key == curses.KEY_DOWN and current_selection < len(commands)-1:
-                current_selection += 1
-            elif key == ord("\n"):
-                selected_cmd = commands[current_selection]
-                if selected_cmd == "Вернуться":
-                    break
-                self.execute_command(selected_cmd)
-                self.stdscr.addstr(len(commands)+2, 0, "Нажмите любую клавишу для продолжения...")
-                self.stdscr.getch()
-
-    def prompt_input(self, prompt):
-        curses.echo()
-        self.stdscr.clear()
-        self.stdscr.addstr(0, 0, prompt)
-        self.stdscr.refresh()
-        input_str = self.stdscr.getstr(1, 0, 60).decode("utf-8")
-        curses.noecho()
-        return input_str
+        self.set_screen("commands")
+
+    def prompt_input(self, fields, on_done):
+        """Ввод чисел fields по очереди; по окончании вызывается on_done(значения)."""
+        self.prompt = {"fields": fields, "values": [], "buffer": "", "on_done": on_done}
+        self.screen = "prompt"
+
+    def on_prompt_key(self, key):
+        prompt = self.prompt
+        if key == 27:  # ESC
+            self.prompt = None
+            self.screen = "commands"
+        elif key in (curses.KEY_BACKSPACE, 127, 8):
+            prompt["buffer"] = prompt["buffer"][:-1]
+        elif key == ord("\n"):
+            try:
+                prompt["values"].append(float(prompt["buffer"]))
+            except ValueError:
+                self.add_log(f"Неверное значение {prompt['fields'][len(prompt['values'])]}: {prompt['buffer']!r}")
+            prompt["buffer"] = ""
+            if len(prompt["values"]) == len(prompt["fields"]):
+                self.prompt = None
+                self.screen = "commands"
+                prompt["on_done"](*prompt["values"])
+        elif 32 <= key < 127 and len(prompt["buffer"]) < 60:
+            prompt["buffer"] += chr(key)
+
+    def wait_key(self, message, on_key):
+        """Экран ожидания: любая клавиша вызывает on_key(), телеметрия продолжает обновляться."""
+        self.wait = {"message": message, "on_key": on_key}
+        self.screen = "wait"
 
     def execute_command(self, cmd):
-        self.add_log(f"Выполнение команды: {cmd}")
+        ips = list(self.selected_ips)
+        if cmd == "Вернуться":
+            self.set_screen("main")
+            return
+        self.add_log(f"Выполнение команды: {cmd} ({len(ips)} дронов)")
         if cmd.startswith("LED Continuous"):
-            # Запуск LED в отдельном потоке
-            self.drone_controller.start_led_continuous()
-            self.add_log("LED Continuous запущен. Нажмите любую клавишу для остановки.")
-            self.stdscr.getch()
-            self.drone_controller.stop_led_continuous()
-            self.add_log("LED Continuous остановлен.")
+            # Запуск LED в отдельном потоке на каждом дроне
+            self.pool.submit(ips, "LED", lambda c: c.start_led_continuous())
+
+            def stop_led():
+                self.pool.submit(ips, "LED стоп", lambda c: c.stop_led_continuous())
+                self.add_log("LED Continuous остановлен.")
+            self.wait_key("LED Continuous запущен.", stop_led)
         elif cmd.startswith("Land"):
-            self.drone_controller.land_command()
-            self.add_log("Команда land выполнена.")
+            self.pool.submit(ips, "land", lambda c: c.land_command())
         elif cmd.startswith("Disarm"):
-            self.drone_controller.disarm_command()
-            self.add_log("Команда disarm выполнена.")
+            self.pool.submit(ips, "disarm", lambda c: c.disarm_command())
         elif cmd.startswith("Arm+Takeoff"):
-            self.drone_controller.arm_takeoff()
-            self.add_log("Команда arm+takeoff выполнена.")
+            self.pool.submit(ips, "arm+takeoff", lambda c: c.arm_takeoff())
         elif cmd.startswith("Reboot"):
-            self.drone_controller.reboot_command()
-            self.add_log("Команда reboot выполнена.")
+            self.pool.submit(ips, "reboot", lambda c: c.reboot_command())
         elif cmd.startswith("Track"):
-            self.drone_controller.start_track()
-            self.add_log("Команда track запущена. Нажмите любую клавишу для остановки.")
-            self.stdscr.getch()
-            self.drone_controller.stop_track_event.set()
-            if self.drone_controller.track_thread:
-                self.drone_controller.track_thread.join()
-            self.add_log("Track остановлен.")
+            self.pool.submit(ips, "track", lambda c: c.track_command())
+
+            def stop_track():
+                self.pool.cancel(ips)
+                self.add_log("Track остановлен.")
+            self.wait_key("Команда track запущена.", stop_track)
         elif cmd.startswith("Goto Yaw"):
-            yaw_str = self.prompt_input("Введите значение yaw:")
-            try:
-                yaw = float(yaw_str)
-                self.drone_controller.goto_yaw(yaw)
-                self.add_log(f"Команда goto_yaw выполнена с yaw={yaw}.")
-            except ValueError:
-                self.add_log("Неверное значение yaw.")
+            self.prompt_input(["yaw"], lambda yaw: self.pool.submit(
+                ips, f"goto_yaw {yaw}", lambda c: c.goto_yaw(yaw)))
         elif cmd.startswith("Default Command"):
-            x_str = self.prompt_input("Введите x:")
-            y_str = self.prompt_input("Введите y:")
-            z_str = self.prompt_input("Введите z:")
-            yaw_str = self.prompt_input("Введите yaw:")
-            try:
-                x = float(x_str)
-                y = float(y_str)
-                z = float(z_str)
-                yaw = float(yaw_str)
-                self.drone_controller.default_command(x, y, z, yaw)
-                self.add_log("Default Command выполнена.")
-            except ValueError:
-                self.add_log("Неверные параметры для Default Command.")
+            self.prompt_input(["x", "y", "z", "yaw"], lambda x, y, z, yaw: self.pool.submit(
+                ips, "default", lambda c: c.default_command(x, y, z, yaw)))
+        elif cmd.startswith("Отменить"):
+            self.pool.cancel(ips)
+            self.add_log("Выполнение отменено.")
         else:
             self.add_log("Неизвестная команда.")
 
-def main(stdscr):
-    interface = CursesInterface(stdscr)
-    interface.main_menu()
+    def close(self):
+        if self.feed is not None:
+            self.feed.close()
+        self.pool.shutdown()
+
+class _LogWriter:
+    """
+    Файл для print(): строки попадают в журнал интерфейса, а не поверх экрана curses
+    (Pion.stop() и другие вызовы библиотеки печатают в stdout).
+    """
+    def __init__(self, add_log):
+        self.add_log = add_log
+        self.buffer = ""
+
+    def write(self, text):
+        self.buffer += text
+        *lines, self.buffer = self.buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                self.add_log(line)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def main(stdscr, scanner=None, telemetry_port=37020):
+    curses.curs_set(0)
+    interface = CursesInterface(stdscr, scanner, telemetry_port)
+    writer = _LogWriter(interface.add_log)
+    with contextlib.redirect_stdout(writer), contextlib.redirect_stderr(writer):
+        try:
+            interface.main_menu()
+        finally:
+            interface.close()
 
 if __name__ == "__main__":
-    curses.wrapper(main)
+    parser = argparse.ArgumentParser(description="Управление дронами через Pion")
+    parser.add_argument("--port", type=int, default=37020, help="порт телеметрии роя")
+    parser.add_argument("--subnet", default=None, help="подсеть для опроса, например 10.1.100.0/24")
+    parser.add_argument("--ttl", type=float, default=30.0, help="время хранения результатов поиска, сек")
+    args = parser.parse_args()
+    curses.wrapper(main, NetworkScanner(port=args.port, subnet=args.subnet, ttl=args.ttl), args.port)
@@ -0,0 +1,133 @@
+import multiprocessing as mp
+import os
+import queue
+import shutil
+import subprocess
+import time
+
+# Расширения, для которых кадры пишутся в видео через ffmpeg; иначе output – каталог PNG
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".avi", ".mov", ".webm")
+
+
+class PngSequenceWriter:
+    """
+    Запись кадров в каталог: frame_000000.png, frame_000001.png, ...
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.index = 0
+
+    def write(self, fig) -> None:
+        fig.savefig(os.path.join(self.directory, f"frame_{self.index:06d}.png"))
+        self.index += 1
+
+    def close(self) -> None:
+        pass
+
+
+class FfmpegWriter:
+    """
+    Запись кадров в видео: RGBA-буфер холста Agg передаётся в stdin ffmpeg.
+    """
+
+    def __init__(self, filename: str, fps: float, size: tuple):
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            raise RuntimeError("ffmpeg не найден в PATH")
+        width, height = size
+        self.process = subprocess.Popen(
+            [ffmpeg, "-y", "-loglevel", "error",
+             "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{width}x{height}", "-r", str(fps),
+             "-i", "-", "-an", "-pix_fmt", "yuv420p", "-vcodec", "libx264", filename],
+            stdin=subprocess.PIPE,
+        )
+
+    def write(self, fig) -> None:
+        self.process.stdin.write(fig.canvas.buffer_rgba())
+
+    def close(self) -> None:
+        self.process.stdin.close()
+        self.process.wait()
+
+
+def render_worker(frames, output: str, fps: float, figsize: tuple = (10, 8), dpi: int = 100) -> None:
+    """
+    Процесс рендера: получает кадры (SwarmState.frame()) из очереди до None,
+    рисует их на холсте Agg и пишет в PNG или видео.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from pionsrv.renderer import SwarmRenderer
+
+    fig = Figure(figsize=figsize, dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    renderer = SwarmRenderer(fig.add_subplot(), animated=False)
+    canvas.draw()
+    if output.lower().endswith(VIDEO_EXTENSIONS):
+        writer = FfmpegWriter(output, fps, canvas.get_width_height())
+    else:
+        writer = PngSequenceWriter(output)
+    try:
+        while True:
+            frame = frames.get()
+            if frame is None:
+                break
+            renderer.draw(frame)
+            canvas.draw()
+            writer.write(fig)
+    finally:
+        writer.close()
+
+
+class HeadlessRenderer:
+    """
+    Headless-рендер в отдельном процессе. submit() никогда не блокирует
+    вызывающий поток: если рендер не успевает, кадр отбрасывается (dropped),
+    поэтому нагрузка отрисовки не мешает приёму телеметрии.
+    """
+
+    def __init__(self, output: str, fps: float = 30.0, max_pending: int = 8, **kwargs):
+        # Без ffmpeg процесс рендера упал бы сразу, а кадры копились бы в очереди
+        if output.lower().endswith(VIDEO_EXTENSIONS) and shutil.which("ffmpeg") is None:
+            raise RuntimeError("ffmpeg не найден в PATH")
+        self.output = output
+        self.fps = fps
+        self.frames = mp.Queue(maxsize=max_pending)
+        self.process = mp.Process(target=render_worker, args=(self.frames, output, fps), kwargs=kwargs,
+                                  daemon=True)
+        self.submitted = 0
+        self.dropped = 0
+
+    def start(self) -> None:
+        self.process.start()
+
+    def submit(self, frame: dict) -> bool:
+        try:
+            self.frames.put_nowait(frame)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def close(self, timeout: float = 30.0) -> None:
+        """
+        Дожидается отрисовки оставшихся кадров и завершает процесс.
+        Если процесс рендера уже завершился (ошибка записи), очередь не ждёт.
+        """
+        deadline = time.monotonic() + timeout
+        while self.process.is_alive() and time.monotonic() < deadline:
+            try:
+                self.frames.put(None, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        self.process.join(max(0.0, deadline - time.monotonic()))
+        if self.process.is_alive():
+            self.process.terminate()
+        # Непрочитанные кадры не должны задерживать выход из-за фонового потока очереди
+        self.frames.cancel_join_thread()
@@ -0,0 +1,273 @@
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+# Границы корзин гистограмм по умолчанию, секунды (от 10 мкс до 1 с)
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _labels(label_name: Optional[str], value) -> str:
+    if label_name is None or value is None:
+        return ""
+    return f'{{{label_name}="{value}"}}'
+
+
+class Counter:
+    """
+    Монотонный счётчик, опционально с одной меткой (например, command).
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, label: Optional[str] = None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, label=None) -> None:
+        with self.lock:
+            self.values[label] = self.values.get(label, 0) + amount
+
+    def samples(self) -> list:
+        with self.lock:
+            return [(self.name + _labels(self.label, key), value) for key, value in self.values.items()]
+
+    def to_dict(self):
+        with self.lock:
+            return dict(self.values) if self.label else self.values.get(None, 0)
+
+
+class Gauge:
+    """
+    Текущее значение: задаётся set() или вычисляется при экспорте функцией func()
+    (число или словарь значение_метки -> число).
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, label: Optional[str] = None, func: Optional[Callable] = None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.func = func
+        self.values = {}
+
+    def set(self, value: float, label=None) -> None:
+        self.values[label] = value
+
+    def _current(self) -> dict:
+        if self.func is None:
+            return dict(self.values)
+        value = self.func()
+        return value if isinstance(value, dict) else {None: value}
+
+    def samples(self) -> list:
+        return [(self.name + _labels(self.label, key), value) for key, value in self._current().items()]
+
+    def to_dict(self):
+        values = self._current()
+        return values if self.label else values.get(None, 0)
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами (сумма, число, накопленные корзины – как в Prometheus).
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def samples(self) -> list:
+        with self.lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        result = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            result.append((f'{self.name}_bucket{{le="{le}"}}', cumulative))
+        result.append((f"{self.name}_sum", total))
+        result.append((f"{self.name}_count", count))
+        return result
+
+    def quantile(self, q: float) -> float:
+        """
+        Оценка квантиля по корзинам (верхняя граница корзины).
+        """
+        with self.lock:
+            counts, count = list(self.counts), self.count
+        if not count:
+            return 0.0
+        rank = q * count
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            count, total = self.count, self.sum
+        return {"count": count, "mean": total / count if count else 0.0,
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95), "p99": self.quantile(0.99)}
+
+
+class MetricsRegistry:
+    """
+    Набор метрик процесса. Компоненты получают registry (или None, если метрики
+    выключены) и проверяют его так же, как recorder: `if self.metrics is not None`,
+    поэтому без метрик горячие пути не тратят ничего, кроме одной проверки.
+    """
+
+    def __init__(self, prefix: str = "pionsrv_"):
+        self.prefix = prefix
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _add(self, metric):
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str = "", label: Optional[str] = None) -> Counter:
+        return self._add(Counter(self.prefix + name, help, label))
+
+    def gauge(self, name: str, help: str = "", label: Optional[str] = None,
+              func: Optional[Callable] = None) -> Gauge:
+        return self._add(Gauge(self.prefix + name, help, label, func))
+
+    def histogram(self, name: str, help: str = "", buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(self.prefix + name, help, buckets))
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, value in metric.samples():
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        return {name[len(self.prefix):]: metric.to_dict() for name, metric in list(self.metrics.items())}
+
+
+def _make_handler(registry: MetricsRegistry):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body = json.dumps(registry.to_dict(), default=str).encode()
+                content_type = "application/json"
+            elif self.path.startswith("/metrics"):
+                body = registry.to_prometheus().encode()
+                content_type = "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class MetricsServer:
+    """
+    Локальный HTTP: /metrics – текстовый формат Prometheus, /metrics.json – JSON.
+    """
+
+    def __init__(self, registry: MetricsRegistry, port: int = 9108, host: str = "127.0.0.1"):
+        self.httpd = ThreadingHTTPServer((host, port), _make_handler(registry))
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"Метрики: http://{host}:{self.httpd.server_address[1]}/metrics")
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class JsonDumper:
+    """
+    Периодическая запись метрик в JSON-файл (атомарно, через временный файл).
+    Ошибка записи или функции gauge печатается и не останавливает запись:
+    следующая попытка – через interval.
+    """
+
+    def __init__(self, registry: MetricsRegistry, path: str, interval: float = 5.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self.last_error = None
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def dump(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"time": time.time(), "metrics": self.registry.to_dict()}, f, default=str, indent=1)
+        os.replace(tmp, self.path)
+
+    def _safe_dump(self) -> None:
+        try:
+            self.dump()
+        except Exception as error:
+            # Одна и та же ошибка на каждом интервале печатается один раз
+            if repr(error) != self.last_error:
+                print(f"Метрики не записаны в {self.path}: {error}")
+            self.last_error = repr(error)
+        else:
+            if self.last_error is not None:
+                print(f"Запись метрик в {self.path} восстановлена.")
+            self.last_error = None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._safe_dump()
+
+    def close(self) -> None:
+        self._stop.set()
+        self.thread.join(timeout=1.0)
+        self._safe_dump()
+
+
+def start_exporters(registry: MetricsRegistry, port: Optional[int] = None, json_path: Optional[str] = None,
+                    interval: float = 5.0) -> list:
+    """
+    Запускает выбранные способы выдачи метрик. Возвращает объекты с методом close().
+    """
+    exporters = []
+    if port is not None:
+        exporters.append(MetricsServer(registry, port))
+    if json_path:
+        exporters.append(JsonDumper(registry, json_path, interval))
+    return exporters
@@ -0,0 +1,305 @@
+import itertools
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+import numpy as np
+
+
+@dataclass(frozen=True)
+class Conflict:
+    """
+    Сближение пары дронов: distance – текущее расстояние, min_distance и time –
+    наименьшее расстояние при движении с текущими скоростями и через сколько секунд
+    оно будет достигнуто (0 – дроны уже ближе допустимого).
+    """
+    first: str
+    second: str
+    distance: float
+    min_distance: float
+    time: float
+
+
+class SpatialGrid:
+    """
+    Равномерная сетка: точка хранится в ячейке floor(position / cell).
+    update() переносит точку в другую ячейку, только если она из своей вышла,
+    поэтому обновление на каждом пакете телеметрии – O(1). Поиск соседей
+    просматривает только ячейки в пределах радиуса, а не все точки.
+    """
+
+    def __init__(self, cell: float):
+        self.cell = cell
+        self.cells = {}  # (i, j, k) -> {ключ: позиция}
+        self.points = {}  # ключ -> ячейка
+        self._offsets = {}
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, key):
+        return key in self.points
+
+    def _cell_of(self, position) -> tuple:
+        return (math.floor(position[0] / self.cell), math.floor(position[1] / self.cell),
+                math.floor(position[2] / self.cell))
+
+    def update(self, key, position) -> None:
+        cell = self._cell_of(position)
+        old = self.points.get(key)
+        if old is not None and old != cell:
+            self._discard(key, old)
+        self.cells.setdefault(cell, {})[key] = tuple(position)
+        self.points[key] = cell
+
+    def remove(self, key) -> None:
+        cell = self.points.pop(key, None)
+        if cell is not None:
+            self._discard(key, cell)
+
+    def _discard(self, key, cell: tuple) -> None:
+        members = self.cells[cell]
+        del members[key]
+        if not members:
+            del self.cells[cell]
+
+    def get(self, key) -> Optional[tuple]:
+        cell = self.points.get(key)
+        return None if cell is None else self.cells[cell][key]
+
+    def _neighbour_offsets(self, reach: int) -> tuple:
+        """
+        Смещения соседних ячеек: (все, половина без зеркальных – для перебора пар).
+        """
+        offsets = self._offsets.get(reach)
+        if offsets is None:
+            every = list(itertools.product(range(-reach, reach + 1), repeat=3))
+            offsets = self._offsets[reach] = (every, [o for o in every if o > (0, 0, 0)])
+        return offsets
+
+    def query(self, position, radius: float) -> list:
+        """
+        [(ключ, расстояние), ...] точек не дальше radius от position.
+        """
+        every, _ = self._neighbour_offsets(math.ceil(radius / self.cell))
+        i, j, k = self._cell_of(position)
+        found = []
+        for di, dj, dk in every:
+            members = self.cells.get((i + di, j + dj, k + dk))
+            if members is None:
+                continue
+            for key, point in members.items():
+                distance = math.dist(point, position)
+                if distance <= radius:
+                    found.append((key, distance))
+        return found
+
+    def candidate_pairs(self, radius: float) -> list:
+        """
+        Пары ключей из ячеек не дальше radius друг от друга (каждая пара один раз).
+        Расстояние не проверяется: точные расстояния векторно считает вызывающий.
+        """
+        _, half = self._neighbour_offsets(math.ceil(radius / self.cell))
+        pairs = []
+        for (i, j, k), members in self.cells.items():
+            keys = list(members)
+            if len(keys) > 1:
+                pairs.extend(itertools.combinations(keys, 2))
+            for di, dj, dk in half:
+                other = self.cells.get((i + di, j + dj, k + dk))
+                if other is not None:
+                    pairs.extend(itertools.product(keys, other))
+        return pairs
+
+
+class ProximityMonitor:
+    """
+    Контроль сближения дронов по телеметрии.
+
+    Позиции дронов и их последние цели goto/smart_goto хранятся в двух
+    SpatialGrid. Ячейка сетки позиций – separation + 2 * max_speed * horizon:
+    дроны, сблизившиеся бы за horizon секунд, лежат в соседних ячейках. На каждом
+    пакете телеметрии позиция дрона переносится в сетке, а не чаще check_rate раз
+    в секунду проверяются пары из соседних ячеек: ближе separation – сближение,
+    иначе по текущим скоростям ищется точка наибольшего сближения в пределах
+    horizon (предсказанный конфликт). Окрестность зависит от наибольшей скорости
+    роя, но не шире, чем для max_speed: один дрон с выбросом скорости не
+    превращает проверку в перебор всех n²/2 пар. Дроны быстрее max_speed
+    проверяются со всеми дронами (их число – stats()["fast"]), иначе их
+    сближения за пределами окрестности не предсказывались бы. Записи с NaN/inf
+    пропускаются.
+
+    notify – куда сообщать о новых сближениях (например, ControlServer.notify);
+    вызывается из потока приёма телеметрии. None – не сообщать: сближения
+    доступны в self.conflicts и format().
+
+    check_targets() проверяет новые цели: не ближе separation к целям других
+    дронов, к дронам, висящим без цели, и друг к другу.
+    """
+
+    def __init__(self, separation: float = 1.0, horizon: float = 2.0, max_speed: float = 1.0,
+                 check_rate: float = 10.0, expire_after: float = 3.0,
+                 notify: Optional[Callable[[str], None]] = None):
+        self.separation = separation
+        self.horizon = horizon
+        self.check_interval = 1.0 / check_rate if check_rate > 0 else 0.0
+        self.expire_after = expire_after
+        self.max_speed = max_speed
+        self.notify = notify
+        self.positions = SpatialGrid(separation + 2.0 * max_speed * horizon)
+        self.targets = SpatialGrid(separation)
+        self.velocities = {}
+        self.last_seen = {}
+        self.conflicts = []
+        self.fast = []
+        self.checks = 0
+        self.pairs_checked = 0
+        self._checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def update(self, records, timestamp: Optional[float] = None) -> None:
+        """
+        Пачка записей телеметрии (TELEMETRY_DTYPE из decoder).
+        Записи с нечисловой позицией или скоростью (NaN, inf) пропускаются.
+        """
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        finite = np.isfinite(records["position"]).all(axis=1) & np.isfinite(records["velocity"]).all(axis=1)
+        if not finite.all():
+            records = records[finite]
+        with self.lock:
+            for drone_id, position, velocity in zip(records["id"].tolist(), records["position"].tolist(),
+                                                    records["velocity"].tolist()):
+                drone_id = str(drone_id)
+                self.positions.update(drone_id, position)
+                self.velocities[drone_id] = velocity
+                self.last_seen[drone_id] = timestamp
+        if timestamp - self._checked_at >= self.check_interval:
+            self._checked_at = timestamp
+            self.check(timestamp)
+
+    def _expire(self, now: float) -> None:
+        for drone_id in [d for d, seen in self.last_seen.items() if now - seen > self.expire_after]:
+            self.positions.remove(drone_id)
+            del self.velocities[drone_id]
+            del self.last_seen[drone_id]
+
+    def check(self, now: Optional[float] = None) -> list:
+        """
+        Пересчитывает self.conflicts и возвращает его. О новых парах сообщается через notify.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self._expire(now)
+            ids = list(self.velocities)
+            index = {drone_id: i for i, drone_id in enumerate(ids)}
+            positions = np.array([self.positions.get(d) for d in ids]).reshape(-1, 3)
+            velocities = np.array([self.velocities[d] for d in ids]).reshape(-1, 3)
+            speeds = np.linalg.norm(velocities, axis=1)
+            speed = min(float(speeds.max()), self.max_speed) if ids else 0.0
+            pairs = self.positions.candidate_pairs(self.separation + 2.0 * speed * self.horizon)
+        fast = np.nonzero(speeds > self.max_speed)[0].tolist()
+        if fast:
+            # Окрестность сетки рассчитана на max_speed: пары быстрых дронов – со всеми дронами
+            fast_ids = {ids[i] for i in fast}
+            pairs = [p for p in pairs if p[0] not in fast_ids and p[1] not in fast_ids]
+            pairs.extend((ids[i], ids[j]) for i in fast for j in range(len(ids))
+                         if j != i and not (ids[j] in fast_ids and j < i))
+        conflicts = []
+        if pairs:
+            first = np.fromiter((index[a] for a, _ in pairs), dtype=np.int64, count=len(pairs))
+            second = np.fromiter((index[b] for _, b in pairs), dtype=np.int64, count=len(pairs))
+            dp = positions[second] - positions[first]
+            dv = velocities[second] - velocities[first]
+            distance = np.linalg.norm(dp, axis=1)
+            # Время наибольшего сближения при постоянных скоростях, в пределах [0, horizon]
+            dv2 = np.einsum("ij,ij->i", dv, dv)
+            t = np.clip(-np.einsum("ij,ij->i", dp, dv) / np.maximum(dv2, 1e-12), 0.0, self.horizon)
+            min_distance = np.linalg.norm(dp + dv * t[:, None], axis=1)
+            t[distance < self.separation] = 0.0
+            for i in np.nonzero(min_distance < self.separation)[0]:
+                a, b = sorted((ids[first[i]], ids[second[i]]))
+                conflicts.append(Conflict(a, b, float(distance[i]), float(min_distance[i]), float(t[i])))
+            conflicts.sort(key=lambda c: (c.time, c.min_distance))
+        if self.notify is not None:
+            # Сообщается новая пара и переход пары от прогноза к сближению
+            known = {(c.first, c.second, c.time == 0.0) for c in self.conflicts}
+            for c in conflicts:
+                if (c.first, c.second, c.time == 0.0) not in known:
+                    self.notify(f"Внимание: {self.describe(c)}")
+        self.conflicts = conflicts
+        self.fast = [ids[i] for i in fast]
+        self.checks += 1
+        self.pairs_checked += len(pairs)
+        return conflicts
+
+    def describe(self, c: Conflict) -> str:
+        if c.time == 0.0:
+            return f"дроны {c.first} и {c.second} на расстоянии {c.distance:.2f} м (допустимо {self.separation:g} м)"
+        return (f"дроны {c.first} и {c.second} сблизятся до {c.min_distance:.2f} м через {c.time:.1f} с "
+                f"(сейчас {c.distance:.2f} м)")
+
+    def set_targets(self, targets: dict) -> None:
+        """
+        targets – {id дрона: цель (x, y, z, ...)}.
+        """
+        with self.lock:
+            for drone_id, position in targets.items():
+                self.targets.update(drone_id, tuple(position[:3]))
+
+    def clear_targets(self, drone_ids: Iterable[str]) -> None:
+        with self.lock:
+            for drone_id in drone_ids:
+                self.targets.remove(drone_id)
+
+    def check_targets(self, targets: dict) -> dict:
+        """
+        Проверка новых целей {id дрона: позиция} – одного дрона или всей группы сразу.
+        Цель не должна быть ближе separation к целям других дронов, к дронам, висящим
+        без цели, и к другим новым целям (группа, отправленная в одну точку, – конфликт).
+        Возвращает {id дрона: [(id другого дрона, расстояние, "цель" или "дрон"), ...]}
+        только для дронов с конфликтами.
+        """
+        batch = SpatialGrid(self.separation)
+        conflicts = {}
+        with self.lock:
+            for drone_id, position in targets.items():
+                position = tuple(position[:3])
+                # Старые цели дронов из targets заменяются новыми – сравниваются только новые
+                found = [(other, distance, "цель") for other, distance in self.targets.query(position, self.separation)
+                         if other not in targets]
+                found.extend((other, distance, "дрон") for other, distance in
+                             self.positions.query(position, self.separation)
+                             if other not in targets and other not in self.targets)
+                found.extend((other, distance, "цель") for other, distance in batch.query(position, self.separation))
+                batch.update(drone_id, position)
+                if found:
+                    conflicts[drone_id] = sorted(found, key=lambda item: item[1])
+        return conflicts
+
+    def stats(self) -> dict:
+        return {
+            "drones": len(self.positions),
+            "targets": len(self.targets),
+            "close": sum(1 for c in self.conflicts if c.time == 0.0),
+            "predicted": sum(1 for c in self.conflicts if c.time > 0.0),
+            "fast": len(self.fast),
+            "checks": self.checks,
+            "pairs_per_check": self.pairs_checked / self.checks if self.checks else 0.0,
+        }
+
+    def format(self) -> str:
+        """
+        Текущие сближения (команда proximity).
+        """
+        stats = self.stats()
+        lines = [f"Контроль сближения: допустимо {self.separation:g} м, прогноз {self.horizon:g} с; "
+                 f"дронов {stats['drones']}, целей {stats['targets']}, "
+                 f"пар на проверку {stats['pairs_per_check']:.1f}"]
+        if self.fast:
+            lines.append(f"Быстрее {self.max_speed:g} м/с (проверяются со всеми дронами): " + ", ".join(self.fast))
+        conflicts = self.conflicts
+        if not conflicts:
+            lines.append("Сближений нет.")
+        lines.extend("  " + self.describe(c) for c in conflicts)
+        return "\n".join(lines)
@@ -0,0 +1,298 @@
+import argparse
+import bisect
+import os
+import socket
+import struct
+import threading
+import time
+import zlib
+from typing import Callable, Iterable, Iterator, Optional
+
+# Формат журнала:
+#   MAGIC
+#   чанки: CHUNK_HEADER + данные (записи подряд, при флаге FLAG_ZLIB – сжатые zlib)
+#   запись: RECORD_HEADER (время, id дрона, направление, длина) + исходные байты DDatagram
+#   индекс (при штатном закрытии): INDEX_MAGIC + число чанков + по чанку INDEX_ENTRY и список id дронов
+#   FOOTER: смещение индекса + FOOTER_MAGIC
+# Если индекса нет (запись оборвалась), он восстанавливается проходом по чанкам.
+MAGIC = b"PIONLOG1"
+CHUNK_HEADER = struct.Struct("<4sBIIdd")  # b"CHNK", флаги, число записей, длина данных, t первой, t последней
+RECORD_HEADER = struct.Struct("<dqBH")  # время (monotonic), id дрона, направление, длина
+INDEX_MAGIC = b"INDX"
+INDEX_ENTRY = struct.Struct("<QIddI")  # смещение чанка, число записей, t первой, t последней, число id
+FOOTER = struct.Struct("<Q8s")
+FOOTER_MAGIC = b"PIONIDX1"
+FLAG_ZLIB = 1
+
+# Направление записи
+RX = 0  # принятая телеметрия
+TX = 1  # отправленная команда
+
+
+class FlightRecorder:
+    """
+    Запись сырых DDatagram с монотонными метками времени в журнал из чанков.
+
+    В памяти держится только текущий чанк: он сбрасывается на диск при
+    достижении chunk_bytes или chunk_seconds. Для каждого чанка запоминаются
+    границы по времени и множество id дронов – из них при закрытии
+    строится индекс для быстрого поиска.
+    """
+
+    def __init__(self, path: str, compress: bool = True, chunk_bytes: int = 1 << 20,
+                 chunk_seconds: float = 1.0):
+        self.path = path
+        self.compress = compress
+        self.chunk_bytes = chunk_bytes
+        self.chunk_seconds = chunk_seconds
+        self.lock = threading.Lock()
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.index = []
+        self.records = 0
+        self._reset_chunk()
+
+    def _reset_chunk(self) -> None:
+        self._buffer = bytearray()
+        self._count = 0
+        self._t_first = None
+        self._t_last = None
+        self._ids = set()
+
+    def record(self, data: bytes, drone_id: int = 0, direction: int = RX,
+               timestamp: Optional[float] = None) -> None:
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        with self.lock:
+            if self.file is None:
+                return
+            if self._t_first is None:
+                self._t_first = timestamp
+            self._t_last = timestamp
+            self._buffer += RECORD_HEADER.pack(timestamp, drone_id, direction, len(data))
+            self._buffer += data
+            self._count += 1
+            self._ids.add(drone_id)
+            self.records += 1
+            if len(self._buffer) >= self.chunk_bytes or timestamp - self._t_first >= self.chunk_seconds:
+                self._flush_chunk()
+
+    def _flush_chunk(self) -> None:
+        if not self._count:
+            return
+        payload = bytes(self._buffer)
+        flags = 0
+        if self.compress:
+            payload = zlib.compress(payload, 1)
+            flags |= FLAG_ZLIB
+        offset = self.file.tell()
+        self.file.write(CHUNK_HEADER.pack(b"CHNK", flags, self._count, len(payload), self._t_first, self._t_last))
+        self.file.write(payload)
+        self.index.append((offset, self._count, self._t_first, self._t_last, sorted(self._ids)))
+        self._reset_chunk()
+
+    def flush(self) -> None:
+        with self.lock:
+            self._flush_chunk()
+            self.file.flush()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.file is None:
+                return
+            self._flush_chunk()
+            index_offset = self.file.tell()
+            self.file.write(INDEX_MAGIC + struct.pack("<I", len(self.index)))
+            for offset, count, t_first, t_last, ids in self.index:
+                self.file.write(INDEX_ENTRY.pack(offset, count, t_first, t_last, len(ids)))
+                self.file.write(struct.pack(f"<{len(ids)}q", *ids))
+            self.file.write(FOOTER.pack(index_offset, FOOTER_MAGIC))
+            self.file.close()
+            self.file = None
+
+
+class FlightLog:
+    """
+    Чтение журнала FlightRecorder. Записи читаются по одному чанку, поэтому
+    многочасовой журнал не загружается в память целиком. Поиск по времени –
+    бинарный поиск по индексу чанков и затем по меткам внутри чанка.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: не журнал pionsrv")
+        self.index = self._read_index()
+        if self.index is None:
+            self.index = self._rebuild_index()
+        self._starts = [entry[2] for entry in self.index]
+
+    def _read_index(self):
+        size = os.fstat(self.file.fileno()).st_size
+        if size < len(MAGIC) + FOOTER.size:
+            return None
+        self.file.seek(size - FOOTER.size)
+        index_offset, magic = FOOTER.unpack(self.file.read(FOOTER.size))
+        if magic != FOOTER_MAGIC:
+            return None
+        self.file.seek(index_offset)
+        if self.file.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            return None
+        (count,) = struct.unpack("<I", self.file.read(4))
+        index = []
+        for _ in range(count):
+            offset, n, t_first, t_last, n_ids = INDEX_ENTRY.unpack(self.file.read(INDEX_ENTRY.size))
+            ids = struct.unpack(f"<{n_ids}q", self.file.read(8 * n_ids))
+            index.append((offset, n, t_first, t_last, frozenset(ids)))
+        return index
+
+    def _rebuild_index(self) -> list:
+        index = []
+        offset = len(MAGIC)
+        size = os.fstat(self.file.fileno()).st_size
+        while True:
+            self.file.seek(offset)
+            header = self.file.read(CHUNK_HEADER.size)
+            if len(header) < CHUNK_HEADER.size or header[:4] != b"CHNK":
+                break
+            _, _, n, length, t_first, t_last = CHUNK_HEADER.unpack(header)
+            if offset + CHUNK_HEADER.size + length > size:
+                break  # оборванный последний чанк (без сжатия zlib его не заметит)
+            try:
+                records = self._read_chunk(offset)
+            except (zlib.error, struct.error):
+                break  # оборванный последний чанк
+            index.append((offset, n, t_first, t_last, frozenset(r[2] for r in records)))
+            offset += CHUNK_HEADER.size + length
+        return index
+
+    def _read_chunk(self, offset: int) -> list:
+        self.file.seek(offset)
+        _, flags, n, length, _, _ = CHUNK_HEADER.unpack(self.file.read(CHUNK_HEADER.size))
+        payload = self.file.read(length)
+        if flags & FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+        records = []
+        pos = 0
+        for _ in range(n):
+            timestamp, drone_id, direction, size = RECORD_HEADER.unpack_from(payload, pos)
+            pos += RECORD_HEADER.size
+            records.append((timestamp, direction, drone_id, payload[pos:pos + size]))
+            pos += size
+        return records
+
+    @property
+    def start_time(self) -> float:
+        return self.index[0][2] if self.index else 0.0
+
+    @property
+    def end_time(self) -> float:
+        return self.index[-1][3] if self.index else 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(entry[1] for entry in self.index)
+
+    def drone_ids(self) -> set:
+        ids = set()
+        for entry in self.index:
+            ids.update(entry[4])
+        return ids
+
+    def records(self, start: Optional[float] = None, end: Optional[float] = None,
+                drone_ids: Optional[Iterable[int]] = None, direction: Optional[int] = None) -> Iterator[tuple]:
+        """
+        Итератор записей (время, направление, id дрона, байты) в порядке записи.
+        start/end – абсолютное монотонное время записи (см. start_time).
+        """
+        wanted = None if drone_ids is None else frozenset(drone_ids)
+        first = 0 if start is None else max(0, bisect.bisect_right(self._starts, start) - 1)
+        for offset, _, t_first, t_last, ids in self.index[first:]:
+            if end is not None and t_first > end:
+                break
+            if start is not None and t_last < start:
+                continue
+            if wanted is not None and not (ids & wanted):
+                continue
+            records = self._read_chunk(offset)
+            begin = 0
+            if start is not None and t_first < start:
+                begin = bisect.bisect_left(records, start, key=lambda r: r[0])
+            for record in records[begin:]:
+                if end is not None and record[0] > end:
+                    return
+                if wanted is not None and record[2] not in wanted:
+                    continue
+                if direction is not None and record[1] != direction:
+                    continue
+                yield record
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def replay(log: FlightLog, handler: Callable, speed: float = 1.0, start: Optional[float] = None,
+           end: Optional[float] = None, drone_ids: Optional[Iterable[int]] = None,
+           direction: Optional[int] = RX, stop_event: Optional[threading.Event] = None) -> int:
+    """
+    Проигрывает журнал, вызывая handler(data, drone_id, timestamp) для каждой записи.
+    speed=1 – в реальном времени, speed>1 – быстрее, speed<=0 – без пауз.
+    Возвращает число проигранных записей.
+    """
+    origin = None
+    wall_start = time.monotonic()
+    played = 0
+    for timestamp, _, drone_id, data in log.records(start, end, drone_ids, direction):
+        if stop_event is not None and stop_event.is_set():
+            break
+        if speed > 0:
+            if origin is None:
+                origin = timestamp
+            delay = wall_start + (timestamp - origin) / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        handler(data, drone_id, timestamp)
+        played += 1
+    return played
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Журнал полётов pionsrv: сведения и проигрывание")
+    sub = parser.add_subparsers(dest="action", required=True)
+    info = sub.add_parser("info", help="сведения о журнале")
+    info.add_argument("log")
+    play = sub.add_parser("replay", help="проиграть журнал в UDP-порт (визуализатор, сервер управления)")
+    play.add_argument("log")
+    play.add_argument("--port", type=int, default=37020)
+    play.add_argument("--host", default="127.0.0.1")
+    play.add_argument("--speed", type=float, default=1.0, help="множитель скорости, 0 – без пауз")
+    play.add_argument("--start", type=float, default=None, help="начало, с от начала журнала")
+    play.add_argument("--end", type=float, default=None, help="конец, с от начала журнала")
+    play.add_argument("--ids", type=int, nargs="*", default=None, help="только эти id дронов")
+    args = parser.parse_args()
+
+    log = FlightLog(args.log)
+    if args.action == "info":
+        print(f"Журнал: {args.log}")
+        print(f"Записей: {log.count}, чанков: {len(log.index)}")
+        print(f"Длительность: {log.end_time - log.start_time:.1f} с")
+        print(f"Дроны: {', '.join(str(i) for i in sorted(log.drone_ids()))}")
+        return
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    address = (args.host, args.port)
+    start = None if args.start is None else log.start_time + args.start
+    end = None if args.end is None else log.start_time + args.end
+    try:
+        played = replay(log, lambda data, *_: sock.sendto(data, address), speed=args.speed,
+                        start=start, end=end, drone_ids=args.ids)
+        print(f"Проиграно записей: {played}")
+    except KeyboardInterrupt:
+        print("\nПроигрывание прервано.")
+    finally:
+        log.close()
+
+
+if __name__ == '__main__':
+    main()
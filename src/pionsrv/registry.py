@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import time
+from typing import Iterable, Optional
+
+
+class SwarmRegistry:
+    """
+    Конфигурация роя из drones_config.json с прямым и обратными индексами:
+    id -> группа, id -> ip, группа -> id, тег -> id.
+
+    Запись конфигурации – число группы ("8000": 1) или словарь
+    ("8000": {"group": 1, "ip": "10.1.100.101", "tags": ["left"]}).
+
+    Файл перечитывается автоматически, если изменилось его время модификации
+    (проверяется не чаще раза в check_interval секунд). Для updategroups
+    запоминаются группы, уже отправленные дронам, – pending_groups()
+    возвращает только изменения с последней синхронизации. Отправленная группа
+    (setgroup) – и есть текущая группа дрона: group_of() и group_members()
+    учитывают её раньше файла.
+
+    Адреса, найденные в сети (learn_addresses), хранятся отдельно от файла и
+    используются для дронов, у которых ip в конфигурации не указан.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.groups = {}
+        self.addresses = {}
+        self.tags = {}
+        self.members = {}
+        self.tagged = {}
+        self.synced = {}
+        self.discovered = {}
+        self._mtime = None
+        self._checked_at = 0.0
+        self.load()
+
+    def load(self) -> None:
+        """
+        Читает файл конфигурации и перестраивает индексы. Отсутствующий файл – пустой рой.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, "r") as f:
+                config = json.load(f)
+        except FileNotFoundError:
+            mtime, config = None, {}
+        groups, addresses, tags, members, tagged = {}, {}, {}, {}, {}
+        for drone_id, entry in config.items():
+            drone_id = str(drone_id)
+            if isinstance(entry, dict):
+                group = int(entry.get("group", 0))
+                if entry.get("ip"):
+                    addresses[drone_id] = entry["ip"]
+                tags[drone_id] = frozenset(entry.get("tags", ()))
+            else:
+                group = int(entry)
+                tags[drone_id] = frozenset()
+            groups[drone_id] = group
+            members.setdefault(group, set()).add(drone_id)
+            for tag in tags[drone_id]:
+                tagged.setdefault(tag, set()).add(drone_id)
+        with self.lock:
+            self.groups, self.addresses, self.tags = groups, addresses, tags
+            self.members, self.tagged = members, tagged
+            self._mtime = mtime
+
+    def reload_if_changed(self, force_check: bool = False) -> bool:
+        """
+        Перечитывает конфигурацию, если файл изменился. Возвращает True, если перечитан.
+        """
+        now = time.monotonic()
+        if not force_check and now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return False
+        try:
+            self.load()
+        except (ValueError, OSError) as error:
+            print(f"Конфигурация {self.path} не перечитана: {error}")
+            self._mtime = mtime  # не пытаемся перечитать тот же испорченный файл снова
+            return False
+        print(f"Конфигурация {self.path} перечитана: {len(self.groups)} дронов.")
+        return True
+
+    def group_of(self, drone_id: str) -> int:
+        group = self.synced.get(drone_id)
+        return self.groups.get(drone_id, 0) if group is None else group
+
+    def address_of(self, drone_id: str) -> Optional[str]:
+        return self.addresses.get(drone_id) or self.discovered.get(drone_id)
+
+    def learn_addresses(self, addresses: dict) -> None:
+        """
+        Запоминает адреса дронов, найденные в сети: id -> ip.
+        """
+        with self.lock:
+            self.discovered = {**self.discovered, **{str(d): ip for d, ip in addresses.items()}}
+
+    def group_members(self, group_id: int) -> set:
+        with self.lock:
+            members = {d for d in self.members.get(group_id, ()) if self.synced.get(d, group_id) == group_id}
+            members.update(d for d, group in self.synced.items() if group == group_id)
+        return members
+
+    def parse(self, expression: str, known: Iterable[str] = ()) -> tuple:
+        """
+        Разбор выражения цели: слагаемые через "+" или ",":
+          8001          – один дрон
+          8000-8005     – известные дроны (конфигурация, найденные, known) с id в диапазоне
+          g:1           – группа
+          t:left        – дроны с тегом
+          all           – все дроны
+        Возвращает (everyone, groups, drones): all встречается в выражении, номера групп
+        и id дронов из остальных слагаемых. Неизвестное слагаемое – ValueError.
+        """
+        self.reload_if_changed()
+        everyone = False
+        groups = set()
+        drones = set()
+        for term in expression.replace(",", "+").split("+"):
+            term = term.strip()
+            if not term:
+                continue
+            if term in ("all", "<broadcast>"):
+                everyone = True
+            elif term.startswith("g:"):
+                try:
+                    groups.add(int(term[2:]))
+                except ValueError:
+                    raise ValueError(f"Неверная группа: {term}")
+            elif term.startswith("t:"):
+                drones.update(self.tagged.get(term[2:], ()))
+            elif "-" in term:
+                first, _, last = term.partition("-")
+                if not (first.isdigit() and last.isdigit()) or int(first) > int(last):
+                    raise ValueError(f"Неверный диапазон id: {term}")
+                # Только известные дроны: опечатка вида 8000-99999 не превращается в 92 тысячи пакетов
+                low, high = int(first), int(last)
+                candidates = set(self.groups) | set(self.discovered) | set(known)
+                drones.update(d for d in candidates if d.isdigit() and low <= int(d) <= high)
+            elif term.isdigit():
+                drones.add(term)
+            else:
+                raise ValueError(f"Неверная цель команды: {term}")
+        return everyone, groups, drones
+
+    def select(self, expression: str, known: Iterable[str] = ()) -> set:
+        """
+        Множество id по выражению (см. parse): all – дроны конфигурации, найденные и known,
+        группы – по текущим группам дронов (group_members).
+        """
+        everyone, groups, selected = self.parse(expression, known)
+        if everyone:
+            selected.update(self.groups, self.discovered, known)
+        for group_id in groups:
+            selected.update(self.group_members(group_id))
+        return selected
+
+    def pending_groups(self) -> dict:
+        """
+        Группы, которые нужно отправить дронам: id -> группа, отличающаяся от последней отправленной.
+        """
+        self.reload_if_changed(force_check=True)
+        return {d: g for d, g in self.groups.items() if self.synced.get(d) != g}
+
+    def mark_synced(self, drone_id: str, group_id: int) -> None:
+        self.synced[drone_id] = group_id
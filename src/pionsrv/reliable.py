@@ -0,0 +1,150 @@
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterable
+from swarm_server import DDatagram, CMD
+from pionsrv.scheduler import summarize_lateness
+
+# Подтверждение (ack) от дрона: DDatagram с id дрона, source == ACK_SOURCE и
+# token, равным номеру последовательности команды. Телеметрия идёт с token == -1.
+# Прошивка должна отвечать ack на команды с token >= 0 и не выполнять повторно
+# команду с уже виденным token (повтор приходит, если потерялся сам ack).
+ACK_SOURCE = 1
+
+
+class PendingCommand:
+    __slots__ = ("seq", "command", "fields", "expected", "acked", "sent_at", "attempts", "next_retry")
+
+    def __init__(self, seq, command, fields, expected, sent_at, next_retry):
+        self.seq = seq
+        self.command = command
+        self.fields = fields  # (command, data, target_id, group_id) для повторной сборки пакета
+        self.expected = expected
+        self.acked = set()
+        self.sent_at = sent_at
+        self.attempts = 0
+        self.next_retry = next_retry
+
+
+class ReliableSender:
+    """
+    Надёжная доставка команд поверх широковещательного UDP.
+
+    Каждая команда получает номер последовательности (поле token DDatagram) и
+    набор дронов, от которых ждём подтверждения. Первая отправка – обычная
+    широковещательная (её делает ControlServer). Повторы уходят только тем, кто не подтвердил, и только
+    unicast на адрес дрона (address_of), с экспоненциальной задержкой.
+    Если адрес дрона неизвестен, повтор идёт широковещательно, но с target_id
+    этого дрона. send_frame(frame, address, command) – отправка повторов, address=None – широковещательно.
+    """
+
+    def __init__(self, send_frame: Callable, address_of: Callable, timeout: float = 0.2,
+                 backoff: float = 2.0, max_retries: int = 5, history: int = 1000):
+        self.send_frame = send_frame
+        self.address_of = address_of
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_retries = max_retries
+        self.encoder = DDatagram()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self.latency = {}  # CMD -> deque задержек доставки, с
+        self._history = history
+        self.delivered = 0
+        self.failed = 0
+        self.retransmits = 0
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._retransmit_loop, daemon=True)
+        self.thread.start()
+
+    def _encode(self, command: CMD, data: list, target_id: str, group_id: int, seq: int) -> bytes:
+        self.encoder.token = seq
+        self.encoder.command = command.value
+        self.encoder.data = list(data)
+        self.encoder.target_id = target_id
+        self.encoder.group_id = group_id
+        return self.encoder.export_serialized()
+
+    def send(self, command: CMD, data: list, target_id: str, group_id: int,
+             expected: Iterable[str]) -> tuple:
+        """
+        Собирает пакет команды и ставит его на отслеживание. Возвращает (seq, байты пакета);
+        первую отправку выполняет вызывающий, повторы – поток повторной отправки.
+        """
+        seq = next(self._seq) % (1 << 31)
+        with self.lock:
+            frame = self._encode(command, data, target_id, group_id, seq)
+            now = time.monotonic()
+            expected = set(expected)
+            if expected:
+                self.pending[seq] = PendingCommand(seq, command, (command, data, target_id, group_id), expected,
+                                                   now, now + self.timeout)
+        return seq, frame
+
+    def ack(self, drone_id, seq: int) -> None:
+        drone_id = str(drone_id)
+        with self.lock:
+            pending = self.pending.get(seq)
+            if pending is None or drone_id not in pending.expected or drone_id in pending.acked:
+                return
+            pending.acked.add(drone_id)
+            latency = time.monotonic() - pending.sent_at
+            self.latency.setdefault(pending.command, deque(maxlen=self._history)).append(latency)
+            if pending.acked >= pending.expected:
+                del self.pending[seq]
+                self.delivered += 1
+
+    def _retransmit_loop(self) -> None:
+        while not self._stop.wait(0.01):
+            now = time.monotonic()
+            resend = []
+            with self.lock:
+                for seq, pending in list(self.pending.items()):
+                    if pending.next_retry > now:
+                        continue
+                    missing = pending.expected - pending.acked
+                    if pending.attempts >= self.max_retries:
+                        del self.pending[seq]
+                        self.failed += 1
+                        print(f"Команда {pending.command} (seq={seq}) не подтверждена дронами: "
+                              f"{', '.join(sorted(missing))}")
+                        continue
+                    pending.attempts += 1
+                    pending.next_retry = now + self.timeout * self.backoff ** pending.attempts
+                    command, data, target_id, group_id = pending.fields
+                    for drone_id in missing:
+                        address = self.address_of(drone_id)
+                        if address:
+                            frame = self._encode(command, data, target_id, group_id, seq)
+                        else:
+                            frame = self._encode(command, data, drone_id, 0, seq)
+                        resend.append((frame, address, command))
+            for frame, address, command in resend:
+                self.retransmits += 1
+                self.send_frame(frame, address, command)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.thread.join(timeout=1.0)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "delivered": self.delivered,
+                "failed": self.failed,
+                "pending": len(self.pending),
+                "retransmits": self.retransmits,
+                "latency": {command.name: summarize_lateness(list(values))
+                            for command, values in self.latency.items()},
+            }
+
+    def format(self) -> str:
+        stats = self.stats()
+        lines = [f"Доставлено: {stats['delivered']}, не доставлено: {stats['failed']}, "
+                 f"ожидают: {stats['pending']}, повторов: {stats['retransmits']}"]
+        for name, s in stats["latency"].items():
+            lines.append(f"  {name}: {s['count']} подтв., задержка мс: среднее {s['mean'] * 1e3:.1f}, "
+                         f"p95 {s['p95'] * 1e3:.1f}, макс {s['max'] * 1e3:.1f}")
+        return "\n".join(lines)
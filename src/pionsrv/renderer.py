@@ -0,0 +1,155 @@
+from itertools import zip_longest
+from typing import Optional
+import numpy as np
+from matplotlib.collections import LineCollection
+
+
+class SwarmRenderer:
+    """
+    Отрисовка роя на осях matplotlib без пересоздания артистов.
+
+    Артисты создаются один раз и затем только обновляются: одна коллекция
+    точек для всех дронов, одна LineCollection следов, по одному quiver на
+    ориентацию, скорость и t_speed. Используется и окном SwarmVisualizer2D
+    (с blit), и headless-рендером в отдельном процессе.
+
+    Подпись (id и высота) – отдельный Text на дрон и стоит дороже всех коллекций
+    вместе, поэтому подписываются только выбранные дроны (selected) и дрон под
+    курсором (hovered), не больше max_labels.
+    """
+
+    def __init__(self, ax, animated: bool = True, limits: float = 5.5, max_labels: int = 8):
+        self.ax = ax
+        self.animated = animated
+        self.limits = limits
+        self.selected = set()  # id дронов с подписями
+        self.hovered = None  # id дрона под курсором
+        self.positions = np.zeros((0, 2))
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.setup_plot()
+        self.scatter = self.ax.scatter(
+            np.zeros(0), np.zeros(0), marker="o", edgecolors="k", animated=animated
+        )
+        self.trail_lines = LineCollection(
+            [], linestyles=":", alpha=0.6, linewidths=1, animated=animated
+        )
+        self.ax.add_collection(self.trail_lines)
+        self.capacity = 0
+        self.quivers = []
+        self.labels = [
+            self.ax.text(0, 0, "", fontsize=8, visible=False, animated=animated)
+            for _ in range(max_labels)
+        ]
+        self.create_vector_artists(64)
+
+    def setup_plot(self):
+        self.ax.set_xlim(-self.limits, self.limits)
+        self.ax.set_ylim(-self.limits, self.limits)
+        self.ax.set_xlabel("X Position")
+        self.ax.set_ylabel("Y Position")
+        self.ax.set_title("Real-time 2D Drone Swarm Visualization")
+        self.ax.grid(True)
+        self.ax.set_aspect("equal")
+
+    def create_vector_artists(self, capacity):
+        """
+        Quiver имеет фиксированное число стрелок, поэтому создаётся с запасом
+        (capacity) и пересоздаётся только при его нехватке. Лишние стрелки маскируются NaN.
+        """
+        for artist in self.quivers:
+            artist.remove()
+        self.capacity = capacity
+        zeros = np.zeros(capacity)
+        common = dict(angles="xy", scale_units="xy", scale=1, animated=self.animated)
+        self.orientation_quiver = self.ax.quiver(
+            zeros, zeros, zeros, zeros, width=0.003, headwidth=4, headlength=5, **common
+        )
+        self.t_speed_quiver = self.ax.quiver(
+            zeros, zeros, zeros, zeros, color="red", width=0.005, headwidth=5,
+            headlength=7, alpha=0.8, **common
+        )
+        self.velocity_quiver = self.ax.quiver(
+            zeros, zeros, zeros, zeros, width=0.005, headwidth=5, headlength=7,
+            alpha=0.8, **common
+        )
+        self.quivers = [self.orientation_quiver, self.t_speed_quiver, self.velocity_quiver]
+
+    def set_vectors(self, quiver, offsets, u, v, colors=None):
+        n = len(u)
+        uu = np.full(self.capacity, np.nan)
+        vv = np.full(self.capacity, np.nan)
+        uu[:n] = u
+        vv[:n] = v
+        xy = np.zeros((self.capacity, 2))
+        xy[:n] = offsets
+        quiver.set_offsets(xy)
+        quiver.set_UVC(uu, vv)
+        if colors is not None and n:
+            quiver.set_color(np.vstack([colors, np.zeros((self.capacity - n, 3))]))
+
+    def pick(self, x: float, y: float, radius: float = 0.5) -> Optional[int]:
+        """
+        id ближайшего к точке (x, y) дрона последнего кадра не дальше radius; None – такого нет.
+        """
+        if not len(self.ids):
+            return None
+        distance = np.hypot(self.positions[:, 0] - x, self.positions[:, 1] - y)
+        nearest = int(np.argmin(distance))
+        return int(self.ids[nearest]) if distance[nearest] <= radius else None
+
+    @property
+    def artists(self) -> list:
+        return [self.scatter, self.trail_lines, *self.quivers, *self.labels]
+
+    def draw(self, snap: dict) -> list:
+        """
+        Обновляет артисты по снимку SwarmState (snapshot() + "trails" из trails_ordered()).
+        Возвращает список изменённых артистов для blit.
+        """
+        n = len(snap["ids"])
+        if n > self.capacity:
+            self.create_vector_artists(max(n, 2 * self.capacity))
+
+        colors = snap["colors"]
+        pos = snap["position"]
+        xy = pos[:, :2]
+
+        # Дроны (точки), размер зависит от высоты
+        self.scatter.set_offsets(xy)
+        self.scatter.set_sizes(80 + pos[:, 2] * 5)
+        self.scatter.set_facecolors(colors)
+
+        # Траектории (следы)
+        self.trail_lines.set_segments(snap["trails"][:n])
+        self.trail_lines.set_color(colors)
+
+        # Стрелка направления (yaw) с фиксированной длиной
+        arrow_length = 1.2
+        yaw = snap["attitude"][:, 2] + np.pi / 2
+        self.set_vectors(
+            self.orientation_quiver, xy, arrow_length * np.cos(yaw), arrow_length * np.sin(yaw), colors
+        )
+        # Целевой вектор скорости t_speed
+        self.set_vectors(self.t_speed_quiver, xy, snap["t_speed"][:, 0], snap["t_speed"][:, 1])
+        # Вектор скорости (масштабированный)
+        factor = 10
+        velocity = snap["velocity"]
+        self.set_vectors(
+            self.velocity_quiver, xy, velocity[:, 0] * factor, velocity[:, 1] * factor, colors
+        )
+
+        # Подписи: номер дрона и высота – только выбранные и под курсором
+        self.ids = np.asarray(snap["ids"])
+        self.positions = xy
+        wanted = self.selected if self.hovered is None else self.selected | {self.hovered}
+        slots = np.nonzero(np.isin(self.ids, list(wanted)))[0][:len(self.labels)].tolist() if wanted else []
+        for label, slot in zip_longest(self.labels, slots):
+            if slot is not None:
+                label.set_position((pos[slot, 0] + 0.3, pos[slot, 1] + 0.3))
+                label.set_text(f"{snap['unique_id'][slot]}: {pos[slot, 2]:.1f}m")
+                label.set_color(colors[slot])
+                label.set_visible(True)
+            elif label.get_visible():
+                label.set_visible(False)
+
+        return self.artists
@@ -0,0 +1,104 @@
+import threading
+import time
+from typing import Callable, Iterable, Optional
+from pionsrv.commands import CompiledCommand
+
+
+def build_timeline(commands: Iterable[CompiledCommand]) -> list:
+    """
+    Переводит скрипт в расписание [(время_от_старта, команда), ...].
+
+    sleep <сек> не исполняется, а сдвигает курсор времени для следующих команд;
+    метка @t=<сек> ставит курсор в абсолютное время от начала скрипта.
+    Команды с одинаковым временем сохраняют порядок из файла.
+    """
+    timeline = []
+    cursor = 0.0
+    for command in commands:
+        if command.at is not None:
+            cursor = command.at
+        if command.spec.name == "sleep":
+            cursor += max(0.0, command.args[0])
+            continue
+        timeline.append((cursor, command))
+    timeline.sort(key=lambda item: item[0])
+    return timeline
+
+
+def summarize_lateness(lateness: list) -> dict:
+    """
+    Статистика опоздания команд относительно их дедлайнов (в секундах).
+    """
+    if not lateness:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    values = sorted(lateness)
+    n = len(values)
+
+    def percentile(q):
+        return values[min(n - 1, int(q * n))]
+
+    return {
+        "count": n,
+        "mean": sum(values) / n,
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": values[-1],
+    }
+
+
+class TimelineScheduler:
+    """
+    Исполняет расписание по монотонным часам: каждая команда имеет абсолютный
+    момент отправки от старта, поэтому время отправки и печати не накапливается
+    в дрейф. Ожидание – event.wait до момента за spin_margin секунд до дедлайна,
+    затем короткое активное ожидание для точности в пределах миллисекунды.
+    """
+
+    def __init__(self, spin_margin: float = 0.002):
+        self.spin_margin = spin_margin
+        self._stop = threading.Event()
+        self.lateness = []
+
+    def cancel(self) -> None:
+        self._stop.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._stop.is_set()
+
+    def _wait_until(self, deadline: float) -> bool:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return not self._stop.is_set()
+            if remaining > self.spin_margin:
+                if self._stop.wait(remaining - self.spin_margin):
+                    return False
+            elif self._stop.is_set():
+                return False
+
+    def run(self, timeline: list, execute: Callable, start: Optional[float] = None) -> dict:
+        """
+        Выполняет расписание, вызывая execute(command) в момент каждой команды.
+        Возвращает статистику опоздания (см. summarize_lateness).
+        """
+        self._stop.clear()
+        self.lateness = []
+        start = time.monotonic() if start is None else start
+        for offset, command in timeline:
+            deadline = start + offset
+            if not self._wait_until(deadline):
+                break
+            self.lateness.append(time.monotonic() - deadline)
+            execute(command)
+        return summarize_lateness(self.lateness)
+
+
+def format_lateness(stats: dict) -> str:
+    return (
+        f"Опоздание команд ({stats['count']} шт.), мс: "
+        f"среднее {stats['mean'] * 1e3:.2f}, p50 {stats['p50'] * 1e3:.2f}, "
+        f"p95 {stats['p95'] * 1e3:.2f}, p99 {stats['p99'] * 1e3:.2f}, "
+        f"макс {stats['max'] * 1e3:.2f}"
+    )
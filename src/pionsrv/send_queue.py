@@ -0,0 +1,250 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+from swarm_server import CMD
+from pionsrv.scheduler import summarize_lateness
+
+# Классы приоритета исходящих команд (меньше – важнее)
+SAFETY = 0
+MOTION = 1
+CONFIG = 2
+PRIORITY_NAMES = {SAFETY: "safety", MOTION: "motion", CONFIG: "config"}
+
+# Команды безопасности: отправляются сразу, мимо очереди и ограничения скорости
+SAFETY_COMMANDS = frozenset({CMD.STOP, CMD.LAND, CMD.DISARM})
+MOTION_PRIORITY_COMMANDS = frozenset({CMD.GOTO, CMD.SMART_GOTO, CMD.SET_SPEED, CMD.TAKEOFF, CMD.ARM,
+                                      CMD.SWARM_ON})
+# Уставки: новая уставка тому же адресату заменяет ещё не отправленную
+SETPOINT_COMMANDS = frozenset({CMD.GOTO, CMD.SMART_GOTO, CMD.SET_SPEED})
+# Команды-барьеры: команды движения, поставленные после них, не обгоняют их
+# (takeoff группе после setgroup должен прийти к дронам уже с новой группой)
+BARRIER_COMMANDS = frozenset({CMD.SET_GROUP})
+# Адресат (target_id, group_id) команды для всех
+BROADCAST = ("", 0)
+
+
+def priority_of(command: Optional[CMD]) -> int:
+    if command in SAFETY_COMMANDS:
+        return SAFETY
+    if command in MOTION_PRIORITY_COMMANDS:
+        return MOTION
+    return CONFIG
+
+
+def target_of(key) -> Optional[tuple]:
+    """
+    Адресат (target_id, group_id) из ключа команды (command, target_id, group_id); None – неизвестен.
+    """
+    return None if key is None else tuple(key[1:])
+
+
+def covers(safety: Optional[tuple], motion: Optional[tuple]) -> bool:
+    """
+    Могут ли адресаты команды безопасности и команды движения пересекаться.
+    У команды одному дрону group_id – его группа (0 – неизвестна); при неизвестном
+    адресате или группе считается, что пересекаются.
+    """
+    if safety is None or motion is None or safety == BROADCAST or motion == BROADCAST:
+        return True
+    safety_id, safety_group = safety
+    motion_id, motion_group = motion
+    if safety_id and motion_id:
+        return safety_id == motion_id
+    # Группа и дрон или две группы: пересекаются, если группа та же или группа дрона неизвестна
+    return safety_group == motion_group or not safety_group or not motion_group
+
+
+class _Entry:
+    __slots__ = ("command", "frames", "key", "target", "seq", "queued_at")
+
+    def __init__(self, command, frames, key, target, seq, queued_at):
+        self.command = command
+        self.frames = frames  # [(байты, адрес или None – широковещательно), ...]
+        self.key = key
+        self.target = target
+        self.seq = seq
+        self.queued_at = queued_at
+
+
+class SendQueue:
+    """
+    Планировщик исходящих пакетов между ControlServer и сокетом.
+
+    Пакеты уходят из фонового потока не быстрее rate пакетов в секунду
+    (token bucket, допускается всплеск до burst пакетов), по классам
+    приоритета: motion раньше config (LED, группы, режимы), но не раньше
+    поставленного до них setgroup (BARRIER_COMMANDS).
+
+    Команды безопасности (stop/land/disarm) не ждут: отправляются сразу в
+    вызывающем потоке, а ещё не отправленные команды движения, адресаты которых
+    могут пересекаться с её адресатами (covers: тот же дрон, группа и её дроны,
+    команды всем), выбрасываются, чтобы goto из очереди не перебил посадку.
+    Команды движения с неизвестным адресатом (повторы надёжной доставки)
+    выбрасываются любой командой безопасности. Уставка (goto,
+    smart_goto, set_speed) тому же адресату заменяет стоящую в очереди (coalesced).
+    Если в очереди уже max_depth команд, новая отбрасывается (dropped).
+    deliver(command, frames) – фактическая отправка.
+    """
+
+    def __init__(self, deliver: Callable, rate: float = 500.0, burst: int = 100, max_depth: int = 10000,
+                 history: int = 1000):
+        self.deliver = deliver
+        self.rate = rate
+        self.burst = burst
+        self.max_depth = max_depth
+        self.queues = {MOTION: deque(), CONFIG: deque()}
+        self.pending = {}  # ключ уставки -> _Entry в очереди
+        self.cond = threading.Condition()
+        # Отправка из потока очереди и команд безопасности не перемежается: goto, уже
+        # вынутый из очереди, не уйдёт после stop тому же адресату (см. _in_flight_safety)
+        self.send_lock = threading.Lock()
+        self._in_flight_safety = []  # адресаты команд безопасности с момента выемки текущей команды
+        self._seq = 0
+        self._barrier_seq = -1
+        self.tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_seen_depth = 0
+        self.waits = deque(maxlen=history)
+        self._closed = False
+        self.thread = threading.Thread(target=self._send_loop, daemon=True)
+        self.thread.start()
+
+    @property
+    def depth(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+    def submit(self, command: Optional[CMD], frames: list, key=None) -> bool:
+        """
+        Ставит команду (один или несколько пакетов) в очередь. key – (command, target_id,
+        group_id): адресат уставки для замены устаревших и команды безопасности.
+        Возвращает False, если команда отброшена.
+        """
+        priority = priority_of(command)
+        target = target_of(key)
+        if priority == SAFETY:
+            with self.send_lock:
+                with self.cond:
+                    self._drop_motion(target)
+                    self._in_flight_safety.append(target)
+                    if len(self._in_flight_safety) > 64:
+                        self._in_flight_safety = [None]  # None пересекается со всеми
+                    self._refill()
+                    self.tokens -= len(frames)
+                    self.sent += len(frames)
+                    self.waits.append(0.0)
+                self.deliver(command, frames)
+            return True
+        with self.cond:
+            if self._closed:
+                return False
+            if key is not None and command in SETPOINT_COMMANDS:
+                entry = self.pending.get(key)
+                # Уставка, стоящая до барьера, не заменяется: новая уйдёт после барьера
+                if entry is not None and entry.seq > self._barrier_seq:
+                    entry.frames = frames
+                    self.coalesced += 1
+                    return True
+            if self.depth >= self.max_depth:
+                self.dropped += 1
+                return False
+            entry = _Entry(command, frames, key if command in SETPOINT_COMMANDS else None, target, self._seq,
+                           time.monotonic())
+            self._seq += 1
+            if command in BARRIER_COMMANDS:
+                self._barrier_seq = entry.seq
+            self.queues[priority].append(entry)
+            if entry.key is not None:
+                self.pending[entry.key] = entry
+            self.max_seen_depth = max(self.max_seen_depth, self.depth)
+            self.cond.notify()
+        return True
+
+    def _drop_motion(self, target: Optional[tuple]) -> None:
+        """
+        Выбрасывает команды движения, адресаты которых пересекаются с target (см. covers).
+        """
+        kept = deque()
+        for entry in self.queues[MOTION]:
+            if covers(target, entry.target):
+                self.dropped += 1
+                if entry.key is not None and self.pending.get(entry.key) is entry:
+                    del self.pending[entry.key]
+            else:
+                kept.append(entry)
+        self.queues[MOTION] = kept
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(float(self.burst), self.tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _next_entry(self) -> Optional[_Entry]:
+        motion, config = self.queues[MOTION], self.queues[CONFIG]
+        # Барьер, поставленный раньше первой команды движения, уходит раньше неё
+        # вместе со стоящими перед ним config-командами (FIFO)
+        if motion and config and self._barrier_seq >= config[0].seq and any(
+                entry.command in BARRIER_COMMANDS and entry.seq < motion[0].seq for entry in config):
+            return config[0]
+        if motion:
+            return motion[0]
+        return config[0] if config else None
+
+    def _send_loop(self) -> None:
+        while True:
+            with self.cond:
+                entry = self._next_entry()
+                while entry is None:
+                    if self._closed:
+                        return
+                    self.cond.wait()
+                    entry = self._next_entry()
+                self._refill()
+                need = min(len(entry.frames), self.burst)
+                if self.tokens < need:
+                    self.cond.wait((need - self.tokens) / self.rate)
+                    continue
+                self.queues[priority_of(entry.command)].popleft()
+                if entry.key is not None and self.pending.get(entry.key) is entry:
+                    del self.pending[entry.key]
+                self.tokens -= len(entry.frames)
+                self.waits.append(time.monotonic() - entry.queued_at)
+                self._in_flight_safety = []
+            with self.send_lock:
+                with self.cond:
+                    if priority_of(entry.command) == MOTION and any(
+                            covers(target, entry.target) for target in self._in_flight_safety):
+                        self.dropped += 1
+                        continue
+                    self.sent += len(entry.frames)
+                self.deliver(entry.command, entry.frames)
+
+    def close(self, timeout: float = 2.0) -> None:
+        """
+        Останавливает приём команд и ждёт отправки очереди не дольше timeout.
+        """
+        with self.cond:
+            self._closed = True
+            self.cond.notify()
+        self.thread.join(timeout=timeout)
+
+    def stats(self) -> dict:
+        with self.cond:
+            return {
+                "depth": {PRIORITY_NAMES[p]: len(q) for p, q in self.queues.items()},
+                "max_depth": self.max_seen_depth,
+                "sent": self.sent,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+                "wait": summarize_lateness(list(self.waits)),
+            }
+
+    def format(self) -> str:
+        s = self.stats()
+        depth = ", ".join(f"{name} {n}" for name, n in s["depth"].items())
+        return (f"Очередь отправки ({self.rate:g} пак/с): в очереди {depth}, максимум {s['max_depth']}; "
+                f"отправлено {s['sent']}, отброшено {s['dropped']}, заменено уставок {s['coalesced']}; "
+                f"ожидание мс: p95 {s['wait']['p95'] * 1e3:.1f}, макс {s['wait']['max'] * 1e3:.1f}")
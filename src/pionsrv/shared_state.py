@@ -0,0 +1,275 @@
+import multiprocessing as mp
+import platform
+import socket
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+import numpy as np
+from pionsrv.decoder import BatchDecoder, as_matrix
+from pionsrv.receiver import BatchReceiver
+from pionsrv.recorder import FlightRecorder
+from pionsrv.swarm_state import SwarmState
+
+# Процессоры с моделью памяти TSO, на которую опирается seqlock (см. SharedSwarmState)
+TSO_MACHINES = frozenset({"x86_64", "amd64", "i386", "i686", "x86"})
+
+# Заголовок общей памяти (int64): номер публикации, размеры, число дронов в каждом буфере, счётчики приёма
+SEQ, CAPACITY, TRAIL_LENGTH, COUNT0, COUNT1, PACKETS, DECODE_ERRORS, TRUNCATED = range(8)
+HEADER_SIZE = 8
+
+
+def _fields(capacity: int, trail_length: int) -> tuple:
+    """
+    Массивы одного буфера: те же ключи, что у SwarmState.frame().
+    """
+    return (
+        ("ids", np.int64, (capacity,)),
+        ("unique_id", np.int64, (capacity,)),
+        ("position", np.float64, (capacity, 3)),
+        ("velocity", np.float64, (capacity, 3)),
+        ("attitude", np.float64, (capacity, 6)),
+        ("t_speed", np.float64, (capacity, 4)),
+        ("last_update", np.float64, (capacity,)),
+        ("colors", np.float64, (capacity, 3)),
+        ("trails", np.float64, (capacity, trail_length, 2)),
+    )
+
+
+def _buffer_size(capacity: int, trail_length: int) -> int:
+    return sum(8 * int(np.prod(shape)) for _, _, shape in _fields(capacity, trail_length))
+
+
+class SharedSwarmState:
+    """
+    Снимок состояния роя в multiprocessing.shared_memory: один писатель
+    (процесс приёма), любое число читателей в других процессах без блокировок.
+
+    Два буфера и счётчик публикаций seq (seqlock): писатель заполняет буфер
+    (seq + 1) % 2, которого читатели не касаются, и только потом увеличивает
+    seq. Читатель копирует буфер seq % 2 и проверяет, что seq не изменился;
+    иначе писатель мог начать перезапись этого буфера – копия повторяется.
+    Счётчик – выровненное int64. Барьеров памяти из Python не поставить, поэтому
+    порядок записей писателя и чтений читателя держится на модели памяти x86 (TSO):
+    x86/x86-64 – требование. На ARM (aarch64) и других слабо упорядоченных
+    процессорах чтения буфера могут переупорядочиться относительно проверки seq,
+    и читатель изредка получит несогласованный снимок – при создании и
+    подключении на такой платформе печатается предупреждение.
+    """
+
+    def __init__(self, shm: SharedMemory, owner: bool):
+        if platform.machine().lower() not in TSO_MACHINES:
+            print(f"Внимание: общая память состояния роя рассчитана на x86 (TSO), процессор "
+                  f"{platform.machine()} – снимки могут быть изредка несогласованными.")
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+        self.capacity = int(self.header[CAPACITY])
+        self.trail_length = int(self.header[TRAIL_LENGTH])
+        size = _buffer_size(self.capacity, self.trail_length)
+        self.buffers = []
+        for index in range(2):
+            offset = HEADER_SIZE * 8 + index * size
+            views = {}
+            for name, dtype, shape in _fields(self.capacity, self.trail_length):
+                views[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+                offset += 8 * int(np.prod(shape))
+            self.buffers.append(views)
+
+    @classmethod
+    def create(cls, capacity: int = 1024, trail_length: int = 30, name: Optional[str] = None) -> "SharedSwarmState":
+        """
+        Создаёт блок общей памяти (владелец удаляет его в close()). Блок с тем же
+        именем, оставшийся от упавшего процесса, удаляется.
+        """
+        if name is not None:
+            try:
+                stale = SharedMemory(name=name)
+            except FileNotFoundError:
+                pass
+            else:
+                stale.close()
+                stale.unlink()
+        size = HEADER_SIZE * 8 + 2 * _buffer_size(capacity, trail_length)
+        shm = SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[CAPACITY] = capacity
+        header[TRAIL_LENGTH] = trail_length
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, untrack: bool = True) -> "SharedSwarmState":
+        """
+        Подключение к существующему блоку из другого процесса. Удаляет блок владелец,
+        поэтому регистрация в resource_tracker снимается (untrack) – иначе блок удалился
+        бы при выходе читателя. Дочерние процессы владельца делят с ним resource_tracker
+        и подключаются с untrack=False.
+        """
+        shm = SharedMemory(name=name)
+        if untrack:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def seq(self) -> int:
+        return int(self.header[SEQ])
+
+    @property
+    def count(self) -> int:
+        return int(self.header[COUNT0 + self.seq % 2])
+
+    def publish(self, state: SwarmState) -> None:
+        """
+        Публикует состояние роя (вызывает только писатель). Дроны сверх capacity не попадают в снимок.
+        """
+        seq = int(self.header[SEQ])
+        index = (seq + 1) % 2
+        views = self.buffers[index]
+        n = min(state.count, self.capacity)
+        self.header[TRUNCATED] = state.count - n
+        snap = state.snapshot()
+        for name, array in snap.items():
+            views[name][:n] = array[:n]
+        views["trails"][:n] = state.trails_ordered()[:n]
+        self.header[COUNT0 + index] = n
+        self.header[SEQ] = seq + 1
+
+    def add_counters(self, packets: int, decode_errors: int) -> None:
+        self.header[PACKETS] += packets
+        self.header[DECODE_ERRORS] += decode_errors
+
+    def frame(self, retries: int = 100) -> Optional[dict]:
+        """
+        Согласованная копия последнего снимка (ключи SwarmState.frame()).
+        None – писатель обгонял чтение retries раз подряд.
+        """
+        for _ in range(retries):
+            seq = int(self.header[SEQ])
+            views = self.buffers[seq % 2]
+            n = int(self.header[COUNT0 + seq % 2])
+            frame = {name: view[:n].copy() for name, view in views.items()}
+            if int(self.header[SEQ]) == seq:
+                return frame
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "published": self.seq,
+            "drones": self.count,
+            "packets": int(self.header[PACKETS]),
+            "decode_errors": int(self.header[DECODE_ERRORS]),
+            "truncated": int(self.header[TRUNCATED]),
+        }
+
+    def staleness(self, now: Optional[float] = None) -> dict:
+        frame = self.frame()
+        if frame is None:
+            return {}
+        now = time.time() if now is None else now
+        return dict(zip(frame["ids"].tolist(), (now - frame["last_update"]).tolist()))
+
+    def format(self) -> str:
+        """
+        Таблица состояний из общей памяти (для команды status).
+        """
+        frame = self.frame()
+        if frame is None:
+            return "Общая память: снимок не прочитан (писатель обгоняет чтение)."
+        now = time.time()
+        lines = [f"Общая память {self.name}: " + ", ".join(f"{k} {v}" for k, v in self.stats().items()),
+                 f"{'id':>8} {'x':>7} {'y':>7} {'z':>7} {'vx':>6} {'vy':>6} {'vz':>6} {'yaw':>6} {'age,с':>7}"]
+        for slot in np.argsort(frame["ids"]):
+            p, v = frame["position"][slot], frame["velocity"][slot]
+            lines.append(f"{frame['ids'][slot]:>8} {p[0]:7.2f} {p[1]:7.2f} {p[2]:7.2f} "
+                         f"{v[0]:6.2f} {v[1]:6.2f} {v[2]:6.2f} {frame['attitude'][slot, 2]:6.2f} "
+                         f"{now - frame['last_update'][slot]:7.1f}")
+        if len(lines) == 2:
+            lines.append("Телеметрия не получена.")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        # Представления NumPy держат буфер: без их удаления shm.close() бросит BufferError
+        self.header = None
+        self.buffers = []
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def ingest_worker(name: str, port: int, stop_event, publish_interval: float = 0.005, expire_after: float = 3.0,
+                  record_path: Optional[str] = None) -> None:
+    """
+    Процесс приёма: пакеты телеметрии пачками декодируются (BatchDecoder) в локальный
+    SwarmState и не чаще раза в publish_interval публикуются в общую память.
+    Отрисовка и консоль в других процессах не делят с ним GIL.
+    """
+    shared = SharedSwarmState.attach(name, untrack=False)
+    state = SwarmState(capacity=shared.capacity, trail_length=shared.trail_length)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("", port))
+    receiver = BatchReceiver(sock)
+    recorder = FlightRecorder(record_path) if record_path else None
+    decoder = BatchDecoder(receiver.batch_size)
+    published_at = 0.0
+    try:
+        while not stop_event.is_set():
+            batch = receiver.receive_batch(timeout=0.1)
+            if batch:
+                records, index, _, errors = decoder.decode([view for view, _ in batch])
+                if recorder is not None:
+                    for i, drone_id in zip(index.tolist(), records["id"].tolist()):
+                        recorder.record(bytes(batch[i][0]), drone_id)
+                if len(records):
+                    state.update(records["id"].tolist(), as_matrix(records))
+                shared.add_counters(len(records), errors)
+            now = time.monotonic()
+            if now - published_at >= publish_interval:
+                state.expire(expire_after)
+                shared.publish(state)
+                published_at = now
+    finally:
+        sock.close()
+        if recorder is not None:
+            recorder.close()
+        shared.close()
+
+
+class TelemetryProcess:
+    """
+    Приём телеметрии в отдельном процессе с публикацией в SharedSwarmState.
+    Родитель владеет общей памятью; reader() – копия для чтения в этом процессе,
+    другие процессы подключаются по имени (SharedSwarmState.attach(name)).
+    """
+
+    def __init__(self, port: int = 37020, capacity: int = 1024, trail_length: int = 30,
+                 name: Optional[str] = None, record_path: Optional[str] = None, publish_rate: float = 200.0):
+        self.shared = SharedSwarmState.create(capacity, trail_length, name)
+        self.stop_event = mp.Event()
+        self.process = mp.Process(
+            target=ingest_worker, args=(self.shared.name, port, self.stop_event),
+            kwargs={"publish_interval": 1.0 / publish_rate, "record_path": record_path}, daemon=True,
+        )
+
+    @property
+    def name(self) -> str:
+        return self.shared.name
+
+    def start(self) -> None:
+        self.process.start()
+
+    def reader(self) -> SharedSwarmState:
+        return self.shared
+
+    def close(self, timeout: float = 2.0) -> None:
+        self.stop_event.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.shared.close()
@@ -0,0 +1,314 @@
+import argparse
+import multiprocessing
+import socket
+import time
+from typing import Optional
+import numpy as np
+from swarm_server import DDatagram, CMD
+from pionsrv.receiver import BatchReceiver
+from pionsrv.reliable import ACK_SOURCE
+
+# Режимы движения симулированного дрона
+IDLE = 0  # на земле или висит, скорость гасится
+GOTO = 1  # движение к target
+SPEED = 2  # удержание скорости speed_command
+
+
+class SwarmSimulator:
+    """
+    Векторная модель роя: состояние всех дронов – массивы NumPy, шаг физики –
+    одна операция над всеми дронами сразу.
+
+    Кинематика упрощённая: желаемая скорость (к цели в режиме goto или заданная
+    set_speed) ограничивается max_speed, изменение скорости за шаг – max_accel.
+    Команды фильтруются как на дроне (swarm_server.Server.process_incoming_state):
+    target_id – один дрон, иначе group_id – группа, иначе все.
+    """
+
+    def __init__(self, count: int, first_id: int = 8000, group: int = 0, spacing: float = 1.0,
+                 max_speed: float = 1.0, max_accel: float = 2.0, takeoff_altitude: float = 1.0,
+                 gain: float = 1.5):
+        self.count = count
+        self.ids = np.arange(first_id, first_id + count, dtype=np.int64)
+        self.rows = {int(drone_id): row for row, drone_id in enumerate(self.ids)}
+        self.groups = np.full(count, group, dtype=np.int64)
+        self.armed = np.zeros(count, dtype=bool)
+        self.mode = np.full(count, IDLE, dtype=np.int8)
+        side = int(np.ceil(np.sqrt(count)))
+        grid = np.arange(count)
+        self.position = np.zeros((count, 3))
+        self.position[:, 0] = (grid % side - (side - 1) / 2) * spacing
+        self.position[:, 1] = (grid // side - (side - 1) / 2) * spacing
+        self.velocity = np.zeros((count, 3))
+        self.yaw = np.zeros(count)
+        self.yaw_rate = np.zeros(count)
+        self.target = np.zeros((count, 4))
+        self.target[:, :3] = self.position
+        self.speed_command = np.zeros((count, 4))
+        self.led = np.zeros((count, 4))
+        self.max_speed = max_speed
+        self.max_accel = max_accel
+        self.takeoff_altitude = takeoff_altitude
+        self.gain = gain
+        self.commands = 0
+
+    def select(self, target_id: str, group_id: int) -> np.ndarray:
+        """
+        Маска дронов, которым адресована команда.
+        """
+        if target_id:
+            mask = np.zeros(self.count, dtype=bool)
+            try:
+                row = self.rows.get(int(target_id))
+            except ValueError:
+                row = None
+            if row is not None:
+                mask[row] = True
+            return mask
+        if group_id:
+            return self.groups == group_id
+        return np.ones(self.count, dtype=bool)
+
+    def apply(self, command: CMD, data: list, target_id: str = "", group_id: int = 0) -> np.ndarray:
+        """
+        Выполняет команду для адресованных дронов. Возвращает их маску.
+        """
+        mask = self.select(target_id, group_id)
+        if not mask.any():
+            return mask
+        self.commands += 1
+        if command == CMD.ARM:
+            self.armed[mask] = True
+        elif command == CMD.DISARM:
+            self.armed[mask] = False
+            self.mode[mask] = IDLE
+        elif command == CMD.TAKEOFF:
+            ready = mask & self.armed
+            self.target[ready, :2] = self.position[ready, :2]
+            self.target[ready, 2] = self.takeoff_altitude
+            self.target[ready, 3] = self.yaw[ready]
+            self.mode[ready] = GOTO
+        elif command == CMD.LAND:
+            self.target[mask, :2] = self.position[mask, :2]
+            self.target[mask, 2] = 0.0
+            self.target[mask, 3] = self.yaw[mask]
+            self.mode[mask] = GOTO
+        elif command in (CMD.GOTO, CMD.SMART_GOTO) and len(data) == 4:
+            self.target[mask] = data
+            self.mode[mask] = GOTO
+        elif command == CMD.SET_SPEED and len(data) == 4:
+            self.speed_command[mask] = data
+            self.mode[mask] = SPEED
+        elif command == CMD.STOP:
+            self.target[mask, :3] = self.position[mask]
+            self.target[mask, 3] = self.yaw[mask]
+            self.mode[mask] = GOTO
+        elif command == CMD.SET_GROUP and data:
+            self.groups[mask] = int(data[0])
+        elif command == CMD.LED and len(data) == 4:
+            self.led[mask] = data
+        return mask
+
+    def step(self, dt: float) -> None:
+        desired = np.zeros_like(self.velocity)
+        desired_yaw_rate = np.zeros(self.count)
+        goto = self.mode == GOTO
+        desired[goto] = (self.target[goto, :3] - self.position[goto]) * self.gain
+        desired_yaw_rate[goto] = (self.target[goto, 3] - self.yaw[goto]) * self.gain
+        speed = self.mode == SPEED
+        desired[speed] = self.speed_command[speed, :3]
+        desired_yaw_rate[speed] = self.speed_command[speed, 3]
+        desired[~self.armed] = 0.0
+        desired_yaw_rate[~self.armed] = 0.0
+
+        norm = np.linalg.norm(desired, axis=1, keepdims=True)
+        desired *= np.minimum(1.0, self.max_speed / np.maximum(norm, 1e-9))
+        change = desired - self.velocity
+        norm = np.linalg.norm(change, axis=1, keepdims=True)
+        change *= np.minimum(1.0, self.max_accel * dt / np.maximum(norm, 1e-9))
+        self.velocity += change
+        self.velocity[~self.armed] = 0.0
+        self.position += self.velocity * dt
+        grounded = self.position[:, 2] < 0.0
+        self.position[grounded, 2] = 0.0
+        self.velocity[grounded, 2] = np.maximum(self.velocity[grounded, 2], 0.0)
+        self.yaw_rate = desired_yaw_rate
+        self.yaw += self.yaw_rate * dt
+
+    def telemetry(self) -> np.ndarray:
+        """
+        Телеметрия всех дронов (count, 17) в раскладке payload.data:
+        [id, x, y, z, vx, vy, vz, roll, pitch, yaw, roll_rate, pitch_rate, yaw_rate, t_speed(4)].
+        """
+        records = np.zeros((self.count, 17))
+        records[:, 0] = self.ids
+        records[:, 1:4] = self.position
+        records[:, 4:7] = self.velocity
+        records[:, 9] = self.yaw
+        records[:, 12] = self.yaw_rate
+        records[:, 13:16] = self.velocity
+        records[:, 16] = self.yaw_rate
+        return records
+
+
+class SimulatorNode:
+    """
+    Сетевая часть симулятора: приём команд с порта роя и рассылка телеметрии.
+
+    Один поток: между тактами физики сокет вычитывается пачками (BatchReceiver),
+    каждые 1 / telemetry_rate секунд отправляется телеметрия всех дронов.
+    На команды с token >= 0 (режим --reliable сервера) каждый адресат отвечает ack.
+    """
+
+    def __init__(self, simulator: SwarmSimulator, port: int = 37020, telemetry_rate: float = 10.0,
+                 physics_rate: float = 50.0, telemetry_host: str = "<broadcast>"):
+        self.sim = simulator
+        self.port = port
+        self.telemetry_rate = telemetry_rate
+        self.physics_rate = physics_rate
+        self.telemetry_address = (telemetry_host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self.sock.bind(("", port))
+        self.receiver = BatchReceiver(self.sock)
+        self.decoder = DDatagram()
+        self.encoder = DDatagram()
+        self.sent = 0
+        self.acks = 0
+        self.running = True
+
+    def handle(self, data) -> None:
+        valid, payload = self.decoder.read_serialized(data)
+        if not valid or payload.command == 0:
+            return  # телеметрия и подтверждения (свои и чужие)
+        try:
+            command = CMD(payload.command)
+        except ValueError:
+            return
+        mask = self.sim.apply(command, list(payload.data), payload.target_id, payload.group_id)
+        if payload.token >= 0:
+            for drone_id in self.sim.ids[mask].tolist():
+                self.send_ack(drone_id, payload.token)
+
+    def send_ack(self, drone_id: int, token: int) -> None:
+        self.encoder.id = drone_id
+        self.encoder.source = ACK_SOURCE
+        self.encoder.token = token
+        self.encoder.command = 0
+        self.encoder.data = []
+        self._send(self.encoder.export_serialized())
+        self.acks += 1
+
+    def send_telemetry(self) -> None:
+        encoder = self.encoder
+        encoder.source = 0
+        encoder.token = -1
+        encoder.command = 0
+        for record in self.sim.telemetry().tolist():
+            encoder.id = int(record[0])
+            encoder.data = record
+            self._send(encoder.export_serialized())
+        self.sent += self.sim.count
+
+    def _send(self, frame: bytes) -> None:
+        try:
+            self.sock.sendto(frame, self.telemetry_address)
+        except BlockingIOError:
+            pass  # буфер отправки полон – пакет теряется, как в радиоканале
+        except OSError as error:
+            print("Ошибка отправки телеметрии:", error)
+
+    def run(self, duration: Optional[float] = None, report_interval: float = 5.0) -> None:
+        dt = 1.0 / self.physics_rate
+        telemetry_period = 1.0 / self.telemetry_rate
+        start = last_step = next_step = time.monotonic()
+        next_telemetry = start
+        next_report = start + report_interval
+        while self.running and (duration is None or time.monotonic() - start < duration):
+            for data, _ in self.receiver.receive_batch(timeout=max(0.0, next_step - time.monotonic())):
+                self.handle(data)
+            now = time.monotonic()
+            if now < next_step:
+                continue
+            self.sim.step(now - last_step)
+            last_step = now
+            next_step = max(next_step + dt, now)
+            if now >= next_telemetry:
+                self.send_telemetry()
+                next_telemetry += telemetry_period
+                if next_telemetry < now:
+                    next_telemetry = now + telemetry_period  # не догоняем пропущенные такты
+            if now >= next_report:
+                print(f"[{self.sim.ids[0]}..{self.sim.ids[-1]}] телеметрия: {self.sent} пак., "
+                      f"команд: {self.sim.commands}, ack: {self.acks}, "
+                      f"в воздухе: {int((self.sim.position[:, 2] > 0.05).sum())}")
+                next_report += report_interval
+
+    def stop(self) -> None:
+        """
+        Завершает run() из другого потока (после текущего такта).
+        """
+        self.running = False
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+def run_shard(count: int, first_id: int, args: argparse.Namespace) -> None:
+    sim = SwarmSimulator(count, first_id=first_id, group=args.group, spacing=args.spacing,
+                         max_speed=args.max_speed)
+    node = SimulatorNode(sim, port=args.port, telemetry_rate=args.rate, physics_rate=args.physics_rate,
+                         telemetry_host=args.telemetry_host)
+    try:
+        node.run(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        node.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Симулятор роя: дроны принимают команды DDatagram и рассылают телеметрию по UDP. "
+                    "Все процессы слушают один порт (SO_REUSEADDR), поэтому широковещательные команды "
+                    "получают все; unicast-команды на этой же машине получит только один процесс – "
+                    "запускайте сервер с --no-unicast или без ip в drones_config.json."
+    )
+    parser.add_argument("--count", type=int, default=100, help="число дронов")
+    parser.add_argument("--first-id", type=int, default=8000, help="id первого дрона")
+    parser.add_argument("--group", type=int, default=0, help="начальная группа дронов")
+    parser.add_argument("--port", type=int, default=37020)
+    parser.add_argument("--telemetry-host", default="<broadcast>", help="адрес для телеметрии")
+    parser.add_argument("--rate", type=float, default=10.0, help="частота телеметрии, Гц")
+    parser.add_argument("--physics-rate", type=float, default=50.0, help="частота шага физики, Гц")
+    parser.add_argument("--spacing", type=float, default=1.0, help="шаг начальной сетки, м")
+    parser.add_argument("--max-speed", type=float, default=1.0, help="ограничение скорости, м/с")
+    parser.add_argument("--processes", type=int, default=1, help="число процессов (дроны делятся между ними)")
+    parser.add_argument("--duration", type=float, default=None, help="время работы, с")
+    args = parser.parse_args()
+
+    shards = max(1, min(args.processes, args.count))
+    sizes = [args.count // shards + (1 if i < args.count % shards else 0) for i in range(shards)]
+    print(f"Симуляция {args.count} дронов (id {args.first_id}..{args.first_id + args.count - 1}), "
+          f"процессов: {shards}, порт {args.port}")
+    if shards == 1:
+        run_shard(args.count, args.first_id, args)
+        return
+    processes = []
+    first_id = args.first_id
+    for size in sizes:
+        process = multiprocessing.Process(target=run_shard, args=(size, first_id, args), daemon=True)
+        process.start()
+        processes.append(process)
+        first_id += size
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import threading
+import time
+from typing import Iterable, Optional
+import numpy as np
+
+# Длина записи телеметрии: [0] unique_id дрона, [1:4] позиция, [4:7] скорость, [7:13] ориентация, [13:17] t_speed
+RECORD_LENGTH = 17
+
+
+class SwarmState:
+    """
+    Колоночное хранилище состояния роя на предвыделенных массивах NumPy.
+
+    Каждый дрон занимает слот; занятые слоты всегда плотно лежат в [0, count),
+    поэтому snapshot() возвращает срезы-представления без копирования.
+    Следы – кольцевые буферы фиксированной длины (capacity, trail_length, 2).
+
+    Запись ведёт один поток (приёмник), блокировка берётся только на время
+    векторного обновления или удаления слотов, не на время чтения/отрисовки.
+    """
+
+    def __init__(self, capacity: int = 256, trail_length: int = 30, seed: Optional[int] = None):
+        self.capacity = capacity
+        self.trail_length = trail_length
+        self.count = 0
+        self.slots = {}  # id дрона -> номер слота
+        self.lock = threading.Lock()
+        self._rng = np.random.default_rng(seed)
+
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.unique_id = np.zeros(capacity, dtype=np.int64)  # поле [0] телеметрии
+        self.position = np.zeros((capacity, 3))
+        self.velocity = np.zeros((capacity, 3))
+        self.attitude = np.zeros((capacity, 6))
+        self.t_speed = np.zeros((capacity, 4))
+        self.last_update = np.zeros(capacity)
+        self.colors = np.zeros((capacity, 3))
+        self.trail = np.zeros((capacity, trail_length, 2))
+        self.trail_head = np.zeros(capacity, dtype=np.int64)
+        self.trail_size = np.zeros(capacity, dtype=np.int64)
+
+    def _grow(self) -> None:
+        new_capacity = self.capacity * 2
+        for name in ("ids", "unique_id", "position", "velocity", "attitude", "t_speed", "last_update",
+                     "colors", "trail", "trail_head", "trail_size"):
+            old = getattr(self, name)
+            new = np.zeros((new_capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.capacity] = old
+            setattr(self, name, new)
+        self.capacity = new_capacity
+
+    def _slot(self, drone_id: int) -> int:
+        slot = self.slots.get(drone_id)
+        if slot is None:
+            if self.count == self.capacity:
+                self._grow()
+            slot = self.count
+            self.count += 1
+            self.slots[drone_id] = slot
+            self.ids[slot] = drone_id
+            self.colors[slot] = self._rng.random(3)
+            self.trail_head[slot] = 0
+            self.trail_size[slot] = 0
+        return slot
+
+    def update(self, ids: Iterable[int], records: np.ndarray, timestamp: Optional[float] = None) -> None:
+        """
+        Пакетное обновление: ids – id дронов, records – массив (n, RECORD_LENGTH)
+        в раскладке телеметрии. При повторе id в пакете берётся последняя запись.
+        """
+        records = np.asarray(records, dtype=np.float64)
+        if records.ndim != 2 or len(records) == 0:
+            return
+        if records.shape[1] < RECORD_LENGTH:
+            records = np.pad(records, ((0, 0), (0, RECORD_LENGTH - records.shape[1])))
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            slots = np.fromiter((self._slot(int(i)) for i in ids), dtype=np.int64, count=len(records))
+            # Оставляем последнее вхождение каждого слота
+            _, last = np.unique(slots[::-1], return_index=True)
+            keep = len(slots) - 1 - last
+            slots = slots[keep]
+            records = records[keep]
+
+            self.unique_id[slots] = records[:, 0].astype(np.int64)
+            self.position[slots] = records[:, 1:4]
+            self.velocity[slots] = records[:, 4:7]
+            self.attitude[slots] = records[:, 7:13]
+            self.t_speed[slots] = records[:, 13:17]
+            self.last_update[slots] = timestamp
+
+            head = self.trail_head[slots]
+            self.trail[slots, head] = records[:, 1:3]
+            self.trail_head[slots] = (head + 1) % self.trail_length
+            self.trail_size[slots] = np.minimum(self.trail_size[slots] + 1, self.trail_length)
+
+    def update_one(self, drone_id: int, data, timestamp: Optional[float] = None) -> None:
+        record = np.zeros((1, RECORD_LENGTH))
+        values = np.asarray(data[:RECORD_LENGTH], dtype=np.float64)
+        record[0, :len(values)] = values
+        self.update((drone_id,), record, timestamp)
+
+    def _remove(self, slot: int) -> None:
+        last = self.count - 1
+        drone_id = int(self.ids[slot])
+        if slot != last:
+            for array in (self.ids, self.unique_id, self.position, self.velocity, self.attitude, self.t_speed,
+                          self.last_update, self.colors, self.trail, self.trail_head, self.trail_size):
+                array[slot] = array[last]
+            self.slots[int(self.ids[slot])] = slot
+        del self.slots[drone_id]
+        self.count = last
+
+    def expire(self, timeout: float, now: Optional[float] = None) -> list:
+        """
+        Удаляет дронов без обновлений дольше timeout секунд. Возвращает их id.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            stale = np.nonzero(now - self.last_update[:self.count] > timeout)[0]
+            removed = [int(self.ids[slot]) for slot in stale]
+            for drone_id in removed:
+                self._remove(self.slots[drone_id])
+        return removed
+
+    def staleness(self, now: Optional[float] = None) -> dict:
+        """
+        Время с последнего обновления каждого дрона, с: {id: возраст}.
+        """
+        now = time.time() if now is None else now
+        n = self.count
+        return dict(zip(self.ids[:n].tolist(), (now - self.last_update[:n]).tolist()))
+
+    def snapshot(self) -> dict:
+        """
+        Представления (без копирования) занятых слотов. Данные могут обновиться
+        приёмником во время чтения – для отрисовки это допустимо.
+        """
+        n = self.count
+        return {
+            "ids": self.ids[:n],
+            "unique_id": self.unique_id[:n],
+            "position": self.position[:n],
+            "velocity": self.velocity[:n],
+            "attitude": self.attitude[:n],
+            "t_speed": self.t_speed[:n],
+            "last_update": self.last_update[:n],
+            "colors": self.colors[:n],
+        }
+
+    def frame(self) -> dict:
+        """
+        Копия снимка вместе со следами – для передачи в другой процесс (рендер, запись).
+        """
+        frame = {name: array.copy() for name, array in self.snapshot().items()}
+        frame["trails"] = self.trails_ordered()
+        return frame
+
+    def trail_points(self, slot: int) -> np.ndarray:
+        """
+        Точки следа дрона в хронологическом порядке (копия, shape (k, 2)).
+        """
+        size = int(self.trail_size[slot])
+        if size < self.trail_length:
+            return self.trail[slot, :size].copy()
+        return np.roll(self.trail[slot], -int(self.trail_head[slot]), axis=0)
+
+    def trails_ordered(self) -> np.ndarray:
+        """
+        Следы всех занятых слотов в хронологическом порядке, shape (count, trail_length, 2).
+        Незаполненные точки – NaN. Собирается одним векторным индексированием.
+        """
+        n = self.count
+        size = self.trail_size[:n]
+        start = np.where(size < self.trail_length, 0, self.trail_head[:n])
+        steps = np.arange(self.trail_length)
+        index = (start[:, None] + steps) % self.trail_length
+        trails = self.trail[np.arange(n)[:, None], index]
+        trails[steps[None, :] >= size[:, None]] = np.nan
+        return trails
@@ -0,0 +1,223 @@
+import socket
+import threading
+import time
+from queue import Queue, Empty
+from typing import Iterable, Optional
+from pionsrv.decoder import TELEMETRY_MIN_LENGTH, BatchDecoder
+from pionsrv.receiver import BatchReceiver
+from pionsrv.recorder import RX
+
+# Раскладка телеметрии в payload.data (см. UDPBroadcastClient.send на дроне):
+# [0] ip/id, [1:4] позиция, [4:7] скорость, [7:13] ориентация, [13:17] t_speed
+# (TELEMETRY_MIN_LENGTH и запись TELEMETRY_DTYPE – в decoder)
+
+
+class DroneState:
+    """
+    Последнее известное состояние дрона.
+    armed – состояние по последней отправленной ARM/DISARM (None – неизвестно),
+    так как в телеметрии флага arm нет.
+    """
+    __slots__ = ("drone_id", "ip", "position", "velocity", "attitude", "t_speed", "last_seen", "armed")
+
+    def __init__(self, drone_id: str):
+        self.drone_id = drone_id
+        self.ip = ""
+        self.position = (0.0, 0.0, 0.0)
+        self.velocity = (0.0, 0.0, 0.0)
+        self.attitude = (0.0,) * 6
+        self.t_speed = (0.0,) * 4
+        self.last_seen = 0.0
+        self.armed = None
+
+
+class TelemetryTable:
+    """
+    Таблица состояний дронов, обновляемая из телеметрии. Ключ – id дрона строкой
+    (как в drones_config.json и в target команд).
+    """
+
+    def __init__(self, alive_timeout: float = 3.0):
+        self.alive_timeout = alive_timeout
+        self.lock = threading.Lock()
+        self.drones = {}
+
+    def update(self, payload, addr=None, timestamp: Optional[float] = None) -> None:
+        data = payload.data
+        drone_id = str(payload.id)
+        with self.lock:
+            state = self.drones.get(drone_id)
+            if state is None:
+                state = self.drones[drone_id] = DroneState(drone_id)
+            if addr is not None:
+                state.ip = addr[0]
+            state.position = tuple(data[1:4])
+            state.velocity = tuple(data[4:7])
+            if len(data) >= 13:
+                state.attitude = tuple(data[7:13])
+            if len(data) >= 17:
+                state.t_speed = tuple(data[13:17])
+            state.last_seen = time.monotonic() if timestamp is None else timestamp
+
+    def update_batch(self, records, addrs: list, timestamp: Optional[float] = None) -> None:
+        """
+        Обновление пачкой записей BatchDecoder (TELEMETRY_DTYPE); addrs – адрес отправителя каждой записи.
+        """
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        ids = records["id"].tolist()
+        positions = records["position"].tolist()
+        velocities = records["velocity"].tolist()
+        attitudes = records["attitude"].tolist()
+        t_speeds = records["t_speed"].tolist()
+        with self.lock:
+            for i, drone_id in enumerate(ids):
+                drone_id = str(drone_id)
+                state = self.drones.get(drone_id)
+                if state is None:
+                    state = self.drones[drone_id] = DroneState(drone_id)
+                if addrs[i] is not None:
+                    state.ip = addrs[i][0]
+                state.position = tuple(positions[i])
+                state.velocity = tuple(velocities[i])
+                state.attitude = tuple(attitudes[i])
+                state.t_speed = tuple(t_speeds[i])
+                state.last_seen = timestamp
+
+    def get(self, drone_id: str) -> Optional[DroneState]:
+        return self.drones.get(drone_id)
+
+    def is_alive(self, drone_id: str, now: Optional[float] = None) -> bool:
+        state = self.drones.get(drone_id)
+        if state is None:
+            return False
+        now = time.monotonic() if now is None else now
+        return now - state.last_seen <= self.alive_timeout
+
+    def staleness(self, now: Optional[float] = None) -> dict:
+        """
+        Время с последнего пакета телеметрии каждого дрона, с.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            return {d: now - s.last_seen for d, s in self.drones.items() if s.last_seen}
+
+    def alive_ids(self) -> list:
+        now = time.monotonic()
+        with self.lock:
+            return [d for d, s in self.drones.items() if now - s.last_seen <= self.alive_timeout]
+
+    def set_armed(self, drone_ids: Iterable[str], armed: bool) -> None:
+        with self.lock:
+            for drone_id in drone_ids:
+                state = self.drones.get(drone_id)
+                if state is None:
+                    state = self.drones[drone_id] = DroneState(drone_id)
+                state.armed = armed
+
+    def format(self) -> str:
+        """
+        Таблица состояний для команды status.
+        """
+        now = time.monotonic()
+        lines = [f"{'id':>8} {'ip':>15} {'x':>7} {'y':>7} {'z':>7} {'vx':>6} {'vy':>6} {'vz':>6} "
+                 f"{'yaw':>6} {'age,с':>7} {'arm':>4}"]
+        with self.lock:
+            for drone_id in sorted(self.drones):
+                s = self.drones[drone_id]
+                age = f"{now - s.last_seen:7.1f}" if s.last_seen else f"{'-':>7}"
+                armed = {None: "?", True: "да", False: "нет"}[s.armed]
+                lines.append(
+                    f"{drone_id:>8} {s.ip:>15} {s.position[0]:7.2f} {s.position[1]:7.2f} {s.position[2]:7.2f} "
+                    f"{s.velocity[0]:6.2f} {s.velocity[1]:6.2f} {s.velocity[2]:6.2f} "
+                    f"{s.attitude[2]:6.2f} {age} {armed:>4}"
+                )
+        if len(lines) == 1:
+            lines.append("Телеметрия не получена.")
+        return "\n".join(lines)
+
+
+class TelemetryReceiver:
+    """
+    Фоновый приём телеметрии: поток приёма вычитывает сокет пачками (BatchReceiver),
+    декодирует пачку целиком (BatchDecoder) и кладёт (записи, адреса, время) в
+    receive_queue, поток обработки переносит их в TelemetryTable.
+    Собственные команды сервера (command != 0) отбрасываются.
+    Если задан recorder (FlightRecorder), сырые пакеты телеметрии пишутся в журнал.
+    Подтверждения команд (source == ACK_SOURCE) передаются в ack_handler(id дрона, token).
+    Если задан metrics (MetricsRegistry), считаются пакеты по дронам и ошибки декодирования.
+    Если задан monitor (ProximityMonitor), каждая пачка передаётся ему для контроля сближения.
+    """
+
+    def __init__(self, receive_queue: Queue, table: TelemetryTable, port: int = 37020, recorder=None,
+                 ack_handler=None, metrics=None, monitor=None):
+        self.receive_queue = receive_queue
+        self.monitor = monitor
+        self.metrics = metrics
+        if metrics is not None:
+            self.packets_metric = metrics.counter("telemetry_packets_total", "Принятые пакеты телеметрии",
+                                                  label="drone")
+            self.decode_errors_metric = metrics.counter("decode_errors_total", "Пакеты, не прошедшие декодирование")
+        self.table = table
+        self.port = port
+        self.recorder = recorder
+        self.ack_handler = ack_handler
+        self.running = False
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("", self.port))
+        self.receiver = BatchReceiver(self.sock)
+        self.threads = []
+
+    def start(self) -> None:
+        self.running = True
+        for target in (self._receive_loop, self._ingest_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self) -> None:
+        self.running = False
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+        self.sock.close()
+
+    def _receive_loop(self) -> None:
+        decoder = BatchDecoder(self.receiver.batch_size)
+        while self.running:
+            try:
+                batch = self.receiver.receive_batch(timeout=0.5)
+            except (OSError, ValueError):
+                break
+            if not batch:
+                continue
+            timestamp = time.monotonic()
+            records, index, acks, errors = decoder.decode([view for view, _ in batch])
+            if errors and self.metrics is not None:
+                self.decode_errors_metric.inc(errors)
+            if self.ack_handler is not None:
+                for drone_id, token in acks:
+                    self.ack_handler(drone_id, token)
+            if not len(records):
+                continue
+            if self.metrics is not None:
+                for drone_id in records["id"].tolist():
+                    self.packets_metric.inc(label=drone_id)
+            if self.recorder is not None:
+                for i, drone_id in zip(index.tolist(), records["id"].tolist()):
+                    self.recorder.record(bytes(batch[i][0]), drone_id, RX, timestamp)
+            # Записи и буферы пакетов переиспользуются следующей пачкой – в очередь идёт копия
+            self.receive_queue.put((records.copy(), [batch[i][1] for i in index.tolist()], timestamp))
+
+    def _ingest_loop(self) -> None:
+        while self.running:
+            try:
+                records, addrs, timestamp = self.receive_queue.get(timeout=0.5)
+            except Empty:
+                continue
+            self.table.update_batch(records, addrs, timestamp)
+            if self.monitor is not None:
+                # Ошибка контроля сближения не должна останавливать приём телеметрии
+                try:
+                    self.monitor.update(records, timestamp)
+                except Exception as error:
+                    print("Ошибка контроля сближения:", error)
@@ -0,0 +1,102 @@
+import os
+import numpy as np
+
+# Колонки файла траектории: время от начала шоу (с), id дрона, x, y, z, yaw
+TRAJECTORY_COLUMNS = ("t", "id", "x", "y", "z", "yaw")
+
+
+def load_trajectory_data(path: str) -> np.ndarray:
+    """
+    Читает файл траектории в массив (N, 6) с колонками TRAJECTORY_COLUMNS.
+
+    .csv – текст с разделителем "," и необязательной строкой заголовка;
+    .npy – массив (N, 6) или структурированный массив с полями t, id, x, y, z, yaw,
+           открывается через memory map и не читается в память целиком;
+    .npz – архив с массивами t, id, x, y, z, yaw (или одним массивом data (N, 6)).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        with open(path, "r") as f:
+            first = f.readline().strip()
+        skip = 1 if first and not (first[0].isdigit() or first[0] in "-+.") else 0
+        data = np.loadtxt(path, delimiter=",", skiprows=skip, ndmin=2)
+    elif ext == ".npy":
+        data = np.load(path, mmap_mode="r")
+        if data.dtype.names:
+            data = np.column_stack([data[name] for name in TRAJECTORY_COLUMNS]).astype(np.float64)
+    elif ext == ".npz":
+        with np.load(path) as archive:
+            if "data" in archive:
+                data = archive["data"]
+            else:
+                data = np.column_stack([archive[name] for name in TRAJECTORY_COLUMNS])
+    else:
+        raise ValueError(f"Неизвестный формат траектории: {path} (нужен .csv, .npy или .npz)")
+    if data.ndim != 2 or data.shape[1] != len(TRAJECTORY_COLUMNS):
+        raise ValueError(f"{path}: ожидаются колонки {', '.join(TRAJECTORY_COLUMNS)}")
+    return data
+
+
+class Trajectory:
+    """
+    Ключевые точки всех дронов шоу, отсортированные по (id, t).
+
+    sample(t) интерполирует уставки всех дронов, активных в момент t, за один
+    векторный проход: поиск ключевых точек – один np.searchsorted по составному
+    ключу (номер дрона * span + время), без цикла по дронам. Если файл уже
+    отсортирован по (id, t), данные из memory map не копируются.
+    """
+
+    def __init__(self, data: np.ndarray):
+        ids = data[:, 1].astype(np.int64)
+        t = data[:, 0]
+        if len(data) and not self._is_sorted(ids, t):
+            order = np.lexsort((t, ids))
+            data, ids, t = data[order], ids[order], t[order]
+        self.t = t
+        self.setpoints = data[:, 2:6]
+        self.drone_ids, self.starts = np.unique(ids, return_index=True)
+        self.ends = np.append(self.starts[1:], len(ids))
+        self.first_t = t[self.starts]
+        self.last_t = t[self.ends - 1]
+        self.origin = float(t.min()) if len(t) else 0.0
+        self.span = float(t.max() - self.origin) + 1.0 if len(t) else 1.0
+        ranks = np.repeat(np.arange(len(self.drone_ids)), self.ends - self.starts)
+        self._key = ranks * self.span + (t - self.origin)
+
+    @staticmethod
+    def _is_sorted(ids: np.ndarray, t: np.ndarray) -> bool:
+        same = ids[1:] == ids[:-1]
+        return bool(np.all(ids[1:] >= ids[:-1]) and np.all(t[1:][same] >= t[:-1][same]))
+
+    @property
+    def start_time(self) -> float:
+        return float(self.first_t.min()) if len(self.first_t) else 0.0
+
+    @property
+    def end_time(self) -> float:
+        return float(self.last_t.max()) if len(self.last_t) else 0.0
+
+    def __len__(self):
+        return len(self.t)
+
+    def sample(self, time: float, hold: float = 0.0) -> tuple:
+        """
+        Уставки в момент time: (id дронов, позиции (n, 4) x y z yaw, скорости (n, 4)).
+        Дрон активен от первой ключевой точки до последней плюс hold секунд;
+        после последней точки позиция – последняя, скорость – ноль.
+        """
+        active = np.nonzero((self.first_t <= time) & (time < self.last_t + hold + 1e-9))[0]
+        query = active * self.span + (time - self.origin)
+        starts, last = self.starts[active], self.ends[active] - 1
+        i = np.clip(np.searchsorted(self._key, query, side="right") - 1, starts, last)
+        j = np.minimum(i + 1, last)
+        t0, dt = self.t[i], self.t[j] - self.t[i]
+        moving = dt > 0
+        safe_dt = np.where(moving, dt, 1.0)
+        frac = np.where(moving, np.clip((time - t0) / safe_dt, 0.0, 1.0), 0.0)
+        p0 = self.setpoints[i]
+        delta = self.setpoints[j] - p0
+        positions = p0 + frac[:, None] * delta
+        velocities = np.where(moving[:, None], delta / safe_dt[:, None], 0.0)
+        return self.drone_ids[active], positions, velocities
@@ -0,0 +1,100 @@
+import random
+import numpy as np
+from swarm_server import DDatagram
+from pionsrv.decoder import TELEMETRY_FIELDS, TELEMETRY_MIN_LENGTH, BatchDecoder, as_matrix
+from pionsrv.reliable import ACK_SOURCE
+
+
+def frame(drone_id: int, data: list, token: int = -1, source: int = 0, command: int = 0,
+          target_id: str = "", group_id: int = 0) -> bytes:
+    encoder = DDatagram(id=drone_id)
+    encoder.token = token
+    encoder.source = source
+    encoder.command = command
+    encoder.data = data
+    encoder.target_id = target_id
+    encoder.group_id = group_id
+    return encoder.export_serialized()
+
+
+def reference(frames: list) -> tuple:
+    """
+    То же, что BatchDecoder.decode, по одному кадру через DDatagram.read_serialized:
+    ({номер кадра: (id, data)}, acks, errors).
+    """
+    decoder = DDatagram()
+    records, acks, errors = {}, [], 0
+    for i, serialized in enumerate(frames):
+        valid, payload = decoder.read_serialized(serialized)
+        if not valid:
+            errors += 1
+            continue
+        if payload.source == ACK_SOURCE:
+            if payload.token >= 0:
+                acks.append((payload.id, payload.token))
+            continue
+        if payload.command == 0 and len(payload.data) >= TELEMETRY_MIN_LENGTH:
+            data = list(payload.data[:TELEMETRY_FIELDS])
+            records[i] = (payload.id, data + [0.0] * (TELEMETRY_FIELDS - len(data)))
+    return records, acks, errors
+
+
+def assert_parity(frames: list, decoder: BatchDecoder = None) -> None:
+    decoder = decoder or BatchDecoder(capacity=4)
+    records, index, acks, errors = decoder.decode(frames)
+    expected, expected_acks, expected_errors = reference(frames)
+    assert sorted(index.tolist()) == sorted(expected)
+    matrix = as_matrix(records)
+    for row, i in enumerate(index.tolist()):
+        assert int(records["id"][row]) == expected[i][0]
+        assert matrix[row].tolist() == expected[i][1]
+    assert sorted(acks) == sorted(expected_acks)
+    assert errors == expected_errors
+
+
+def telemetry(drone_id: int, length: int = 17) -> list:
+    return [float(drone_id)] + [drone_id * 0.001 + 0.1 * i for i in range(length - 1)]
+
+
+def test_uniform_telemetry():
+    assert_parity([frame(8000 + i, telemetry(8000 + i)) for i in range(100)])
+
+
+def test_mixed_frames():
+    rng = random.Random(0)
+    frames = []
+    for i in range(300):
+        # id разной длины varint, разное число значений data, команды, ack и target_id
+        drone_id = rng.choice([5, 300, 8000 + i, 10 ** 9 + i])
+        kind = rng.random()
+        if kind < 0.5:
+            frames.append(frame(drone_id, telemetry(drone_id, rng.choice([7, 10, 17, 20]))))
+        elif kind < 0.6:
+            frames.append(frame(drone_id, telemetry(drone_id, rng.choice([0, 3, 6]))))
+        elif kind < 0.8:
+            frames.append(frame(drone_id, [], token=rng.choice([-1, 0, 7, 2 ** 20]), source=ACK_SOURCE))
+        else:
+            frames.append(frame(drone_id, telemetry(drone_id), token=rng.randrange(100), command=rng.randrange(1, 5),
+                                target_id=rng.choice(["", "8001"]), group_id=rng.randrange(3)))
+    assert_parity(frames)
+
+
+def test_corrupted_and_short_frames():
+    good = [frame(8000 + i, telemetry(8000 + i)) for i in range(10)]
+    corrupted = bytearray(good[3])
+    corrupted[10] ^= 0xFF
+    frames = good + [bytes(corrupted), good[5][:20], b"", b"\x00\x01\x02"]
+    decoder = BatchDecoder()
+    assert_parity(frames, decoder)
+    _, index, _, errors = decoder.decode(frames)
+    assert 3 in index.tolist() and 10 not in index.tolist()
+    assert errors >= 2
+
+
+def test_unverified_decode_skips_hash():
+    frames = [frame(8000, telemetry(8000))]
+    corrupted = bytearray(frames[0])
+    corrupted[-1] ^= 0x01
+    records, index, _, errors = BatchDecoder(verify=False).decode([bytes(corrupted)])
+    assert index.tolist() == [0] and errors == 0
+    assert np.array_equal(as_matrix(records)[0], telemetry(8000))
@@ -0,0 +1,41 @@
+import numpy as np
+from pionsrv.decoder import TELEMETRY_DTYPE
+from pionsrv.proximity import ProximityMonitor
+
+
+def records(rows):
+    """
+    rows – [(id, позиция, скорость), ...].
+    """
+    result = np.zeros(len(rows), dtype=TELEMETRY_DTYPE)
+    for i, (drone_id, position, velocity) in enumerate(rows):
+        result[i]["id"] = drone_id
+        result[i]["position"] = position
+        result[i]["velocity"] = velocity
+    return result
+
+
+def test_close_pair_reported_once():
+    messages = []
+    monitor = ProximityMonitor(separation=1.0, check_rate=0.0, notify=messages.append)
+    batch = records([(8000, (0, 0, 1), (0, 0, 0)), (8001, (0.5, 0, 1), (0, 0, 0)), (8002, (9, 9, 1), (0, 0, 0))])
+    monitor.update(batch, timestamp=0.0)
+    monitor.update(batch, timestamp=0.1)
+    assert [(c.first, c.second, c.time) for c in monitor.conflicts] == [("8000", "8001", 0.0)]
+    assert len(messages) == 1
+
+
+def test_fast_drone_conflict_predicted():
+    # 4 м/с при max_speed 1 м/с: через 1.5 с дрон 8000 пролетит над 8001
+    monitor = ProximityMonitor(separation=1.0, horizon=2.0, max_speed=1.0, check_rate=0.0)
+    monitor.update(records([(8000, (0, 0, 1), (4, 0, 0)), (8001, (6, 0, 1), (0, 0, 0))]), timestamp=0.0)
+    assert [(c.first, c.second) for c in monitor.conflicts] == [("8000", "8001")]
+    assert monitor.conflicts[0].time == 1.5
+    assert monitor.stats()["fast"] == 1
+    assert "8000" in monitor.format()
+
+
+def test_non_finite_records_skipped():
+    monitor = ProximityMonitor(check_rate=0.0)
+    monitor.update(records([(8000, (np.nan, 0, 1), (0, 0, 0)), (8001, (0, 0, 1), (0, 0, 0))]), timestamp=0.0)
+    assert monitor.stats()["drones"] == 1
@@ -0,0 +1,74 @@
+import pytest
+from pionsrv.recorder import CHUNK_HEADER, MAGIC, RX, TX, FlightLog, FlightRecorder
+
+
+def write_log(path, compress: bool = True, close: bool = True) -> list:
+    """
+    Журнал из 300 записей трёх дронов, 10 записей в секунду, чанки по 2 с.
+    Возвращает записанные записи в формате FlightLog.records().
+    """
+    recorder = FlightRecorder(str(path), compress=compress, chunk_seconds=2.0)
+    written = []
+    for i in range(300):
+        record = (100.0 + i * 0.1, TX if i % 10 == 0 else RX, 8000 + i % 3, bytes([i % 256]) * (i % 7 + 1))
+        recorder.record(record[3], drone_id=record[2], direction=record[1], timestamp=record[0])
+        written.append(record)
+    if close:
+        recorder.close()
+    else:
+        recorder.flush()
+        recorder.file.close()
+    return written
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_index_and_records(tmp_path, compress):
+    written = write_log(tmp_path / "flight.log", compress)
+    log = FlightLog(str(tmp_path / "flight.log"))
+    assert log.count == 300 and len(log.index) > 10
+    assert (log.start_time, log.end_time) == (written[0][0], written[-1][0])
+    assert log.drone_ids() == {8000, 8001, 8002}
+    assert list(log.records()) == written
+    log.close()
+
+
+def test_seek(tmp_path):
+    written = write_log(tmp_path / "flight.log")
+    log = FlightLog(str(tmp_path / "flight.log"))
+    for start, end in [(100.0, 100.0), (103.05, 107.3), (110.0, 200.0), (50.0, 99.0), (129.9, 129.9)]:
+        assert list(log.records(start, end)) == [r for r in written if start <= r[0] <= end]
+    assert list(log.records(105.0, drone_ids=[8001], direction=RX)) == \
+        [r for r in written if r[0] >= 105.0 and r[2] == 8001 and r[1] == RX]
+    assert list(log.records(drone_ids=[9999])) == []
+    log.close()
+
+
+def test_rebuild_without_index(tmp_path):
+    write_log(tmp_path / "closed.log")
+    closed = FlightLog(str(tmp_path / "closed.log"))
+    written = write_log(tmp_path / "open.log", close=False)
+    log = FlightLog(str(tmp_path / "open.log"))
+    assert log.index == closed.index
+    assert list(log.records(110.0, 120.0)) == [r for r in written if 110.0 <= r[0] <= 120.0]
+    log.close()
+    closed.close()
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_rebuild_truncated(tmp_path, compress):
+    written = write_log(tmp_path / "flight.log", compress, close=False)
+    data = (tmp_path / "flight.log").read_bytes()
+    complete = FlightLog(str(tmp_path / "flight.log"))
+    last = complete.index[-1]
+    complete.close()
+    for cut in (last[0] + CHUNK_HEADER.size + 5, len(data) - 1):
+        (tmp_path / "cut.log").write_bytes(data[:cut])
+        log = FlightLog(str(tmp_path / "cut.log"))
+        # Оборванный последний чанк отбрасывается, предыдущие читаются целиком
+        assert log.index == complete.index[:-1]
+        assert list(log.records()) == written[:log.count]
+        log.close()
+    (tmp_path / "empty.log").write_bytes(MAGIC)
+    log = FlightLog(str(tmp_path / "empty.log"))
+    assert log.count == 0 and log.index == []
+    log.close()
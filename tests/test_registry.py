@@ -0,0 +1,40 @@
+import json
+import pytest
+from pionsrv.registry import SwarmRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    path = tmp_path / "drones_config.json"
+    path.write_text(json.dumps({
+        "8000": 1,
+        "8001": 1,
+        "8002": {"group": 2, "ip": "10.1.100.102", "tags": ["left"]},
+    }))
+    return SwarmRegistry(str(path))
+
+
+def test_parse_keeps_groups_separate(registry):
+    assert registry.parse("g:1+g:2+8005") == (False, {1, 2}, {"8005"})
+    assert registry.parse("all+t:left") == (True, set(), {"8002"})
+    with pytest.raises(ValueError):
+        registry.parse("g:x")
+
+
+def test_range_limited_to_known(registry):
+    assert registry.select("8000-99999") == {"8000", "8001", "8002"}
+    assert registry.select("8000-99999", known=["8100"]) == {"8000", "8001", "8002", "8100"}
+
+
+def test_setgroup_moves_drone(registry):
+    registry.mark_synced("8001", 2)
+    assert registry.group_of("8001") == 2
+    assert registry.group_members(1) == {"8000"}
+    assert registry.group_members(2) == {"8001", "8002"}
+    assert registry.select("g:2") == {"8001", "8002"}
+    # Конфигурация не изменилась – группа 1 для 8001 снова ждёт отправки
+    assert registry.pending_groups()["8001"] == 1
+
+
+def test_all_includes_known(registry):
+    assert registry.select("all", known=["8100"]) == {"8000", "8001", "8002", "8100"}
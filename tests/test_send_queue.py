@@ -0,0 +1,147 @@
+import threading
+import time
+import pytest
+from swarm_server import CMD
+from pionsrv.send_queue import BROADCAST, SendQueue, covers
+
+
+class Recorder:
+    """
+    deliver для SendQueue: запоминает (команда, адресат) в порядке отправки.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def __call__(self, command, frames):
+        with self.lock:
+            self.sent.extend((command, payload) for payload, _ in frames)
+
+
+def submit(queue, command, target_id="", group_id=0):
+    return queue.submit(command, [((command, target_id, group_id), None)], key=(command, target_id, group_id))
+
+
+def drain(queue, recorder, timeout=5.0):
+    queue.close(timeout)
+    assert not queue.thread.is_alive()
+    return [payload for _, payload in recorder.sent]
+
+
+@pytest.fixture
+def slow():
+    """
+    Очередь, отправляющая 5 пакетов в секунду без всплесков: пока тест ставит команды,
+    всё, кроме первого пакета, остаётся в очереди.
+    """
+    recorder = Recorder()
+    queue = SendQueue(recorder, rate=5.0, burst=1)
+    submit(queue, CMD.LED, "8000", 1)
+    deadline = time.monotonic() + 1.0
+    while not recorder.sent and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert recorder.sent, "первый пакет не отправлен"
+    yield queue, recorder
+    queue.close(0.0)
+
+
+def test_covers():
+    assert covers(("", 1), ("8001", 1))
+    assert covers(("8001", 1), ("", 1))
+    assert covers(("", 1), ("8001", 0))
+    assert covers(("8001", 0), ("", 2))
+    assert covers(("8001", 1), BROADCAST)
+    assert covers(None, ("8001", 1))
+    assert not covers(("", 1), ("8002", 2))
+    assert not covers(("8001", 1), ("8002", 1))
+    assert not covers(("", 1), ("", 2))
+
+
+def test_group_land_drops_member_goto(slow):
+    queue, recorder = slow
+    submit(queue, CMD.LED, "8000", 1)
+    submit(queue, CMD.GOTO, "8001", 1)
+    submit(queue, CMD.LAND, "", 1)
+    order = drain(queue, recorder)
+    assert (CMD.GOTO, "8001", 1) not in order
+    assert order.index((CMD.LAND, "", 1)) == 1
+
+
+def test_drone_land_drops_group_and_broadcast_motion(slow):
+    queue, recorder = slow
+    submit(queue, CMD.TAKEOFF, "", 1)
+    submit(queue, CMD.GOTO, "", 0)
+    submit(queue, CMD.GOTO, "8003", 2)
+    submit(queue, CMD.LAND, "8001", 1)
+    order = drain(queue, recorder)
+    assert (CMD.TAKEOFF, "", 1) not in order
+    assert (CMD.GOTO, "", 0) not in order
+    assert (CMD.GOTO, "8003", 2) in order
+
+
+def test_land_keeps_unrelated_motion(slow):
+    queue, recorder = slow
+    submit(queue, CMD.GOTO, "8002", 1)
+    submit(queue, CMD.GOTO, "", 2)
+    submit(queue, CMD.LAND, "8001", 1)
+    order = drain(queue, recorder)
+    assert order[1] == (CMD.LAND, "8001", 1)
+    assert (CMD.GOTO, "8002", 1) in order and (CMD.GOTO, "", 2) in order
+
+
+def test_broadcast_land_drops_all_motion_but_not_config(slow):
+    queue, recorder = slow
+    submit(queue, CMD.GOTO, "8002", 1)
+    submit(queue, CMD.SET_SPEED, "", 2)
+    submit(queue, CMD.LED, "8002", 1)
+    submit(queue, CMD.LAND)
+    order = drain(queue, recorder)
+    assert order[1:] == [(CMD.LAND, "", 0), (CMD.LED, "8002", 1)]
+
+
+def test_motion_before_config(slow):
+    queue, recorder = slow
+    submit(queue, CMD.LED, "8001", 1)
+    submit(queue, CMD.GOTO, "8001", 1)
+    order = drain(queue, recorder)
+    assert order[1:] == [(CMD.GOTO, "8001", 1), (CMD.LED, "8001", 1)]
+
+
+def test_setgroup_is_a_barrier(slow):
+    queue, recorder = slow
+    submit(queue, CMD.LED, "8001", 1)
+    submit(queue, CMD.SET_GROUP, "8001", 1)
+    submit(queue, CMD.TAKEOFF, "", 2)
+    submit(queue, CMD.LED, "8002", 1)
+    order = drain(queue, recorder)
+    assert order[1:] == [(CMD.LED, "8001", 1), (CMD.SET_GROUP, "8001", 1), (CMD.TAKEOFF, "", 2),
+                         (CMD.LED, "8002", 1)]
+
+
+def test_setpoints_coalesce(slow):
+    queue, recorder = slow
+    for x in range(5):
+        queue.submit(CMD.GOTO, [(x, None)], key=(CMD.GOTO, "8001", 0))
+    queue.submit(CMD.GOTO, [("other", None)], key=(CMD.GOTO, "8002", 0))
+    order = drain(queue, recorder)
+    assert order[1:] == [4, "other"]
+    assert queue.coalesced == 4
+
+
+def test_setpoint_after_barrier_not_coalesced(slow):
+    queue, recorder = slow
+    queue.submit(CMD.GOTO, [("before", None)], key=(CMD.GOTO, "8001", 0))
+    submit(queue, CMD.SET_GROUP, "8001", 0)
+    queue.submit(CMD.GOTO, [("after", None)], key=(CMD.GOTO, "8001", 0))
+    order = drain(queue, recorder)
+    assert order[1:] == ["before", (CMD.SET_GROUP, "8001", 0), "after"]
+
+
+def test_max_depth(slow):
+    queue, _ = slow
+    queue.max_depth = 2
+    assert submit(queue, CMD.LED, "8001")
+    assert submit(queue, CMD.LED, "8002")
+    assert not submit(queue, CMD.LED, "8003")
+    assert queue.dropped == 1
@@ -0,0 +1,61 @@
+import multiprocessing as mp
+import numpy as np
+from pionsrv.shared_state import SharedSwarmState
+from pionsrv.swarm_state import RECORD_LENGTH, SwarmState
+
+
+def publish_numbered(name: str, count: int, publications: int) -> None:
+    """
+    Писатель: в публикации k у всех дронов позиция, скорость и время – k.
+    """
+    shared = SharedSwarmState.attach(name, untrack=False)
+    state = SwarmState(trail_length=shared.trail_length)
+    ids = np.arange(8000, 8000 + count)
+    for k in range(1, publications + 1):
+        state.update(ids, np.full((count, RECORD_LENGTH), float(k)), timestamp=float(k))
+        shared.publish(state)
+    shared.close()
+
+
+def test_publish_and_frame():
+    shared = SharedSwarmState.create(capacity=4, trail_length=5)
+    reader = SharedSwarmState.attach(shared.name, untrack=False)
+    try:
+        assert reader.frame()["ids"].tolist() == []
+        state = SwarmState(trail_length=5, seed=0)
+        for step in range(7):
+            state.update([8000, 8001, 8002], np.arange(3 * RECORD_LENGTH).reshape(3, -1) + step, timestamp=step)
+        shared.publish(state)
+        frame, expected = reader.frame(), state.frame()
+        assert frame.keys() == expected.keys()
+        for name in expected:
+            assert np.array_equal(frame[name], expected[name]), name
+        # Дроны сверх capacity не попадают в снимок и считаются в truncated
+        state.update(range(9000, 9003), np.zeros((3, RECORD_LENGTH)))
+        shared.publish(state)
+        assert reader.frame()["ids"].tolist() == [8000, 8001, 8002, 9000]
+        assert reader.stats()["truncated"] == 2 and reader.stats()["published"] == 2
+    finally:
+        reader.close()
+        shared.close()
+
+
+def test_frames_consistent_under_concurrent_writer():
+    shared = SharedSwarmState.create(capacity=64, trail_length=5)
+    writer = mp.Process(target=publish_numbered, args=(shared.name, 64, 3000))
+    writer.start()
+    frames = 0
+    try:
+        while writer.is_alive() or frames == 0:
+            frame = shared.frame(retries=1000)
+            if frame is None or not len(frame["ids"]):
+                continue
+            # Снимок одной публикации: все значения одинаковы
+            k = frame["last_update"][0]
+            assert (frame["last_update"] == k).all()
+            assert (frame["position"] == k).all() and (frame["velocity"] == k).all()
+            frames += 1
+    finally:
+        writer.join()
+        shared.close()
+    assert writer.exitcode == 0 and frames > 0
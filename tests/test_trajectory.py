@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from pionsrv.trajectory import TRAJECTORY_COLUMNS, Trajectory, load_trajectory_data
+
+
+def keyframes(seed: int = 0) -> np.ndarray:
+    """
+    Ключевые точки (t, id, x, y, z, yaw) пяти дронов с разным началом, концом и
+    числом точек, перемешанные – как в файле, не отсортированном по (id, t).
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for k, drone_id in enumerate([8004, 8000, 8002, 8001, 8003]):
+        times = np.sort(rng.choice(np.arange(0.0, 30.0, 0.5), size=3 + 2 * k, replace=False)) + k
+        for t in times:
+            rows.append([t, drone_id, *rng.uniform(-5, 5, 3), rng.uniform(-3, 3)])
+    data = np.array(rows)
+    return data[rng.permutation(len(data))]
+
+
+def reference(data: np.ndarray, time: float, hold: float) -> dict:
+    """
+    {id: (позиция, скорость)} – np.interp отдельно по каждому дрону.
+    """
+    result = {}
+    for drone_id in np.unique(data[:, 1]).astype(int):
+        rows = data[data[:, 1] == drone_id]
+        rows = rows[np.argsort(rows[:, 0])]
+        t = rows[:, 0]
+        if not t[0] <= time < t[-1] + hold + 1e-9:
+            continue
+        position = np.array([np.interp(time, t, rows[:, c]) for c in range(2, 6)])
+        i = np.searchsorted(t, time, side="right") - 1
+        if i + 1 < len(t):
+            velocity = (rows[i + 1, 2:6] - rows[i, 2:6]) / (t[i + 1] - t[i])
+        else:
+            velocity = np.zeros(4)
+        result[drone_id] = (position, velocity)
+    return result
+
+
+@pytest.mark.parametrize("hold", [0.0, 2.0])
+def test_sample_matches_interp(hold):
+    data = keyframes()
+    trajectory = Trajectory(data)
+    for time in np.arange(-1.0, 40.0, 0.25):
+        ids, positions, velocities = trajectory.sample(time, hold)
+        expected = reference(data, time, hold)
+        assert ids.tolist() == sorted(expected)
+        for drone_id, position, velocity in zip(ids.tolist(), positions, velocities):
+            assert np.allclose(position, expected[drone_id][0])
+            assert np.allclose(velocity, expected[drone_id][1])
+
+
+def test_single_point_and_bounds():
+    trajectory = Trajectory(np.array([[2.0, 8000, 1.0, 2.0, 3.0, 0.0]]))
+    assert (trajectory.start_time, trajectory.end_time) == (2.0, 2.0)
+    assert len(trajectory.sample(1.9)[0]) == 0 and len(trajectory.sample(2.5)[0]) == 0
+    assert trajectory.sample(2.0)[0].tolist() == [8000]
+    ids, positions, velocities = trajectory.sample(2.5, hold=1.0)
+    assert ids.tolist() == [8000]
+    assert positions[0].tolist() == [1.0, 2.0, 3.0, 0.0] and not velocities.any()
+
+
+def test_load_formats(tmp_path):
+    data = keyframes()
+    np.savetxt(tmp_path / "show.csv", data, delimiter=",", header=",".join(TRAJECTORY_COLUMNS), comments="", fmt="%.17g")
+    np.save(tmp_path / "show.npy", data)
+    np.savez(tmp_path / "show.npz", **{name: data[:, i] for i, name in enumerate(TRAJECTORY_COLUMNS)})
+    for name in ("show.csv", "show.npy", "show.npz"):
+        assert np.array_equal(load_trajectory_data(str(tmp_path / name)), data)
+    with pytest.raises(ValueError):
+        load_trajectory_data(str(tmp_path / "show.txt"))